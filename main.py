@@ -1,31 +1,41 @@
+import sys
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Headless subcommands (python main.py reindex ...) skip the GUI stack entirely
+    from src.cli import main as cli_main
+    sys.exit(cli_main(sys.argv[1:]))
+
 import customtkinter as ctk
 import keyboard
 import os
 import time
 import datetime
-import mss
-from PIL import Image
 
 # Modular Imports
-import shutil # <--- New Import for moving files
 import threading
-from src.utils.platform_utils import minimize_console, is_keyboard_hit, get_key
+from src.utils.platform_utils import minimize_console, is_keyboard_hit, get_key, copy_image_to_clipboard
 from src.core.config import ConfigManager, PATHS, GEMINI_MODEL # <--- Import PATHS & MODEL
 from src.utils.helpers import get_active_window_title
 from src.ui.snipping_overlay import SnippingOverlay
-from src.ui.editor_window import EditorWindow
+from src.ui.editor_window import EditorWindow, show_toast
 from src.ui.dashboard import DashboardWindow
 from src.core.tray import SystemTrayIcon 
 from src.core.data_manager import data_manager
+from src.core.blob_store import blob_store
+from src.core.vault_watcher import vault_watcher
+from src.core.capture_engine import CaptureSpill, capture_engine
+from src.core.save_queue import save_queue
+from src.core import image_encoder
 from logger_agent import log_agent
 from src.utils.animations import print_lifeos_intro
-import sys
 
 # Constants
 OUTPUT_DIR = "output"
 ATTACHMENTS_DIR = os.path.join(OUTPUT_DIR, "attachments")
 HOTKEY = "ctrl+alt+s"
 VERSION = "v3.8.0 (Visual Dashboard)"
+# Idle garbage collection (config key gc_on_idle: off | report | temp | all)
+GC_IDLE_SECONDS = 15 * 60
+GC_CHECK_MS = 60 * 1000
 
 from src.utils.singleton import ensure_single_instance
 
@@ -47,6 +57,10 @@ class LifeOSUltimateApp:
         self.root = ctk.CTk()
         self.root.withdraw()
         self.is_capturing = False
+        self.spill = None
+        self.frozen_frame = None
+        self.last_activity = time.time()
+        self.last_gc = 0
         
         # Ensure directories
         os.makedirs(ATTACHMENTS_DIR, exist_ok=True)
@@ -54,12 +68,27 @@ class LifeOSUltimateApp:
         # Init System Tray
         self.tray = SystemTrayIcon(self.trigger_capture_tray, self.trigger_dashboard, self.quit_app)
         self.tray.run()
+
+        # Keep registry paths in step with moves/renames made inside the vault
+        vault_watcher.start(self.current_paths)
+
+        # One long-lived grabber: the hotkey no longer pays for opening the display
+        capture_engine.start()
+
+        # Search / near-duplicate indexes load in the background, not on the first search
+        data_manager.warm_up()
+
+        # Saves run on one background writer; jobs left by a crash are replayed first
+        save_queue.start(self.finish_save, on_change=self.tray.set_pending_saves,
+                         is_saved=lambda data: data_manager.has_task_entry(data.get('id')))
         
         log_agent.log_event("SYSTEM", f"LifeOS Capture Ultimate Started. Hotkey: {HOTKEY}")
         
         keyboard.add_hotkey(HOTKEY, self.trigger_capture)
         keyboard.add_hotkey("ctrl+alt+d", self.trigger_dashboard)
         
+        self.root.after(GC_CHECK_MS, self._idle_gc)
+
         # Start Console Listener
         self.listener_thread = threading.Thread(target=self._console_listener, daemon=True)
         self.listener_thread.start()
@@ -85,6 +114,7 @@ class LifeOSUltimateApp:
                             if os.path.exists(new_path):
                                 ConfigManager.set_vault_root(new_path)
                                 self.current_paths = ConfigManager.get_dynamic_paths()
+                                vault_watcher.restart(self.current_paths)
                                 print(f"✅ Vault Root updated to: {new_path}")
                                 log_agent.log_event("CONFIG", f"Vault Root changed to {new_path}")
                             else:
@@ -100,6 +130,24 @@ class LifeOSUltimateApp:
                 pass
             time.sleep(0.1)
 
+    def _idle_gc(self):
+        """Runs the garbage collector in the background once the app has been idle for a while."""
+        mode = ConfigManager.load().get('gc_on_idle', 'temp')
+        idle = time.time() - self.last_activity > GC_IDLE_SECONDS
+        if mode != 'off' and idle and not self.is_capturing and self.last_gc < self.last_activity:
+            self.last_gc = time.time()
+            # 'temp' only deletes stale temp captures; everything else is just reported in the log
+            reclaim = {'report': False, 'temp': ('temp',), 'all': True}.get(mode, False)
+            threading.Thread(target=self._run_gc, args=(reclaim,), daemon=True).start()
+        self.root.after(GC_CHECK_MS, self._idle_gc)
+
+    def _run_gc(self, reclaim):
+        try:
+            from src.core.garbage_collector import collect_garbage
+            collect_garbage(reclaim=reclaim, paths=self.current_paths)
+        except Exception as e:
+            log_agent.error("Idle garbage collection failed", e)
+
     def trigger_capture(self):
         # Triggered by Hotkey (keyboard thread)
         self.root.after(0, self._start_capture_flow)
@@ -112,6 +160,7 @@ class LifeOSUltimateApp:
         if self.is_capturing: return
         minimize_console()
         self.is_capturing = True
+        self.last_activity = time.time()
         self.source = get_active_window_title()
         log_agent.log_event("CAPTURE_START", f"Capture triggered on: {self.source}")
         self.start()
@@ -122,6 +171,7 @@ class LifeOSUltimateApp:
 
     def show_dashboard(self):
         # Open or focus dashboard
+        self.last_activity = time.time()
         if not hasattr(self, 'dashboard_win') or not self.dashboard_win.winfo_exists():
             self.dashboard_win = DashboardWindow(self.root)
         else:
@@ -129,27 +179,52 @@ class LifeOSUltimateApp:
             self.dashboard_win.deiconify()
 
     def start(self):
-        SnippingOverlay(self.root, self.on_capture, self.reset)
+        self.frozen_frame = None
+        if ConfigManager.load().get('snip_mode', 'live') == 'frozen':
+            # One grab of the whole virtual screen now; the selection is cropped from it
+            screen = capture_engine.virtual_screen()
+            self.frozen_frame = (capture_engine.grab_image(screen), screen['left'], screen['top'])
+        SnippingOverlay(self.root, self.on_capture, self.reset,
+                        frozen=self.frozen_frame[0] if self.frozen_frame else None)
 
     def quit_app(self):
         log_agent.log_event("SYSTEM", "Application Exiting via Tray")
+        vault_watcher.stop()
+        capture_engine.stop()
+        save_queue.stop()
         self.root.quit()
         sys.exit(0)
 
     def reset(self):
         self.is_capturing = False
+        self.frozen_frame = None
+        if self.spill:
+            self.spill.discard()
+            self.spill = None
 
     def on_capture(self, region):
-        with mss.mss() as sct:
-            img = sct.grab(region)
-            pil_img = Image.frombytes("RGB", img.size, img.bgra, "raw", "BGRX")
-            path = os.path.join(ATTACHMENTS_DIR, f"temp_{int(time.time())}.png")
-            pil_img.save(path)
-            EditorWindow(self.root, path, region, self.finish_save, self.reset, source=self.source)
-
-    def finish_save(self, data, img_path):
+        # The editor gets the frame in memory; the PNG is encoded once, at save time
+        if self.frozen_frame:
+            frame, left, top = self.frozen_frame
+            x, y = region['left'] - left, region['top'] - top
+            pil_img = frame.crop((x, y, x + region['width'], y + region['height']))
+            self.frozen_frame = None
+        else:
+            pil_img = capture_engine.grab_image(region)
+        self.spill = CaptureSpill(pil_img, os.path.join(ATTACHMENTS_DIR, f"temp_{int(time.time())}.png"))
+        EditorWindow(self.root, pil_img, region, self.queue_save, self.reset, source=self.source)
+
+    def queue_save(self, data, image):
+        """Editor callback: the save is queued and the editor closes at once."""
+        # The crash-recovery spill goes once the queued job is on disk (discarded on the spill thread)
+        spill, self.spill = self.spill, None
+        save_queue.submit(data, image, on_persisted=spill.discard if spill else None)
+        self.reset()
+
+    def finish_save(self, data, image):
+        # Runs on the save queue's writer thread (never on the Tk thread)
         safe_title = "".join(x for x in data['title'] if x.isalnum() or x in " -_").strip() or "Untitled"
-        final_name = f"{safe_title}_{int(time.time())}.png"
+        stamp = int(time.time())
         md_name = f"{safe_title}.md"
 
         # --- SMART ROUTING LOGIC ---
@@ -183,25 +258,35 @@ class LifeOSUltimateApp:
         md_path = os.path.join(target_dir, md_name)
         
         save_img = data.get('save_image', True)
+        cas = ConfigManager.load().get('attachment_store') == 'cas'
         final_img_path = ""
+        final_name = ""
+        encoding = {}
 
         if save_img:
             os.makedirs(attachments_dir, exist_ok=True)
-            final_img_path = os.path.join(attachments_dir, final_name)
             
-            # Move Image
-            try:
-                shutil.move(img_path, final_img_path)
-            except Exception as e:
-                print(f"Error moving image: {e}")
-                # Fallback copy if move fails (e.g. cross-drive)
-                shutil.copy(img_path, final_img_path)
+            if copy_image_to_clipboard(image):
+                # The editor is gone by now: the toast goes on the root window, from the Tk thread
+                self.root.after(0, lambda: show_toast(self.root, "📋 Imagen copiada al portapapeles"))
+            else:
+                log_agent.log_event("WARNING", "Clipboard Copy Failed")
+            # Single encode in the format the content calls for (config image_encoding). The file carries
+            # the entry id, unless it may become a blob shared by several entries (then the note holds it)
+            encoded = image_encoder.encode(image, None if cas else data['id'], vault_root=current_paths['root'])
+            final_name = f"{safe_title}_{stamp}{encoded.ext}"
+            final_img_path = os.path.join(attachments_dir, final_name)
+            encoded.save(final_img_path)
+            encoding = {"image_format": encoded.kind, "image_bytes": len(encoded.data), "encode_ms": encoded.encode_ms}
+            log_agent.log_event("ENCODE", f"{encoded.kind}: {len(encoded.data) // 1024} KB in {encoded.encode_ms} ms",
+                                **encoded.analysis)
         
         # Build image markdown only if saved
         img_md = f"![Screenshot](attachments/{final_name})" if save_img else ""
 
         # Write Markdown
         content = f"""---
+id: {data.get('id', '')}
 created: {datetime.datetime.now()}
 type: {data['type']}
 universe: {data['universe']}
@@ -225,7 +310,7 @@ related_file: {data.get('related_file', '')}
             f.write(content)
         
         # --- INDEX IN REGISTRY (Final Paths) ---
-        data_manager.add_task_entry({
+        entry = {
             "title": data['title'],
             "type": data['type'],
             "universe": data['universe'],
@@ -236,13 +321,20 @@ related_file: {data.get('related_file', '')}
             "notes": data['notes'],
             "ai_analysis": data.get('ai_analysis', ''),
             "file_path": final_img_path,
-            "md_path": md_path
-        })
+            "md_path": md_path,
+            "phash": data.get('phash', ''),
+            **encoding
+        }
+        if data.get('id'):
+            entry["id"] = data['id']
+        data_manager.add_task_entry(entry)
         
+        # Content-addressed dedupe (hashing happens on the blob store worker)
+        if save_img and cas:
+            blob_store.submit(final_img_path, current_paths['root'])
+
         log_agent.log_event("SAVE", f"Saved to {target_dir}", path=md_path, universe=data['universe'])
         print(f"Saved successfully to: {md_path}")
-            
-        self.is_capturing = False
 
 if __name__ == "__main__":
     ensure_single_instance()
@@ -0,0 +1,179 @@
+"""
+GemShot command line (headless maintenance tasks).
+
+    python main.py reindex [--full] [--dry-run]
+    python main.py gc [--reclaim] [--only temp,dangling,orphans,blobs]
+    python main.py stats [--top N]
+    python main.py export-since [SEQ] [-o FILE_OR_DIR]
+    python main.py apply DELTA [DELTA ...]
+    python main.py archive [--older-than DAYS] [--project P] [--dry-run]
+    python main.py bench-memory [--entries N] [--registry]
+    python main.py export OUT [--format csv|ndjson|parquet] [--columns a,b] [--since DATE] [--universe U]
+    python -m src.cli reindex
+"""
+import argparse
+import sys
+
+def cmd_reindex(args):
+    from src.core.reindex import reindex
+    summary = reindex(full=args.full, dry_run=args.dry_run)
+    print(f"Notes in vault: {summary['notes']} (parsed {summary['parsed']})")
+    print(f"Added: {summary['added']}  Updated: {summary['updated']}  Detached: {summary['detached']}"
+          + (f"  Failed: {summary['failed']} (retried next run)" if summary['failed'] else ""))
+    print(f"Done in {summary['seconds']}s" + (" (dry run, nothing written)" if args.dry_run else ""))
+    return 0
+
+def cmd_gc(args):
+    from src.core.garbage_collector import CATEGORIES, human_size, collect_garbage
+    categories = tuple(c.strip() for c in args.only.split(",")) if args.only else CATEGORIES
+    unknown = set(categories) - set(CATEGORIES)
+    if unknown:
+        print(f"Unknown categories: {', '.join(sorted(unknown))} (expected {', '.join(CATEGORIES)})")
+        return 2
+    summary = collect_garbage(reclaim=args.reclaim, categories=categories)
+    for category, info in summary.items():
+        print(f"{category:<10} {info['count']:>6}  {human_size(info['bytes']):>10}")
+        if args.verbose:
+            for item in info["items"]:
+                print(f"    {item}")
+    total = sum(info["bytes"] for info in summary.values())
+    print(f"Total: {human_size(total)} " + ("reclaimed" if args.reclaim else "reclaimable (dry run, use --reclaim to delete)"))
+    return 0
+
+def cmd_stats(args):
+    from datetime import date, timedelta
+    from src.core.data_manager import data_manager
+    from src.core.garbage_collector import human_size
+    stats = data_manager.get_stats()
+    today = date.today()
+    last_7 = sum(stats["by_day"].get((today - timedelta(days=i)).isoformat(), 0) for i in range(7))
+    print(f"Total captures: {stats['total']}   Open tasks: {stats['open_tasks']}   Storage: {human_size(stats['storage_bytes'])}")
+    print(f"Today: {stats['by_day'].get(today.isoformat(), 0)}   Last 7 days: {last_7}")
+    for field in ("type", "universe", "project", "client"):
+        top = sorted(stats[f"by_{field}"].items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        print(f"\nBy {field}:")
+        for name, count in top:
+            print(f"  {name or '(none)':<30} {count:>6}")
+    return 0
+
+def cmd_export_since(args):
+    from src.core.replication import export_since
+    summary = export_since(args.seq, args.output)
+    if not summary["ops"]:
+        print(f"Node {summary['node']}: nothing after seq {summary['from'] - 1}")
+        return 0
+    print(f"Node {summary['node']}: exported ops {summary['from']}-{summary['to']} ({summary['ops']}) to {summary['path']}")
+    return 0
+
+def cmd_apply(args):
+    from src.core.replication import apply_ops
+    summary = apply_ops(args.paths)
+    print(f"Applied {summary['applied']} ops (skipped {summary['skipped']} already applied)")
+    print(f"Entries created: {summary['created']}  updated: {summary['updated']}  deleted: {summary['deleted']}  Lookups: {summary['lookups']}")
+    for node, expected, found in summary["gaps"]:
+        print(f"Missing ops from {node}: expected seq {expected}, delta starts at {found} (ask for export-since {expected - 1})")
+    return 1 if summary["gaps"] else 0
+
+def cmd_export(args):
+    from src.core.exporter import export_registry
+    filters = {}
+    if args.since:
+        filters["since"] = args.since
+    if args.until:
+        filters["until"] = args.until
+    for field in ("universe", "project", "client", "type", "status"):
+        values = getattr(args, field)
+        if values:
+            filters[field] = values[0] if len(values) == 1 else values
+    columns = [c.strip() for c in args.columns.split(",") if c.strip()] if args.columns else None
+    try:
+        summary = export_registry(args.output, args.format, columns, filters or None)
+    except (ValueError, RuntimeError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    if args.output != "-":
+        print(f"Exported {summary['rows']} entries as {summary['format']} to {summary['path']} in {summary['seconds']}s")
+    return 0
+
+def cmd_archive(args):
+    from src.core.archiver import archive_captures
+    from src.core.garbage_collector import human_size
+    summary = archive_captures(args.older_than, args.project or (), args.dry_run)
+    verb = "Would archive" if args.dry_run else "Archived"
+    print(f"{verb} {summary['entries']} captures into {len(summary['archives'])} monthly archives")
+    print(f"Hot folders: -{human_size(summary['bytes_freed'])}" +
+          ("" if args.dry_run else f"   Archives: +{human_size(summary['bytes_archived'])}"))
+    return 0
+
+def cmd_bench_memory(args):
+    from src.core.garbage_collector import human_size
+    from src.core.records import bench_memory
+    lines = None
+    if args.registry:
+        import json
+        from src.core.data_manager import data_manager
+        lines = lambda: (json.dumps(e, ensure_ascii=False) for e in data_manager.query(limit=None))
+    result = bench_memory(args.entries, lines)
+    n = max(result["entries"], 1)
+    print(f"Entries: {result['entries']}" + (" (registry)" if args.registry else " (synthetic)"))
+    print(f"dict          {human_size(result['dict_bytes']):>10}  {result['dict_bytes'] // n:>6} B/entry  {result['dict_seconds']}s")
+    print(f"CaptureRecord {human_size(result['record_bytes']):>10}  {result['record_bytes'] // n:>6} B/entry  {result['record_seconds']}s")
+    print(f"Records use {result['ratio']:.0%} of the dict memory")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="gemshot", description="GemShot maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("reindex", help="Rebuild/repair the registry from the notes in the vault")
+    p.add_argument("--full", action="store_true", help="Ignore the manifest and re-parse every note")
+    p.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    p.set_defaults(func=cmd_reindex)
+
+    p = sub.add_parser("gc", help="Report (or reclaim) temp captures, dangling entries and orphan files")
+    p.add_argument("--reclaim", action="store_true", help="Delete what was found (default is a dry run)")
+    p.add_argument("--only", help="Comma-separated categories: temp, dangling, orphans, blobs")
+    p.add_argument("-v", "--verbose", action="store_true", help="List every item")
+    p.set_defaults(func=cmd_gc)
+
+    p = sub.add_parser("stats", help="Show registry counters (materialised, no history scan)")
+    p.add_argument("--top", type=int, default=10, help="Rows per breakdown")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("export-since", help="Write this node's registry ops after SEQ to a delta file")
+    p.add_argument("seq", type=int, nargs="?", help="Last seq the peer has (default: last export)")
+    p.add_argument("-o", "--output", help="Delta file or folder (e.g. a shared sync folder)")
+    p.set_defaults(func=cmd_export_since)
+
+    p = sub.add_parser("apply", help="Apply delta files (or folders of them) exported by other nodes")
+    p.add_argument("paths", nargs="+", help="Delta files or folders")
+    p.set_defaults(func=cmd_apply)
+
+    p = sub.add_parser("archive", help="Move old captures into per-month zip archives in the vault")
+    p.add_argument("--older-than", type=int, metavar="DAYS", help="Age cutoff (default: archive_after_days in config.yaml, or 180)")
+    p.add_argument("--project", action="append", help="Also archive every capture of this (closed) project; repeatable")
+    p.add_argument("--dry-run", action="store_true", help="Report what would move without touching anything")
+    p.set_defaults(func=cmd_archive)
+
+    p = sub.add_parser("bench-memory", help="Compare in-memory size of dict entries vs compact CaptureRecords")
+    p.add_argument("--entries", type=int, default=100_000, help="Synthetic entries to generate")
+    p.add_argument("--registry", action="store_true", help="Measure the real registry instead")
+    p.set_defaults(func=cmd_bench_memory)
+
+    p = sub.add_parser("export", help="Stream registry entries to CSV, NDJSON or Parquet")
+    p.add_argument("output", help="Output file ('-' for stdout); the extension picks the format")
+    p.add_argument("--format", choices=("csv", "ndjson", "parquet"), help="Override the format")
+    p.add_argument("--columns", help="Comma-separated fields (default: common fields; NDJSON: whole entries)")
+    p.add_argument("--since", help="Entries on/after this ISO date")
+    p.add_argument("--until", help="Entries before this ISO date")
+    for field in ("universe", "project", "client", "type", "status"):
+        p.add_argument(f"--{field}", action="append", help=f"Only this {field} (repeatable)")
+    p.set_defaults(func=cmd_export)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
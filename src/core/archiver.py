@@ -0,0 +1,168 @@
+import io
+import os
+import tempfile
+import time
+import zipfile
+import zlib
+from datetime import datetime, timedelta
+from logger_agent import log_agent
+from src.core.config import ConfigManager
+from src.core.data_manager import data_manager
+from src.core.stats import SIZE_FIELD
+from src.utils.file_lock import FileLock
+
+# Per-month archives live in the vault, next to the blob store
+ARCHIVE_DIR = os.path.join(".gemshot", "archive")
+# Default age for `archive` when neither the CLI nor config.yaml (archive_after_days) says otherwise
+DEFAULT_AFTER_DAYS = 180
+# Members extracted for viewing (the OS cleans the temp folder)
+EXTRACT_DIR = os.path.join(tempfile.gettempdir(), "gemshot_archive")
+
+def _crc(path):
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+class Archiver:
+    """
+    Moves the images of old captures (or of closed projects) into one zip per
+    capture month under ``<vault>/.gemshot/archive/``. Entries keep a pointer
+    (``archive_path`` + ``archive_member``, original location in
+    ``archived_from``) and an empty ``file_path``; notes stay where they are.
+    A file is only deleted once its member was read back with a matching CRC.
+    """
+
+    def __init__(self, paths=None):
+        self.paths = paths or ConfigManager.get_dynamic_paths()
+        self.archive_dir = os.path.join(os.path.abspath(self.paths['root']), ARCHIVE_DIR)
+
+    def candidates(self, older_than_days=None, projects=()):
+        """Entries whose image is still hot and is older than the cutoff or belongs to ``projects``."""
+        if older_than_days is None:
+            older_than_days = ConfigManager.load().get('archive_after_days', DEFAULT_AFTER_DAYS)
+        queries = [{"until": (datetime.now() - timedelta(days=older_than_days)).isoformat()}]
+        if projects:
+            queries.append({"project": list(projects)})
+        seen = set()
+        for filters in queries:
+            for entry in data_manager.query(filters, limit=None):
+                path = entry.get('file_path')
+                if entry['id'] in seen or entry.get('archive_path') or not path or not os.path.exists(path):
+                    continue
+                seen.add(entry['id'])
+                yield entry
+
+    def archive(self, older_than_days=None, projects=(), dry_run=False):
+        """Archives the candidates; returns {entries, archives, bytes_freed, bytes_archived, seconds}."""
+        started = time.time()
+        by_month = {}
+        for entry in self.candidates(older_than_days, projects):
+            by_month.setdefault((entry.get('timestamp') or "")[:7] or "undated", []).append(entry)
+
+        summary = {"entries": 0, "archives": [], "bytes_freed": 0, "bytes_archived": 0}
+        if not dry_run and by_month:
+            os.makedirs(self.archive_dir, exist_ok=True)
+        for month, entries in sorted(by_month.items()):
+            zip_path = os.path.join(self.archive_dir, f"{month}.zip")
+            if dry_run:
+                summary["entries"] += len(entries)
+                summary["bytes_freed"] += sum(os.path.getsize(e['file_path']) for e in entries)
+                summary["archives"].append(zip_path)
+                continue
+            try:
+                done, freed, grown = self._archive_month(zip_path, entries)
+            except Exception as e:
+                log_agent.error(f"Failed to archive {month}", e)
+                continue
+            summary["entries"] += done
+            summary["bytes_freed"] += freed
+            summary["bytes_archived"] += grown
+            summary["archives"].append(zip_path)
+
+        summary["seconds"] = round(time.time() - started, 2)
+        log_agent.log_event("ARCHIVE", f"{summary['entries']} captures archived into {len(summary['archives'])} archives",
+                            dry_run=dry_run, bytes_freed=summary["bytes_freed"], seconds=summary["seconds"])
+        return summary
+
+    def _archive_month(self, zip_path, entries):
+        with FileLock(zip_path):
+            size_before = os.path.getsize(zip_path) if os.path.exists(zip_path) else 0
+            members = {}
+            with zipfile.ZipFile(zip_path, "a", zipfile.ZIP_DEFLATED) as zf:
+                names = set(zf.namelist())
+                for entry in entries:
+                    member = f"{entry['id']}/{os.path.basename(entry['file_path'])}"
+                    if member not in names: # Left by a run interrupted after the write
+                        zf.write(entry['file_path'], member)
+                    members[entry['id']] = member
+
+            # Verify before anything is deleted
+            changes, freed = {}, 0
+            with zipfile.ZipFile(zip_path) as zf:
+                for entry in entries:
+                    member = members[entry['id']]
+                    try:
+                        ok = zf.getinfo(member).CRC == _crc(entry['file_path'])
+                    except (KeyError, OSError):
+                        ok = False
+                    if not ok:
+                        log_agent.error(f"Archive check failed for {entry['file_path']}, keeping it")
+                        continue
+                    changes[entry['id']] = {"file_path": "", "archive_path": zip_path,
+                                            "archive_member": member, "archived_from": entry['file_path']}
+                    if entry.get(SIZE_FIELD) is not None:
+                        # The image no longer counts towards the vault's stored bytes
+                        changes[entry['id']][SIZE_FIELD] = max(0, entry[SIZE_FIELD] - os.path.getsize(entry['file_path']))
+            grown = os.path.getsize(zip_path) - size_before
+
+        # Registry first: a crash before the deletes only leaves a redundant copy behind.
+        # Only originals whose entry now points at the archive are deleted ([] if the update failed).
+        updated = {r['id'] for r in data_manager.update_task_entries(changes)} if changes else set()
+        for entry in entries:
+            if entry['id'] in updated:
+                try:
+                    freed += os.path.getsize(entry['file_path'])
+                    os.remove(entry['file_path'])
+                except OSError as e:
+                    log_agent.error(f"Archived but could not remove {entry['file_path']}", e)
+        return len(updated), freed, grown
+
+# --- ON-DEMAND ACCESS ---
+def read_member(entry):
+    """Bytes of an archived capture, or None (the archive may be on an offline drive)."""
+    if not entry.get('archive_path') or not entry.get('archive_member'):
+        return None
+    try:
+        with zipfile.ZipFile(entry['archive_path']) as zf:
+            return zf.read(entry['archive_member'])
+    except (OSError, KeyError, zipfile.BadZipFile) as e:
+        log_agent.error(f"Could not read {entry.get('archive_member')} from {entry.get('archive_path')}", e)
+        return None
+
+def open_image(entry):
+    """PIL image of an archived capture, decoded from memory (nothing is extracted)."""
+    data = read_member(entry)
+    if data is None:
+        return None
+    from PIL import Image
+    return Image.open(io.BytesIO(data))
+
+def extract(entry):
+    """Extracts one archived capture to the temp folder (once) and returns its path."""
+    if not entry.get('archive_member'):
+        return None
+    target = os.path.join(EXTRACT_DIR, *entry['archive_member'].split("/"))
+    if os.path.exists(target):
+        return target
+    data = read_member(entry)
+    if data is None:
+        return None
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as f:
+        f.write(data)
+    return target
+
+def archive_captures(older_than_days=None, projects=(), dry_run=False, paths=None):
+    return Archiver(paths).archive(older_than_days, projects, dry_run)
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+from logger_agent import log_agent
+from src.core.locator import read_file_id
+
+# Store location, relative to the vault root
+BLOB_DIR = os.path.join(".gemshot", "blobs")
+REFS_FILE = "refs.jsonl"
+HASH_CHUNK = 1024 * 1024
+
+def hash_file(path):
+    """Streams a file through SHA-256 (never loads it whole)."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class BlobStore:
+    """
+    Content-addressed attachment store (``attachment_store: cas`` in config.yaml).
+
+    Every saved attachment is hashed (streamed) and kept once under
+    ``<vault>/.gemshot/blobs/<ab>/<sha256>.<ext>``; the file in the PARA folder
+    becomes a hard link to that blob, so capturing the same pixels again costs
+    no extra disk. Linked files are shared between entries, so they carry no
+    entry id: captures are saved without one in this mode (identical captures
+    then encode to identical bytes), and files that do embed an id are left
+    alone. Each placement is recorded in ``refs.jsonl`` (digest -> path).
+    Hashing runs on a background worker so the Tk thread never waits on it.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def store_dir(self, vault_root):
+        return os.path.join(vault_root, BLOB_DIR)
+
+    def blob_path(self, vault_root, digest, ext):
+        return os.path.join(self.store_dir(vault_root), digest[:2], f"{digest}{ext}")
+
+    # --- BACKGROUND QUEUE ---
+    def submit(self, path, vault_root, on_done=None):
+        """Queues an attachment for deduplication; ``on_done(digest)`` runs on the worker."""
+        self._queue.put((path, vault_root, on_done))
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                path, vault_root, on_done = self._queue.get(timeout=5)
+            except queue.Empty:
+                return
+            try:
+                digest = self.ingest(path, vault_root)
+                if on_done and digest:
+                    on_done(digest)
+            except Exception as e:
+                log_agent.error(f"Blob store failed for {path}", e)
+
+    # --- INGEST ---
+    def ingest(self, path, vault_root):
+        """
+        Links ``path`` into the store, or replaces it with a link to the existing
+        blob when the content is already there. Returns the digest.
+        """
+        if not os.path.exists(path):
+            return None
+        if read_file_id(path):
+            # Linking would hand this entry's id to every entry sharing the blob
+            log_agent.log_event("BLOB", f"Attachment carries an entry id, not deduplicated: {os.path.basename(path)}")
+            return None
+        digest = hash_file(path)
+        blob = self.blob_path(vault_root, digest, os.path.splitext(path)[1].lower())
+
+        try:
+            if os.path.exists(blob):
+                if not os.path.samefile(blob, path):
+                    # Duplicate content: swap the copy for a link to the existing blob
+                    tmp_link = path + ".link"
+                    os.link(blob, tmp_link)
+                    os.replace(tmp_link, path)
+                    log_agent.log_event("BLOB", f"Duplicate attachment deduplicated: {os.path.basename(path)}")
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.link(path, blob)
+        except OSError as e:
+            # Different volume or no hard-link support: keep the plain file
+            log_agent.error(f"Hard link unavailable for {path}, keeping a plain copy", e)
+            return digest
+
+        self._add_ref(vault_root, digest, path)
+        return digest
+
+    def _add_ref(self, vault_root, digest, path):
+        ref = {"sha256": digest, "path": os.path.abspath(path), "at": datetime.now().isoformat()}
+        refs_path = os.path.join(self.store_dir(vault_root), REFS_FILE)
+        with self._lock:
+            with open(refs_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(ref, ensure_ascii=False) + "\n")
+
+blob_store = BlobStore()
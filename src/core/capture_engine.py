@@ -0,0 +1,179 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from PIL import Image
+from logger_agent import log_agent
+from src.utils.platform_utils import get_platform
+
+import mss
+from mss.exception import ScreenShotError
+
+# Without a cheap display-change signal (non-Windows), the grabber is reopened after this long
+LAYOUT_TTL = 5.0
+# Seconds a caller waits for the engine thread before grabbing inline
+REQUEST_TIMEOUT = 5.0
+
+def _display_signature():
+    """
+    Virtual screen rectangle + monitor count on Windows (GetSystemMetrics, no
+    handles opened); None elsewhere, where the layout cache expires instead.
+    """
+    if get_platform() != "Windows":
+        return None
+    try:
+        import ctypes
+        metrics = ctypes.windll.user32.GetSystemMetrics
+        # SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN, SM_CMONITORS
+        return tuple(metrics(i) for i in (76, 77, 78, 79, 80))
+    except Exception:
+        return None
+
+def to_image(frame):
+    """PIL image of a grabbed frame (mss returns BGRA)."""
+    return Image.frombytes("RGB", frame.size, frame.bgra, "raw", "BGRX")
+
+class CaptureEngine:
+    """
+    Long-lived screen grabber. One daemon thread owns a single ``mss`` instance
+    (its display handles are thread-bound) and serves grab requests from a
+    queue, so a capture no longer pays for opening the display connection.
+    The monitor layout is cached; when the display configuration changes the
+    grabber is reopened, which also re-reads the layout. If the engine is not running, calls fall back to a one-off grabber.
+    """
+
+    def __init__(self):
+        self._requests = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._monitors = None
+        self._signature = None
+        self._layout_at = 0.0
+
+    # --- LIFECYCLE ---
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="capture-engine", daemon=True)
+                self._thread.start()
+        # Warm up: open the grabber and read the layout before the first hotkey
+        self._call("monitors")
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread and thread.is_alive():
+            self._requests.put(None)
+            thread.join(timeout=2)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # --- PUBLIC API ---
+    def monitors(self):
+        """Cached mss monitor list ([0] is the virtual screen spanning every monitor)."""
+        return self._call("monitors")
+
+    def virtual_screen(self):
+        return self.monitors()[0]
+
+    def grab(self, region):
+        """Raw frame (mss ScreenShot: ``.size``, ``.bgra``) of ``{'left', 'top', 'width', 'height'}``."""
+        return self._call("grab", region)
+
+    def grab_image(self, region):
+        return to_image(self.grab(region))
+
+    # --- ENGINE THREAD ---
+    def _call(self, op, arg=None):
+        if not self.running:
+            return self._inline(op, arg)
+        future = Future()
+        self._requests.put((op, arg, future))
+        try:
+            return future.result(timeout=REQUEST_TIMEOUT)
+        except FutureTimeout:
+            log_agent.error(f"Capture engine did not answer '{op}', grabbing inline")
+            return self._inline(op, arg)
+
+    @staticmethod
+    def _inline(op, arg):
+        with mss.mss() as sct:
+            return [dict(m) for m in sct.monitors] if op == "monitors" else sct.grab(arg)
+
+    def _layout_stale(self):
+        if self._monitors is None:
+            return True
+        signature = _display_signature()
+        if signature is not None:
+            return signature != self._signature
+        return time.monotonic() - self._layout_at > LAYOUT_TTL
+
+    def _refresh_layout(self, sct):
+        """Reopens the grabber: a fresh mss instance has fresh handles and re-reads the monitor list."""
+        if sct is not None:
+            sct.close()
+        sct = mss.mss()
+        self._signature = _display_signature()
+        self._monitors = [dict(m) for m in sct.monitors]
+        self._layout_at = time.monotonic()
+        return sct
+
+    def _run(self):
+        sct = None # Opened on the first request, on this thread
+        try:
+            while True:
+                request = self._requests.get()
+                if request is None:
+                    return
+                op, arg, future = request
+                try:
+                    if self._layout_stale():
+                        # A display change also invalidates the grabber's handles
+                        sct = self._refresh_layout(sct)
+                    if op == "monitors":
+                        future.set_result(self._monitors)
+                        continue
+                    try:
+                        frame = sct.grab(arg)
+                    except ScreenShotError:
+                        sct = self._refresh_layout(sct) # Stale handles (sleep/resume, RDP): retry once
+                        frame = sct.grab(arg)
+                    future.set_result(frame)
+                except Exception as e:
+                    future.set_exception(e)
+        except Exception as e:
+            log_agent.error("Capture engine stopped", e)
+        finally:
+            if sct is not None:
+                sct.close()
+
+class CaptureSpill:
+    """
+    Crash-recovery copy of a capture, written on a background thread with the
+    fastest PNG setting while the editor works on the in-memory image.
+    Discarded once the capture is saved or cancelled; after a crash it is left
+    in place as ``temp_<ts>.png`` (see TEMP_MAX_AGE in the garbage collector).
+    """
+
+    def __init__(self, image, path):
+        self.path = path
+        self._thread = threading.Thread(target=self._write, args=(image,), daemon=True)
+        self._thread.start()
+
+    def _write(self, image):
+        try:
+            image.save(self.path, compress_level=1)
+        except Exception as e:
+            log_agent.error(f"Failed to spill capture to {self.path}", e)
+
+    def discard(self):
+        self._thread.join()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+capture_engine = CaptureEngine()
@@ -68,14 +68,19 @@ class ConfigManager:
         return THEMES.get(theme_name, THEMES["LIGHT"])
 
     @staticmethod
-    def save(data):
+    def save(data, strict=False):
+        """Merges ``data`` into config.yaml; errors are logged (and raised when ``strict``)."""
         try:
             existing = ConfigManager.load()
             existing.update(data)
-            with open(CONFIG_FILE, 'w') as f:
+            tmp_path = CONFIG_FILE + ".tmp"
+            with open(tmp_path, 'w') as f:
                 yaml.dump(existing, f)
+            os.replace(tmp_path, CONFIG_FILE)
         except Exception as e:
             logging.error(f"Error saving config: {e}")
+            if strict:
+                raise
 
     @staticmethod
     def get_dynamic_paths():
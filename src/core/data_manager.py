@@ -1,19 +1,118 @@
+import bisect
+import glob
 import json
 import os
+import threading
 import uuid
+from contextlib import contextmanager
 from datetime import datetime
 from logger_agent import log_agent
+from src.core.config import ConfigManager
+from src.core.locator import Locator, read_file_id
+from src.core.oplog import OpLog
+from src.core.phash_index import DEFAULT_MAX_DISTANCE, PHashIndex, dhash_file
+from src.core.query import DEFAULT_PAGE_SIZE, QueryPage, select
+from src.core.records import compact
+from src.core.search_index import SearchIndex
+from src.core.stats import SIZE_FIELD, RegistryStats, file_bytes
+from src.core.task_store import ShardedTaskStore
+from src.utils.file_lock import FileLock
 
 DATA_DIR = "data"
 CLIENTS_FILE = os.path.join(DATA_DIR, "clients.json")
-TASKS_FILE = os.path.join(DATA_DIR, "tasks.json")
+TASKS_FILE = os.path.join(DATA_DIR, "tasks.json") # Legacy monolithic registry (migrated into TASKS_DIR)
+TASKS_JOURNAL_FILE = os.path.join(DATA_DIR, "tasks.journal.jsonl")
+TASKS_DIR = os.path.join(DATA_DIR, "tasks")
 UNIVERSES_FILE = os.path.join(DATA_DIR, "universes.json")
 PROJECTS_FILE = os.path.join(DATA_DIR, "projects.json")
 ROLES_FILE = os.path.join(DATA_DIR, "roles.json")
+DB_FILE = os.path.join(DATA_DIR, "gemshot.db")
+# One pending-commit file per running instance (several may share data/)
+PENDING_TXN_PATTERN = os.path.join(DATA_DIR, "transaction.pending.*.json")
+# Held from the durable write until the record is applied; one fixed lock file for every instance
+PENDING_TXN_LOCK = os.path.join(DATA_DIR, "transaction.pending")
+SEARCH_INDEX_FILE = os.path.join(DATA_DIR, "search_index.jsonl")
+PHASH_INDEX_FILE = os.path.join(DATA_DIR, "phash_index.jsonl")
+LOCATOR_FILE = os.path.join(DATA_DIR, "locator.jsonl")
+STATS_FILE = os.path.join(DATA_DIR, "stats.json")
+OPLOG_DIR = os.path.join(DATA_DIR, "oplog")
+
+class _LookupList:
+    """Parsed lookup file plus its sorted names and lookup set."""
+
+    def __init__(self, data, signature, is_clients=False):
+        self.data = data
+        self.signature = signature
+        self.is_clients = is_clients
+        if is_clients:
+            # Clients keep file order and are matched case-insensitively
+            self.names = [c["name"] for c in data]
+            self.keys = {n.lower() for n in self.names}
+        else:
+            self.names = sorted(data)
+            self.keys = set(data)
+
+    def add(self, item):
+        self.data.append(item)
+        if self.is_clients:
+            self.names.append(item["name"])
+            self.keys.add(item["name"].lower())
+        else:
+            self.data.sort()
+            bisect.insort(self.names, item)
+            self.keys.add(item)
+
+class _Transaction:
+    """Mutations collected by DataManager.transaction() until commit."""
+
+    def __init__(self):
+        self.files = {}   # filepath -> full contents to write
+        self.tasks = []   # task records to append
+        self.config = {}  # ConfigManager updates
+        self.ops = []     # op-log lines, written once the batch is applied
+
+    def save_config(self, data):
+        self.config.update(data)
 
 class DataManager:
+    # Process-wide cache of the lookup files (filepath -> _LookupList)
+    _cache = {}
+    _cache_lock = threading.RLock()
+
     def __init__(self):
+        self._local = threading.local()
+        self.pending_txn_file = PENDING_TXN_PATTERN.replace("*", uuid.uuid4().hex[:8])
         self._ensure_files()
+        self.tasks = ShardedTaskStore(TASKS_DIR, TASKS_FILE, TASKS_JOURNAL_FILE)
+        self.search_index = SearchIndex(SEARCH_INDEX_FILE)
+        self.phash_index = PHashIndex(PHASH_INDEX_FILE)
+        self.locator = Locator(LOCATOR_FILE)
+        self.stats = RegistryStats(STATS_FILE)
+        self.oplog = OpLog(OPLOG_DIR)
+        self._records = None # id -> CaptureRecord, built on the first search (see resolve)
+        self._records_version = None
+        self._records_lock = threading.RLock()
+        self._recover_transaction()
+        self.db = None
+        if ConfigManager.load().get('storage_backend', 'json') == 'sqlite':
+            self._init_sqlite()
+
+    def _init_sqlite(self):
+        """Opens the SQLite registry, importing the JSON files on first run."""
+        from src.core.sqlite_store import SQLiteStore
+        try:
+            self.db = SQLiteStore(DB_FILE)
+            if not self.db.is_migrated():
+                self.db.migrate_from_json(
+                    self._load_json(UNIVERSES_FILE),
+                    self._load_json(PROJECTS_FILE),
+                    self._load_json(ROLES_FILE),
+                    self._load_json(CLIENTS_FILE),
+                    self.tasks.load_all()
+                )
+        except Exception as e:
+            log_agent.error("Failed to open SQLite registry, falling back to JSON", e)
+            self.db = None
 
     def _ensure_files(self):
         if not os.path.exists(DATA_DIR):
@@ -22,9 +121,6 @@ class DataManager:
         if not os.path.exists(CLIENTS_FILE):
             self._save_json(CLIENTS_FILE, [{"id": "internal", "name": "Internal"}])
             
-        if not os.path.exists(TASKS_FILE):
-            self._save_json(TASKS_FILE, [])
-
         if not os.path.exists(UNIVERSES_FILE):
             self._save_json(UNIVERSES_FILE, ["Jamagax Studio", "Personal", "Health"])
             
@@ -35,6 +131,9 @@ class DataManager:
             self._save_json(ROLES_FILE, ["Diseñador", "Developer", "Manager", "Product Owner"])
 
     def _load_json(self, filepath):
+        # The task registry lives in monthly shards; read it through the store
+        if os.path.normpath(filepath) == os.path.normpath(TASKS_FILE) and hasattr(self, 'tasks'):
+            return self.get_tasks()
         try:
             with open(filepath, 'r', encoding='utf-8') as f:
                 return json.load(f)
@@ -42,91 +141,535 @@ class DataManager:
             log_agent.error(f"Failed to load {filepath}", e)
             return []
 
-    def _save_json(self, filepath, data):
+    def _save_json(self, filepath, data, durable=False, strict=False):
+        # Temp file + rename so a crash never leaves a half-written file behind.
+        # Errors are logged; durable or strict writes also raise them.
+        tmp_path = filepath + ".tmp"
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=4, ensure_ascii=False)
+                if durable:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, filepath)
         except Exception as e:
             log_agent.error(f"Failed to save {filepath}", e)
+            if durable or strict:
+                raise
+
+    # --- TRANSACTIONS ---
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of work for one save: registry mutations made inside the block
+        (add_universe/project/role/client, add_task_entry, txn.save_config) are
+        collected and flushed together on exit, with a single fsync.
+        Nested calls join the outer transaction.
+        """
+        current = getattr(self._local, 'txn', None)
+        if current is not None:
+            yield current
+            return
+
+        txn = _Transaction()
+        self._local.txn = txn
+        try:
+            if self.db:
+                with self.db.batch():
+                    yield txn
+            else:
+                yield txn
+        except BaseException:
+            # Drop in-memory mutations; the next read reloads from disk
+            with self._cache_lock:
+                for path in txn.files:
+                    self._cache.pop(path, None)
+            raise
+        finally:
+            self._local.txn = None
+
+        self._commit(txn)
+
+    def _active_transaction(self):
+        return getattr(self._local, 'txn', None)
+
+    @contextmanager
+    def replicating(self):
+        """Changes made inside the block came from another node's op-log and are not logged again."""
+        self._local.replicating = True
+        try:
+            yield
+        finally:
+            self._local.replicating = False
+
+    def _log_ops(self, ops):
+        """Records (op, kind, key, data) tuples in the op-log, on commit when inside a transaction."""
+        if getattr(self._local, 'replicating', False):
+            return
+        txn = self._active_transaction()
+        if txn is not None:
+            txn.ops.extend(ops)
+        else:
+            self.oplog.record(ops)
+
+    def _commit(self, txn):
+        if self.db:
+            # Registry rows were committed by the SQLite batch
+            if txn.config:
+                ConfigManager.save(txn.config)
+            self.oplog.record(txn.ops)
+        elif txn.files or txn.tasks or txn.config:
+            record = {"files": txn.files, "tasks": txn.tasks, "config": txn.config, "ops": txn.ops}
+            # The commit point: one durable write of the whole batch. The lock
+            # tells other instances this pending file is not a crash leftover.
+            with FileLock(PENDING_TXN_LOCK):
+                self._save_json(self.pending_txn_file, record, durable=True)
+                try:
+                    self._apply_transaction(record)
+                except Exception:
+                    # Committed but not applied: the redo record is kept under its own
+                    # name (this instance reuses pending_txn_file) and replayed on next start
+                    os.replace(self.pending_txn_file, PENDING_TXN_PATTERN.replace("*", uuid.uuid4().hex[:8]))
+                    with self._cache_lock:
+                        for path in txn.files:
+                            self._cache.pop(path, None)
+                    raise
+                os.remove(self.pending_txn_file)
+        self._on_tasks_added(txn.tasks)
+
+    def _apply_transaction(self, record):
+        """Applies a committed transaction record; raises if any registry file could not be written."""
+        for path, data in record.get("files", {}).items():
+            self._merge_save(path, data, strict=True)
+        if record.get("tasks"):
+            self.tasks.append_many(record["tasks"], sync=False)
+        if record.get("config"):
+            ConfigManager.save(record["config"], strict=True)
+        self.oplog.record(record.get("ops", []))
+
+    def _recover_transaction(self):
+        """Replays transactions that were committed but not fully applied before a crash."""
+        legacy = os.path.join(DATA_DIR, "transaction.pending.json")
+        lock = FileLock(PENDING_TXN_LOCK)
+        if not lock.acquire(blocking=False):
+            return # Another instance is committing; what it left behind is recovered on a later start
+        try:
+            for path in glob.glob(PENDING_TXN_PATTERN + ".lock"):
+                # Per-instance lock files of older versions, never removed by them
+                if not os.path.exists(path[:-len(".lock")]):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            for path in glob.glob(PENDING_TXN_PATTERN) + ([legacy] if os.path.exists(legacy) else []):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        record = json.load(f)
+                    self._apply_transaction(record)
+                    # Only a fully applied record is dropped; a failed replay is retried on next start
+                    os.remove(path)
+                    # Same post-commit hooks as _commit (search, perceptual hash, locator, stats)
+                    self._on_tasks_added(record.get("tasks", []))
+                    log_agent.log_event("DATA", "Recovered pending registry transaction")
+                except Exception as e:
+                    log_agent.error(f"Failed to recover pending transaction {path}", e)
+        finally:
+            lock.release()
+
+    def _merge_save(self, filepath, data, strict=False):
+        """
+        Writes a lookup file without losing entries another instance added since
+        we read it: under the file lock, the on-disk list is re-read and merged
+        (names, or clients keyed by case-insensitive name) before replacing it.
+        """
+        is_clients = filepath == CLIENTS_FILE
+        with FileLock(filepath):
+            on_disk = self._load_json(filepath) if os.path.exists(filepath) else []
+            merged = list(on_disk)
+            if is_clients:
+                known = {c.get("name", "").lower() for c in on_disk}
+                merged += [c for c in data if c.get("name", "").lower() not in known]
+            else:
+                merged = sorted(set(on_disk) | set(data))
+            self._save_json(filepath, merged, strict=strict)
+            with self._cache_lock:
+                self._cache[filepath] = _LookupList(merged, self._file_signature(filepath), is_clients=is_clients)
+
+    # --- LOOKUP CACHE ---
+    def _file_signature(self, filepath):
+        try:
+            st = os.stat(filepath)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _cached(self, filepath):
+        """
+        Returns the cached lookup list for ``filepath``, re-parsing the file only
+        when its mtime/size changed (e.g. edited by hand or by another instance).
+        """
+        sig = self._file_signature(filepath)
+        with self._cache_lock:
+            entry = self._cache.get(filepath)
+            if entry is None or entry.signature != sig:
+                entry = _LookupList(self._load_json(filepath), sig, is_clients=(filepath == CLIENTS_FILE))
+                self._cache[filepath] = entry
+            return entry
+
+    def _write_through(self, filepath, entry):
+        txn = self._active_transaction()
+        if txn is not None:
+            txn.files[filepath] = entry.data # Flushed on commit
+            return
+        self._merge_save(filepath, entry.data)
+
+    def _get_names(self, filepath, table):
+        if self.db:
+            return self.db.get_names(table)
+        return list(self._cached(filepath).names)
+
+    def _add_name(self, filepath, table, name, label):
+        if not name:
+            return
+        if self.db:
+            if self.db.add_name(table, name):
+                self._log_ops([("create", label.lower(), name, None)])
+                log_agent.log_event("DATA", f"New {label} Added: {name}")
+            return
+        with self._cache_lock:
+            entry = self._cached(filepath)
+            if name in entry.keys:
+                return
+            entry.add(name)
+            self._write_through(filepath, entry)
+        self._log_ops([("create", label.lower(), name, None)])
+        log_agent.log_event("DATA", f"New {label} Added: {name}")
 
     # --- UNIVERSES ---
     def get_universes(self):
-        data = self._load_json(UNIVERSES_FILE)
-        return sorted(data)
+        return self._get_names(UNIVERSES_FILE, "universes")
 
     def add_universe(self, name):
-        data = self._load_json(UNIVERSES_FILE)
-        if name and name not in data:
-            data.append(name)
-            data.sort()
-            self._save_json(UNIVERSES_FILE, data)
-            log_agent.log_event("DATA", f"New Universe Added: {name}")
+        self._add_name(UNIVERSES_FILE, "universes", name, "Universe")
 
     # --- PROJECTS ---
     def get_projects(self):
-        data = self._load_json(PROJECTS_FILE)
-        return sorted(data)
+        return self._get_names(PROJECTS_FILE, "projects")
 
     def add_project(self, name):
-        data = self._load_json(PROJECTS_FILE)
-        if name and name not in data:
-            data.append(name)
-            data.sort()
-            self._save_json(PROJECTS_FILE, data)
-            log_agent.log_event("DATA", f"New Project Added: {name}")
+        self._add_name(PROJECTS_FILE, "projects", name, "Project")
 
     # --- ROLES ---
     def get_roles(self):
-        data = self._load_json(ROLES_FILE)
-        return sorted(data)
+        return self._get_names(ROLES_FILE, "roles")
 
     def add_role(self, name):
-        data = self._load_json(ROLES_FILE)
-        if name and name not in data:
-            data.append(name)
-            data.sort()
-            self._save_json(ROLES_FILE, data)
-            log_agent.log_event("DATA", f"New Role Added: {name}")
+        self._add_name(ROLES_FILE, "roles", name, "Role")
 
     # --- CLIENTS ---
     def get_clients(self):
         """Returns list of client names."""
-        data = self._load_json(CLIENTS_FILE)
-        return [c["name"] for c in data]
+        if self.db:
+            return self.db.get_clients()
+        return list(self._cached(CLIENTS_FILE).names)
 
-    def add_client(self, name):
-        data = self._load_json(CLIENTS_FILE)
-        # Check duplicate
-        if any(c['name'].lower() == name.lower() for c in data):
-            return False
-        
-        new_client = {
+    def add_client(self, name, client=None):
+        """``client``: full record to keep (replicated from another node) instead of a new one."""
+        new_client = client or {
             "id": str(uuid.uuid4())[:8],
             "name": name,
             "created_at": datetime.now().isoformat()
         }
-        data.append(new_client)
-        self._save_json(CLIENTS_FILE, data)
+        if self.db:
+            # UNIQUE COLLATE NOCASE does the duplicate check
+            if not self.db.add_client(new_client):
+                return False
+            self._log_ops([("create", "client", name, new_client)])
+            log_agent.log_event("DATA", f"New Client Added: {name}")
+            return True
+
+        with self._cache_lock:
+            entry = self._cached(CLIENTS_FILE)
+            # Check duplicate
+            if name.lower() in entry.keys:
+                return False
+            entry.add(new_client)
+            self._write_through(CLIENTS_FILE, entry)
+        self._log_ops([("create", "client", name, new_client)])
         log_agent.log_event("DATA", f"New Client Added: {name}")
         return True
 
     # --- TASKS / LOGS ---
+    def get_tasks(self):
+        """Returns all registry entries, newest first."""
+        if self.db:
+            return self.db.query_tasks()
+        return self.tasks.load_all()
+
+    def query(self, filters=None, sort="-timestamp", offset=0, limit=DEFAULT_PAGE_SIZE):
+        """
+        Returns a lazy QueryPage over the registry.
+        ``filters``: {"field": value | [values], "since": iso, "until": iso}
+        ``sort``: field name, '-' prefix for descending (default newest first).
+        ``limit=None`` streams every match. Memory stays flat either way: the
+        SQLite backend pages with WHERE / ORDER BY / LIMIT, the JSON backend
+        streams the monthly shards, newest first.
+        """
+        if self.db:
+            fetch = lambda off, lim: self.db.iter_tasks(filters, sort, off, lim)
+            count = lambda: self.db.count_tasks(filters)
+        elif not filters and sort == "-timestamp":
+            # Unfiltered recent-first pages skip whole shards via the manifest
+            fetch = lambda off, lim: select(self.tasks.iter_records(skip=off), None, sort, 0, lim)
+            count = self.tasks.count
+        else:
+            fetch = lambda off, lim: select(self.tasks.iter_records(filters), filters, sort, off, lim)
+            count = lambda: sum(1 for _ in select(self.tasks.iter_records(filters), filters))
+        return QueryPage(fetch, count, filters, sort, offset, limit)
+
+    def get_task_entries(self, ids):
+        """Returns {id: entry} for the given ids, stopping as soon as all are found."""
+        wanted = set(ids)
+        found = {}
+        if not wanted:
+            return found
+        for entry in self.query({"id": wanted}, limit=None):
+            found[entry["id"]] = entry
+            if len(found) == len(wanted):
+                break
+        return found
+
+    def has_task_entry(self, entry_id):
+        """Whether an entry is in the registry (locator first; the shard scan only on a miss)."""
+        if not entry_id:
+            return False
+        return entry_id in self.locator or bool(self.get_task_entries([entry_id]))
+
+    def load_records(self, filters=None, sort="-timestamp", limit=None):
+        """
+        Matching entries as compact CaptureRecords, for holding large parts of the
+        registry in memory (notes / AI analysis are fetched on first access).
+        """
+        return self.compact_records(self.query(filters, sort, limit=limit))
+
+    def compact_records(self, entries):
+        return compact(entries, self._fetch_entry)
+
+    def _fetch_entry(self, entry_id, timestamp=None):
+        """One full entry; the timestamp narrows the read to its month shard."""
+        filters = {"id": entry_id}
+        if timestamp:
+            filters.update(since=timestamp, until=timestamp + "~")
+        return next(iter(self.query(filters, limit=1)), None)
+
     def add_task_entry(self, entry_data):
         """
-        Adds a record to tasks.json. 
+        Appends a record to the current month's task shard.
         entry_data should contain: title, type, universe, project, client, file_path, tags
         """
-        data = self._load_json(TASKS_FILE)
-        
         record = {
             "id": str(uuid.uuid4()),
             "timestamp": datetime.now().isoformat(),
             "status": "todo" if entry_data.get('type') == 'Task' else "info",
             **entry_data
         }
+        if record.get(SIZE_FIELD) is None:
+            # Measured once: stats subtract this on delete/archive even if the files are gone by then
+            record[SIZE_FIELD] = file_bytes(record)
         
-        data.insert(0, record) # Prepend (newest first)
-        self._save_json(TASKS_FILE, data)
+        txn = self._active_transaction()
+        if txn is not None:
+            txn.tasks.append(record) # Derived indexes are updated on commit
+        if self.db:
+            self.db.add_task(record)
+        elif txn is None:
+            self.tasks.append(record) # O(1) append; older shards are never touched
+        self._log_ops([("create", "entry", record["id"], record)])
+        if txn is None:
+            self._on_tasks_added([record])
         log_agent.log_event("DATA", f"Task/Entry indexed: {entry_data.get('title')}")
 
+    def update_task_entries(self, changes_by_id):
+        """
+        Applies {id: {field: value}} to existing entries and returns the updated
+        records. Only the month shards (or SQLite rows) holding them are rewritten.
+        """
+        entries = self.get_task_entries(changes_by_id)
+        if not entries:
+            return []
+        try:
+            # The changes are merged into the stored record under the store's lock,
+            # not into the snapshot read above (other writers may have edited it since)
+            if self.db:
+                updated = self.db.merge_tasks({i: changes_by_id[i] for i in entries})
+            else:
+                updated = self.tasks.rewrite(patches=[(e, changes_by_id[i]) for i, e in entries.items()])
+        except Exception as e:
+            log_agent.error("Failed to update registry entries", e)
+            return []
+        if not updated:
+            return []
+        self.locator.record_many(
+            (r['id'], changes_by_id[r['id']].get('file_path'), changes_by_id[r['id']].get('md_path')) for r in updated
+        )
+        self.stats.apply(added=updated, removed=entries.values())
+        self.search_index.update(entries.values(), updated)
+        self._patch_records(added=updated)
+        # Changes that only touch file locations are logged as moves
+        self._log_ops([("move" if set(changes_by_id[r['id']]) <= {"file_path", "md_path"} else "update",
+                        "entry", r['id'], changes_by_id[r['id']]) for r in updated])
+        log_agent.log_event("DATA", f"{len(updated)} registry entries updated")
+        return updated
+
+    def delete_task_entries(self, ids):
+        """Removes entries from the registry (their shards are rewritten); returns how many."""
+        entries = list(self.get_task_entries(ids).values())
+        if not entries:
+            return 0
+        try:
+            if self.db:
+                self.db.delete_tasks([e['id'] for e in entries])
+            else:
+                self.tasks.rewrite(deleted=entries)
+        except Exception as e:
+            log_agent.error("Failed to delete registry entries", e)
+            return 0
+        self.locator.remove([e['id'] for e in entries])
+        self.stats.apply(removed=entries)
+        self.search_index.remove(entries)
+        self.phash_index.remove(e['id'] for e in entries) # Backfilled hashes have no phash field, so every id
+        self._patch_records(removed=[e['id'] for e in entries])
+        self._log_ops([("delete", "entry", e['id'], None) for e in entries])
+        log_agent.log_event("DATA", f"{len(entries)} registry entries deleted")
+        return len(entries)
+
+    def _on_tasks_added(self, records):
+        """Keeps derived indexes in step with newly committed entries."""
+        if records:
+            self.search_index.add(records)
+            self.phash_index.add((r["id"], int(r["phash"], 16)) for r in records if r.get("phash"))
+            self.locator.add(records)
+            self.stats.apply(added=records)
+            self._patch_records(added=records)
+
+    # --- STATS ---
+    def get_stats(self):
+        """Materialised counters (see RegistryStats); rebuilt only if they drifted."""
+        count = (lambda: self.db.count_tasks()) if self.db else self.tasks.count
+        backfill = self.stats.ensure(count, lambda: self.query(limit=None))
+        if backfill:
+            # Local file sizes of older entries: not op-logged, every node measures its own
+            with self.replicating():
+                self.update_task_entries(backfill)
+        return self.stats.snapshot()
+
+    # --- FILE LOCATION ---
+    def locate(self, entry, kind="img"):
+        """
+        Current path of an entry's image (``kind="img"``) or note (``"md"``).
+        Tries the locator index, then the path stored on the entry; returns None
+        when neither exists on disk (the caller may then scan, see identify()).
+        """
+        known = self.locator.get(entry.get("id")) or {}
+        stored = entry.get("file_path" if kind == "img" else "md_path")
+        for path in (known.get(kind), stored):
+            if path and os.path.exists(path):
+                return path
+        return None
+
+    def sync_locator(self):
+        """Registers the paths of entries saved before the locator existed."""
+        missing = [e for e in self.query(limit=None) if e.get("id") and e["id"] not in self.locator]
+        if missing:
+            self.locator.add(missing)
+            log_agent.log_event("DATA", f"Locator caught up with {len(missing)} entries")
+
+    def identify(self, entry, path, kind="img"):
+        """
+        Checks a candidate file against the entry id embedded in its header.
+        Returns True/False, or None for legacy files that carry no id.
+        If the ids match, the locator is updated.
+        """
+        file_id = read_file_id(path)
+        if file_id is None:
+            return None
+        if file_id != entry.get("id"):
+            return False
+        self.locator.record(file_id, **{kind: os.path.abspath(path)})
+        return True
+
+    # --- SEARCH ---
+    def search(self, query, limit=None, prefix_last=False):
+        """Full-text search over the registry; returns entry ids, best match first."""
+        self.search_index.load(self.get_tasks)
+        return self.search_index.search(query, limit=limit, prefix_last=prefix_last)
+
+    def warm_up(self):
+        """Loads the search and perceptual-hash indexes on a background thread, so the first search does not."""
+        def load():
+            try:
+                self.search_index.load(self.get_tasks)
+                self.phash_index.load(self.get_tasks)
+            except Exception as e:
+                log_agent.error("Index warm-up failed", e)
+        threading.Thread(target=load, name="index-warm-up", daemon=True).start()
+
+    def _record_map(self):
+        """
+        Compact record of every JSON-registry entry by id, so search hits resolve
+        without streaming the shards. Rebuilt when another instance changed the registry.
+        """
+        with self._records_lock:
+            version = self.tasks.version()
+            if self._records is None or version != self._records_version:
+                self._records = {r.id: r for r in self.load_records()}
+                self._records_version = version
+            return self._records
+
+    def _patch_records(self, added=(), removed=()):
+        """Keeps the id map in step with this instance's own writes."""
+        with self._records_lock:
+            if self._records is None:
+                return
+            for entry_id in removed:
+                self._records.pop(entry_id, None)
+            for record in self.compact_records(added):
+                self._records[record.id] = record
+            self._records_version = self.tasks.version()
+
+    def resolve(self, ids):
+        """Compact records for ``ids`` (e.g. search hits), in order; unknown ids are skipped."""
+        if self.db:
+            # Indexed primary-key lookups; no map needed
+            found = self.get_task_entries(ids)
+            return self.compact_records(found[i] for i in ids if i in found)
+        records = self._record_map()
+        return [records[i] for i in ids if i in records]
+
+    # --- NEAR-DUPLICATES ---
+    def find_near_duplicates(self, phash, max_distance=DEFAULT_MAX_DISTANCE, exclude=None):
+        """Entries whose capture hash is within ``max_distance`` bits: [(id, distance)], closest first."""
+        self.phash_index.load(self.get_tasks)
+        return self.phash_index.find(phash, max_distance, exclude)
+
+    def duplicate_groups(self, max_distance=DEFAULT_MAX_DISTANCE):
+        self.phash_index.load(self.get_tasks)
+        return self.phash_index.duplicate_groups(max_distance)
+
+    def backfill_phashes(self):
+        """Hashes captures saved before the perceptual index existed (decodes each image once)."""
+        self.phash_index.load(self.get_tasks)
+        items = []
+        for entry in self.query(limit=None):
+            path = entry.get("file_path")
+            if entry.get("id") in self.phash_index or not path or not os.path.exists(path):
+                continue
+            try:
+                items.append((entry["id"], dhash_file(path)))
+            except Exception as e:
+                log_agent.error(f"Could not hash {path}", e)
+        if items:
+            self.phash_index.add(reversed(items))
+            log_agent.log_event("DATA", f"Perceptual index backfilled with {len(items)} captures")
+
 data_manager = DataManager()
@@ -0,0 +1,111 @@
+import csv
+import json
+import os
+import sys
+import time
+from logger_agent import log_agent
+from src.core.data_manager import data_manager
+
+try:
+    # Parquet output is optional (pyarrow is a large dependency)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+FORMATS = ("csv", "ndjson", "parquet")
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".parquet": "parquet"}
+# Columns of tabular exports when none are given (NDJSON keeps whole records)
+DEFAULT_COLUMNS = ("id", "timestamp", "type", "status", "title", "universe", "project",
+                   "client", "role", "tags", "file_path", "md_path")
+# Rows buffered per Parquet row group; the only thing held in memory
+BATCH_SIZE = 5000
+
+def format_for(path, fmt=None):
+    """Explicit format, or the one implied by the file extension (CSV by default)."""
+    if fmt:
+        return fmt
+    return EXTENSIONS.get(os.path.splitext(path or "")[1].lower(), "csv")
+
+def _cell(value):
+    """Flat text for tabular formats (lists and dicts become JSON)."""
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+def _write_csv(f, rows, columns):
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([_cell(row.get(c)) for c in columns])
+        count += 1
+    return count
+
+def _write_ndjson(f, rows, columns):
+    count = 0
+    for row in rows:
+        if columns:
+            row = {c: row.get(c) for c in columns}
+        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+def _write_parquet(path, rows, columns):
+    schema = pa.schema([(c, pa.string()) for c in columns])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = {c: [] for c in columns}
+        for row in rows:
+            for c in columns:
+                batch[c].append(_cell(row.get(c)))
+            count += 1
+            if count % BATCH_SIZE == 0:
+                writer.write_table(pa.table(batch, schema=schema))
+                batch = {c: [] for c in columns}
+        if batch[columns[0]] or not count:
+            writer.write_table(pa.table(batch, schema=schema))
+    return count
+
+def export_registry(out_path, fmt=None, columns=None, filters=None):
+    """
+    Streams registry entries (``data_manager.query`` filters, newest first) to
+    ``out_path`` as CSV, NDJSON or Parquet. Memory stays flat: shards are read
+    one at a time and rows are written as they arrive (Parquet buffers one row
+    group). ``out_path="-"`` writes CSV/NDJSON to stdout.
+    Returns {rows, path, format, seconds}.
+    """
+    fmt = format_for(out_path, fmt)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}' (expected {', '.join(FORMATS)})")
+    if fmt == "parquet" and pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    if fmt != "ndjson" and not columns:
+        columns = DEFAULT_COLUMNS
+    columns = tuple(columns) if columns else None
+
+    started = time.time()
+    rows = data_manager.query(filters, limit=None)
+    if out_path == "-":
+        if fmt == "parquet":
+            raise ValueError("Parquet cannot be written to stdout")
+        count = (_write_csv if fmt == "csv" else _write_ndjson)(sys.stdout, rows, columns)
+    else:
+        tmp_path = out_path + ".tmp"
+        try:
+            if fmt == "parquet":
+                count = _write_parquet(tmp_path, rows, columns)
+            else:
+                with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                    count = (_write_csv if fmt == "csv" else _write_ndjson)(f, rows, columns)
+            os.replace(tmp_path, out_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    summary = {"rows": count, "path": out_path, "format": fmt, "seconds": round(time.time() - started, 2)}
+    log_agent.log_event("DATA", f"Exported {count} registry entries as {fmt}", path=out_path, seconds=summary["seconds"])
+    return summary
@@ -0,0 +1,208 @@
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from logger_agent import log_agent
+from src.core.blob_store import BLOB_DIR
+from src.core.config import ConfigManager
+from src.core.data_manager import data_manager
+from src.core.locator import path_key
+
+OUTPUT_ATTACHMENTS = os.path.join("output", "attachments")
+# Unsaved captures younger than this may still be open in the editor
+TEMP_MAX_AGE = 6 * 3600
+TEMP_RE = re.compile(r"^temp_\d+\.png$", re.I)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".avif")
+CATEGORIES = ("temp", "dangling", "orphans", "blobs")
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+def human_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+def _list_attachments(directory):
+    """(subdirectories, [(path, size, mtime, nlink)] of images directly inside an attachments folder)."""
+    subdirs, files = [], []
+    in_attachments = os.path.basename(directory).lower() == "attachments"
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif in_attachments and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    st = entry.stat(follow_symlinks=False)
+                    files.append((os.path.abspath(entry.path), st.st_size, st.st_mtime, st.st_nlink))
+    except OSError:
+        pass
+    return subdirs, files
+
+class GarbageCollector:
+    """
+    Cross-references the registry, the notes and the attachment folders.
+
+    Finds: ``temp`` captures left by cancelled edits, ``dangling`` registry
+    entries whose image and note are both gone, ``orphans`` (attachments no entry
+    and no sibling note refers to) and unreferenced content-addressed ``blobs``.
+    ``collect(reclaim=False)`` only reports; ``reclaim=True`` deletes.
+    """
+
+    def __init__(self, paths=None):
+        self.paths = paths or ConfigManager.get_dynamic_paths()
+        self.vault_root = os.path.abspath(self.paths['root'])
+
+    # --- SCANNING ---
+    def _scan(self, pool):
+        roots = [os.path.abspath(self.paths[k]) for k in ("root", "universes", "projects") if self.paths.get(k)]
+        roots.append(os.path.abspath(OUTPUT_ATTACHMENTS))
+        seen, files, pending = set(), [], []
+        for root in roots:
+            if os.path.isdir(root) and path_key(root) not in seen:
+                seen.add(path_key(root))
+                pending.append(pool.submit(_list_attachments, root))
+        while pending:
+            subdirs, found = pending.pop().result()
+            files.extend(found)
+            for sub in subdirs:
+                if path_key(sub) not in seen:
+                    seen.add(path_key(sub))
+                    pending.append(pool.submit(_list_attachments, sub))
+        return files
+
+    @staticmethod
+    def _note_text(directory):
+        """Concatenated notes of a folder (the notes that embed its attachments/)."""
+        chunks = []
+        try:
+            for name in os.listdir(directory):
+                if name.lower().endswith(".md"):
+                    with open(os.path.join(directory, name), "r", encoding="utf-8", errors="ignore") as f:
+                        chunks.append(f.read())
+        except OSError:
+            pass
+        return "\n".join(chunks)
+
+    def find(self, categories=CATEGORIES):
+        """Returns {category: [(path or entry id, bytes)]} without touching anything."""
+        report = {c: [] for c in categories}
+        entries = list(data_manager.query(limit=None))
+        referenced = {path_key(e['file_path']) for e in entries if e.get('file_path')}
+
+        with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+            files = self._scan(pool) if {"temp", "orphans"} & set(categories) else []
+
+            if "dangling" in categories:
+                vault_key = path_key(self.vault_root) + os.sep
+                vault_online = os.path.isdir(self.vault_root)
+
+                archives = {}
+                def in_archive(entry):
+                    """True unless the entry's archive is readable and lacks its member (an offline archive counts as live)."""
+                    zip_path = entry['archive_path']
+                    if zip_path not in archives:
+                        try:
+                            with zipfile.ZipFile(zip_path) as zf:
+                                archives[zip_path] = set(zf.namelist())
+                        except (OSError, zipfile.BadZipFile):
+                            archives[zip_path] = None
+                    names = archives[zip_path]
+                    return names is None or entry.get('archive_member') in names
+
+                def is_dangling(entry):
+                    # Archived captures have no file_path; the zip member is their image
+                    if entry.get('archive_path') and in_archive(entry):
+                        return False
+                    paths = [p for p in (entry.get('file_path'), entry.get('md_path')) if p]
+                    if not paths:
+                        # Both cleared (e.g. by the vault watcher once it confirmed the deletes)
+                        return True
+                    if any(os.path.exists(p) for p in paths):
+                        return False
+                    # Only trust "missing" where the location is reachable (not an unplugged drive)
+                    reachable = any(os.path.isdir(os.path.dirname(p)) or (vault_online and path_key(p).startswith(vault_key))
+                                    for p in paths)
+                    if not reachable:
+                        return False
+                    # The locator may know where the files went
+                    return not (data_manager.locate(entry) or data_manager.locate(entry, "md"))
+                flags = pool.map(is_dangling, entries)
+                report["dangling"] = [(e['id'], 0) for e, dead in zip(entries, flags) if dead]
+
+            orphan_candidates = []
+            now = time.time()
+            for path, size, mtime, nlink in files:
+                if path_key(path) in referenced:
+                    continue
+                if TEMP_RE.match(os.path.basename(path)):
+                    if "temp" in categories and now - mtime > TEMP_MAX_AGE:
+                        report["temp"].append((path, size))
+                elif "orphans" in categories:
+                    orphan_candidates.append((path, size))
+
+            if orphan_candidates:
+                # Attachments embedded by a note in the parent folder are kept
+                parents = {os.path.dirname(os.path.dirname(p)) for p, _ in orphan_candidates}
+                texts = dict(zip(parents, pool.map(self._note_text, parents)))
+                for path, size in orphan_candidates:
+                    if os.path.basename(path) not in texts[os.path.dirname(os.path.dirname(path))]:
+                        report["orphans"].append((path, size))
+
+        if "blobs" in categories:
+            report["blobs"] = self._orphan_blobs()
+        return report
+
+    def _orphan_blobs(self):
+        """Blobs whose only remaining link is the store itself."""
+        store = os.path.join(self.vault_root, BLOB_DIR)
+        found = []
+        for dirpath, _, names in os.walk(store):
+            for name in names:
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if st.st_nlink == 1:
+                    found.append((path, st.st_size))
+        return found
+
+    # --- RECLAIMING ---
+    def collect(self, reclaim=False, categories=CATEGORIES):
+        """
+        Finds garbage and, with ``reclaim``, deletes it (``True`` for every category,
+        or a tuple of categories). Returns {category: {count, bytes, items}}.
+        """
+        started = time.time()
+        report = self.find(categories)
+        summary = {}
+        for category, items in report.items():
+            summary[category] = {"count": len(items), "bytes": sum(size for _, size in items), "items": [i for i, _ in items]}
+
+        reclaimed = categories if reclaim is True else tuple(reclaim or ())
+        if reclaimed:
+            for category in ("temp", "orphans", "blobs"):
+                if category not in reclaimed:
+                    continue
+                for path, _ in report.get(category, []):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        log_agent.error(f"GC could not remove {path}", e)
+            if "dangling" in reclaimed and report.get("dangling"):
+                data_manager.delete_task_entries([i for i, _ in report["dangling"]])
+
+        total = sum(s["bytes"] for s in summary.values())
+        counts = ", ".join(f"{c}={s['count']}" for c, s in summary.items())
+        log_agent.log_event("GC", f"Garbage collection ({counts}), {human_size(total)} found",
+                            reclaimed=",".join(reclaimed) or "none",
+                            seconds=round(time.time() - started, 2))
+        return summary
+
+def collect_garbage(reclaim=False, categories=CATEGORIES, paths=None):
+    return GarbageCollector(paths).collect(reclaim, categories)
@@ -0,0 +1,145 @@
+import io
+import math
+import time
+import numpy as np
+from PIL import Image, features
+from src.core.config import ConfigManager
+from src.core.locator import image_metadata
+
+# config.yaml ``image_encoding``: a policy name, or {vault_root: policy, "default": policy}
+POLICIES = ("png", "png-palette", "auto", "lossy")
+# Plain PNG unless the user opts into another policy
+DEFAULT_POLICY = "png"
+# auto: time a full-colour capture may take to encode (config.yaml ``encode_budget_ms``)
+DEFAULT_BUDGET_MS = 150
+# auto's lossless candidates for full-colour captures: format, save options and seed estimates
+# (ms per megapixel, bytes per pixel); every save refines its kind's estimates
+CANDIDATES = {
+    "png": ("PNG", {}, 70.0, 0.15),
+    "png-optimized": ("PNG", {"optimize": True}, 250.0, 0.145),
+    "webp-lossless": ("WEBP", {"lossless": True, "method": 1}, 150.0, 0.05),
+}
+ESTIMATE_WEIGHT = 0.3 # Share of the latest save in the moving averages
+# Pixels inspected by analyze() (a strided sample; the palette check is exact)
+SAMPLE_PIXELS = 250_000
+# Photo-like content: busy luminance histogram and mostly distinct colours
+PHOTO_ENTROPY = 6.0
+PHOTO_UNIQUE_RATIO = 0.05
+LOSSY_QUALITY = 90
+
+EXTENSIONS = {"PNG": ".png", "WEBP": ".webp", "AVIF": ".avif"}
+
+_estimates = {kind: [ms, bpp] for kind, (_, _, ms, bpp) in CANDIDATES.items()}
+
+def _learn(kind, ms, size, pixels):
+    if kind in _estimates and pixels:
+        est = _estimates[kind]
+        est[0] += ESTIMATE_WEIGHT * (ms * 1e6 / pixels - est[0])
+        est[1] += ESTIMATE_WEIGHT * (size / pixels - est[1])
+
+class EncodedImage:
+    """Encoded bytes plus what was chosen and what it cost."""
+
+    __slots__ = ("data", "format", "kind", "encode_ms", "analysis")
+
+    def __init__(self, data, fmt, kind, encode_ms, analysis):
+        self.data = data
+        self.format = fmt
+        self.kind = kind
+        self.encode_ms = encode_ms
+        self.analysis = analysis
+
+    @property
+    def ext(self):
+        return EXTENSIONS[self.format]
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.data)
+
+def policy_for(vault_root=None, config=None):
+    config = ConfigManager.load() if config is None else config
+    policy = config.get('image_encoding', DEFAULT_POLICY)
+    if isinstance(policy, dict):
+        policy = policy.get(vault_root) or policy.get("default", DEFAULT_POLICY)
+    return policy if policy in POLICIES else DEFAULT_POLICY
+
+def analyze(image):
+    """
+    {palette, colors, unique_ratio, entropy, photo} for an RGB image.
+    ``palette`` is the exact colour list when there are at most 256 colours
+    (Image.getcolors stops counting past that); the rest uses a NumPy sample.
+    """
+    colors = image.getcolors(256)
+    a = np.asarray(image)
+    step = max(1, math.ceil(math.sqrt(a.shape[0] * a.shape[1] / SAMPLE_PIXELS)))
+    sample = a[::step, ::step].reshape(-1, 3).astype(np.uint32)
+    packed = (sample[:, 0] << 16) | (sample[:, 1] << 8) | sample[:, 2]
+    unique_ratio = len(np.unique(packed)) / max(len(packed), 1)
+    lum = (sample[:, 0] * 299 + sample[:, 1] * 587 + sample[:, 2] * 114) // 1000
+    hist = np.bincount(lum, minlength=256) / max(len(lum), 1)
+    hist = hist[hist > 0]
+    entropy = float(-(hist * np.log2(hist)).sum())
+    return {
+        "palette": [c for _, c in colors] if colors else None,
+        "colors": len(colors) if colors else None,
+        "unique_ratio": round(unique_ratio, 4),
+        "entropy": round(entropy, 2),
+        "photo": entropy > PHOTO_ENTROPY and unique_ratio > PHOTO_UNIQUE_RATIO,
+    }
+
+def to_palette(image, palette):
+    """Exact "P" image for an RGB image with <= 256 colours (no quantisation error)."""
+    a = np.asarray(image).astype(np.uint32)
+    packed = (a[..., 0] << 16) | (a[..., 1] << 8) | a[..., 2]
+    table = np.array(sorted((r << 16) | (g << 8) | b for r, g, b in palette), dtype=np.uint32)
+    indexed = Image.fromarray(np.searchsorted(table, packed).astype(np.uint8), "P")
+    rgb = np.stack([(table >> 16) & 255, (table >> 8) & 255, table & 255], axis=1).astype(np.uint8)
+    indexed.putpalette(rgb.tobytes())
+    return indexed
+
+def choose(analysis, policy, lossy_format="WEBP", pixels=0, budget_ms=DEFAULT_BUDGET_MS):
+    """(kind, PIL format, save options) for an analysed capture under ``policy``."""
+    if policy == "png":
+        return "png", "PNG", {}
+    if analysis["palette"] is not None:
+        return "png-palette", "PNG", {}
+    if policy == "png-palette":
+        return "png", "PNG", {}
+    if policy == "lossy" and analysis["photo"]:
+        if lossy_format == "AVIF" and features.check("avif"):
+            return "avif", "AVIF", {"quality": LOSSY_QUALITY - 10, "speed": 8}
+        return "webp", "WEBP", {"quality": LOSSY_QUALITY, "method": 4}
+    # The smallest candidate expected to encode within the budget; plain PNG always qualifies
+    fits = [k for k, (fmt, _, _, _) in CANDIDATES.items()
+            if k == "png" or ((fmt != "WEBP" or features.check("webp")) and _estimates[k][0] * pixels / 1e6 <= budget_ms)]
+    kind = min(fits, key=lambda k: _estimates[k][1])
+    return kind, CANDIDATES[kind][0], dict(CANDIDATES[kind][1])
+
+def encode(image, entry_id=None, policy=None, vault_root=None):
+    """
+    Encodes a capture once, in the format its content calls for. The entry id
+    is embedded (PNG tEXt or XMP), as with the plain PNG save.
+    """
+    config = ConfigManager.load()
+    policy = policy or policy_for(vault_root, config)
+    lossy_format = str(config.get('lossy_format', 'webp')).upper()
+    started = time.perf_counter()
+    image = image.convert("RGB") if image.mode != "RGB" else image
+
+    analysis = analyze(image) if policy != "png" else {"palette": None}
+    kind, fmt, options = choose(analysis, policy, lossy_format, image.width * image.height,
+                                config.get('encode_budget_ms', DEFAULT_BUDGET_MS))
+    if kind == "png-palette":
+        image = to_palette(image, analysis["palette"])
+    if entry_id:
+        options.update(image_metadata(entry_id, fmt))
+    if fmt == "WEBP" and not features.check("webp"):
+        kind, fmt, options = "png", "PNG", image_metadata(entry_id, "PNG") if entry_id else {}
+
+    buffer = io.BytesIO()
+    saving = time.perf_counter()
+    image.save(buffer, format=fmt, **options)
+    _learn(kind, (time.perf_counter() - saving) * 1000, buffer.tell(), image.width * image.height)
+    analysis.pop("palette", None)
+    return EncodedImage(buffer.getvalue(), fmt, kind, round((time.perf_counter() - started) * 1000, 1), analysis)
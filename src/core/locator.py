@@ -0,0 +1,214 @@
+import json
+import os
+import re
+import threading
+from PIL import Image, PngImagePlugin
+from logger_agent import log_agent
+from src.utils.file_lock import FileLock
+
+# PNG tEXt keyword / frontmatter key that carry the registry entry id
+PNG_ID_KEY = "gemshot:id"
+MD_ID_KEY = "id"
+
+def png_info(entry_id):
+    """PngInfo to pass to ``Image.save(..., pnginfo=...)`` so the file carries its entry id."""
+    info = PngImagePlugin.PngInfo()
+    info.add_text(PNG_ID_KEY, entry_id)
+    return info
+
+def xmp_packet(entry_id):
+    """Minimal XMP packet carrying the entry id (WebP/AVIF have no tEXt chunks)."""
+    return (f'<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+            f'<rdf:Description xmlns:gemshot="https://gemshot.local/ns/" gemshot:id="{entry_id}"/>'
+            f'</rdf:RDF></x:xmpmeta>').encode("utf-8")
+
+def image_metadata(entry_id, fmt):
+    """Save options that embed the entry id for a PIL format name."""
+    return {"pnginfo": png_info(entry_id)} if fmt == "PNG" else {"xmp": xmp_packet(entry_id)}
+
+def read_png_id(path):
+    """Entry id embedded in a capture (PNG tEXt, or XMP for WebP/AVIF). Image.open stops before the pixel data."""
+    try:
+        with Image.open(path) as img:
+            if PNG_ID_KEY in img.info:
+                return img.info[PNG_ID_KEY]
+            xmp = img.info.get("xmp")
+            if isinstance(xmp, bytes):
+                xmp = xmp.decode("utf-8", "ignore")
+            match = re.search(PNG_ID_KEY + r'="([^"]+)"', xmp or "")
+            return match.group(1) if match else None
+    except Exception:
+        return None
+
+def read_md_id(path):
+    """Entry id from a note's frontmatter; stops reading at the closing '---'."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if f.readline().strip() != "---":
+                return None
+            for line in f:
+                line = line.strip()
+                if line == "---":
+                    break
+                key, sep, value = line.partition(":")
+                if sep and key.strip() == MD_ID_KEY:
+                    return value.strip() or None
+    except Exception:
+        pass
+    return None
+
+def path_key(path):
+    """Normalised form used to compare paths (absolute; case-folded on Windows)."""
+    return os.path.normcase(os.path.abspath(path))
+
+def read_file_id(path):
+    if path.lower().endswith(".md"):
+        return read_md_id(path)
+    return read_png_id(path)
+
+class Locator:
+    """
+    Persistent entry id -> {"img": path, "md": path} map.
+    Stored as JSONL where the last line for an id wins, so moving a file is an
+    O(1) append and a delete appends a ``"del"`` tombstone; the file is
+    rewritten once stale lines outnumber live ones.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._lock = threading.RLock()
+        self._paths = None
+        self._by_path = {}   # path_key -> (entry id, "img" | "md")
+        self._lines = 0
+
+    def _load(self):
+        if self._paths is not None:
+            return
+        self._paths = {}
+        self._by_path = {}
+        self._lines = 0
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._lines += 1
+                    self._set(rec["id"], None if rec.get("del") else {"img": rec.get("img", ""), "md": rec.get("md", "")})
+        except Exception as e:
+            log_agent.error(f"Failed to load {self.index_path}", e)
+
+    def _set(self, entry_id, paths):
+        old = self._paths.get(entry_id)
+        if old:
+            for kind in ("img", "md"):
+                if old[kind]:
+                    self._by_path.pop(path_key(old[kind]), None)
+        if paths is None:
+            self._paths.pop(entry_id, None)
+            return
+        self._paths[entry_id] = paths
+        for kind in ("img", "md"):
+            if paths[kind]:
+                self._by_path[path_key(paths[kind])] = (entry_id, kind)
+
+    def get(self, entry_id):
+        """Last known {img, md} of an entry, or None."""
+        with self._lock:
+            self._load()
+            return self._paths.get(entry_id)
+
+    def __contains__(self, entry_id):
+        with self._lock:
+            self._load()
+            return entry_id in self._paths
+
+    def owner(self, path):
+        """(entry id, kind) of the entry a file belongs to, or None."""
+        with self._lock:
+            self._load()
+            return self._by_path.get(path_key(path))
+
+    def owners_under(self, directory):
+        """[(path, entry id, kind)] for every known file below ``directory``."""
+        prefix = path_key(directory).rstrip(os.sep) + os.sep
+        with self._lock:
+            self._load()
+            found = []
+            for entry_id, paths in self._paths.items():
+                for kind in ("img", "md"):
+                    if paths[kind] and path_key(paths[kind]).startswith(prefix):
+                        found.append((paths[kind], entry_id, kind))
+            return found
+
+    def record(self, entry_id, img=None, md=None):
+        """Updates the known location(s) of an entry; ``None`` leaves a path unchanged."""
+        self.record_many([(entry_id, img, md)])
+
+    def record_many(self, items):
+        with self._lock:
+            self._load()
+            lines = []
+            for entry_id, img, md in items:
+                if not entry_id:
+                    continue
+                current = self._paths.get(entry_id, {"img": "", "md": ""})
+                updated = {"img": current["img"] if img is None else img,
+                           "md": current["md"] if md is None else md}
+                if updated == self._paths.get(entry_id):
+                    continue
+                self._set(entry_id, updated)
+                lines.append(json.dumps({"id": entry_id, **updated}, ensure_ascii=False) + "\n")
+            self._append(lines)
+
+    def remove(self, entry_ids):
+        with self._lock:
+            self._load()
+            lines = []
+            for entry_id in entry_ids:
+                if entry_id in self._paths:
+                    self._set(entry_id, None)
+                    lines.append(json.dumps({"id": entry_id, "del": 1}) + "\n")
+            self._append(lines)
+
+    def _append(self, lines):
+        if not lines:
+            return
+        try:
+            # Same lock as compaction, which another instance may be running
+            with FileLock(self.index_path), open(self.index_path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+            self._lines += len(lines)
+        except Exception as e:
+            log_agent.error(f"Failed to update {self.index_path}", e)
+        if self._lines > 2 * len(self._paths) + 100:
+            self._rewrite()
+
+    def add(self, records):
+        """Registers the paths of newly committed registry entries."""
+        self.record_many((r.get("id"), r.get("file_path") or "", r.get("md_path") or "") for r in records)
+
+    def _rewrite(self):
+        """Keeps the last line of each live id. Re-read under the append lock, so no other instance's line is lost."""
+        tmp = self.index_path + ".tmp"
+        try:
+            with FileLock(self.index_path):
+                latest = {}
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            rec = json.loads(line)
+                        except ValueError:
+                            continue
+                        latest.pop(rec["id"], None) # Re-inserted last: keeps the file in write order
+                        if not rec.get("del"):
+                            latest[rec["id"]] = line
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.writelines(latest.values())
+                os.replace(tmp, self.index_path)
+            self._lines = len(latest)
+        except Exception as e:
+            log_agent.error(f"Failed to compact {self.index_path}", e)
@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from logger_agent import log_agent
+from src.core.config import ConfigManager
+from src.utils.file_lock import FileLock
+
+OPS = ("create", "update", "move", "delete")
+KINDS = ("entry", "universe", "project", "role", "client")
+# Entry fields that hold file locations (made vault-relative in the log)
+PATH_FIELDS = ("file_path", "md_path", "archive_path", "archived_from")
+VAULT_PREFIX = "vault:"
+
+def node_id():
+    """This install's replication id (``node_id`` in config.yaml, created on first use)."""
+    node = ConfigManager.load().get('node_id')
+    if not node:
+        node = uuid.uuid4().hex[:12]
+        ConfigManager.save({"node_id": node})
+    return node
+
+def portable_path(path, vault_root):
+    """Paths inside the vault are logged relative to it, so peers with another vault_root can resolve them."""
+    if not path or not vault_root:
+        return path
+    root = os.path.abspath(vault_root)
+    full = os.path.abspath(path)
+    if os.path.normcase(full).startswith(os.path.normcase(root) + os.sep):
+        return VAULT_PREFIX + os.path.relpath(full, root).replace(os.sep, "/")
+    return path
+
+def local_path(path, vault_root):
+    if path and path.startswith(VAULT_PREFIX):
+        return os.path.join(os.path.abspath(vault_root), *path[len(VAULT_PREFIX):].split("/"))
+    return path
+
+def _last_line(path, block=65536):
+    """Last complete line of a file, read backwards (the log can be large)."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            data = b""
+            pos = end
+            while pos > 0:
+                step = min(block, pos)
+                pos -= step
+                f.seek(pos)
+                data = f.read(step) + data
+                lines = data.rstrip(b"\n").split(b"\n")
+                if len(lines) > 1 or pos == 0:
+                    return lines[-1].decode("utf-8", errors="ignore")
+    except OSError:
+        pass
+    return ""
+
+class OpLog:
+    """
+    Append-only log of registry operations, one JSONL file per node
+    (``<log_dir>/<node_id>.jsonl``). Every line is
+    ``{"node", "seq", "ts", "op", "kind", "key", "data"}`` with ``seq`` strictly
+    increasing per node, so a peer only needs the ops above the last ``seq`` it
+    applied from that node. ``state.json`` keeps those high-water marks and the
+    last exported ``seq``.
+    """
+
+    def __init__(self, log_dir, node=None):
+        self.log_dir = log_dir
+        self.state_path = os.path.join(log_dir, "state.json")
+        self._node = node
+        self._lock = threading.Lock()
+        self._seq = None
+        self._size = None
+
+    @property
+    def node(self):
+        if self._node is None:
+            self._node = node_id()
+        return self._node
+
+    @property
+    def path(self):
+        return os.path.join(self.log_dir, f"{self.node}.jsonl")
+
+    def last_seq(self):
+        line = _last_line(self.path)
+        try:
+            return json.loads(line)["seq"] if line else 0
+        except (ValueError, KeyError):
+            log_agent.error(f"Unreadable tail in {self.path}, rescanning")
+            return max((op["seq"] for op in self.read()), default=0)
+
+    # --- WRITE PATH ---
+    def record(self, ops):
+        """Appends ``ops`` as (op, kind, key, data) tuples; returns the last seq written."""
+        ops = list(ops)
+        if not ops:
+            return self._seq
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            with self._lock, FileLock(self.path):
+                size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+                if self._seq is None or size != self._size:
+                    self._seq = self.last_seq() # First write, or another instance of this node appended
+                now = datetime.now().isoformat()
+                vault_root = ConfigManager.get_dynamic_paths()['root']
+                lines = []
+                for op, kind, key, data in ops:
+                    if kind == "entry" and data:
+                        data = {k: portable_path(v, vault_root) if k in PATH_FIELDS else v for k, v in data.items()}
+                    self._seq += 1
+                    lines.append(json.dumps({"node": self.node, "seq": self._seq, "ts": now, "op": op,
+                                             "kind": kind, "key": key, "data": data}, ensure_ascii=False) + "\n")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+                self._size = os.path.getsize(self.path)
+                return self._seq
+        except Exception as e:
+            log_agent.error("Failed to write registry op-log", e)
+            return self._seq
+
+    # --- READ PATH ---
+    def read(self, since=0, path=None):
+        """Streams the ops of a log file (ours by default) with ``seq > since``."""
+        path = path or self.path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        log_agent.error(f"Skipping corrupt op-log line in {path}")
+                        continue
+                    if op.get("seq", 0) > since:
+                        yield op
+        except FileNotFoundError:
+            return
+
+    # --- HIGH-WATER MARKS ---
+    def load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        except Exception as e:
+            log_agent.error(f"Failed to load {self.state_path}", e)
+            state = {}
+        state.setdefault("applied", {})
+        state.setdefault("exported", 0)
+        return state
+
+    def save_state(self, **changes):
+        """Merges ``changes`` into state.json (``applied`` marks only ever move forward)."""
+        os.makedirs(self.log_dir, exist_ok=True)
+        with FileLock(self.state_path):
+            state = self.load_state()
+            for node, seq in changes.pop("applied", {}).items():
+                state["applied"][node] = max(seq, state["applied"].get(node, 0))
+            state.update(changes)
+            tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=4, sort_keys=True)
+            os.replace(tmp_path, self.state_path)
+            return state
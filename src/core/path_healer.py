@@ -0,0 +1,154 @@
+import json
+import os
+import re
+import time
+from logger_agent import log_agent
+from src.core.config import ConfigManager
+from src.core.data_manager import DATA_DIR, data_manager
+
+TIMESTAMP_RE = re.compile(r"(\d{10})")
+OUTPUT_ATTACHMENTS = os.path.join("output", "attachments")
+# When the last full pass finished; heal_paths() skips passes within HEAL_INTERVAL of it
+# (the vault watcher keeps paths current in between)
+HEAL_STATE_FILE = os.path.join(DATA_DIR, "heal_state.json")
+HEAL_INTERVAL = 3600
+
+def _name_part(title):
+    return "".join(x for x in (title or "") if x.isalnum() or x in " -_").strip().lower()
+
+class DirectoryCache:
+    """Lists each directory at most once per healing pass."""
+
+    def __init__(self):
+        self._names = {}
+        self._stamps = {}
+        self.listed = 0
+
+    def names(self, directory):
+        names = self._names.get(directory)
+        if names is None:
+            try:
+                names = os.listdir(directory)
+                self.listed += 1
+            except OSError:
+                names = []
+            self._names[directory] = names
+        return names
+
+    def by_timestamp(self, directory):
+        """{10-digit unix timestamp: file name} for a directory (capture file names embed one)."""
+        stamps = self._stamps.get(directory)
+        if stamps is None:
+            stamps = {}
+            for name in self.names(directory):
+                for ts in TIMESTAMP_RE.findall(name):
+                    stamps.setdefault(ts, name)
+            self._stamps[directory] = stamps
+        return stamps
+
+class PathHealer:
+    """
+    One batched pass that re-finds moved images and notes of registry entries.
+
+    Dead entries are resolved through the locator first, then against a shared
+    directory cache (PARA project/universe folders, their attachments, the local
+    output folder), using the capture timestamp in the old file name, then the
+    title. Candidates that embed an entry id must carry the right one. Fixed
+    paths are written back with DataManager.update_task_entries().
+    """
+
+    def __init__(self, paths=None):
+        self.paths = paths or ConfigManager.get_dynamic_paths()
+        self.cache = DirectoryCache()
+
+    def _search_dirs(self, entry, kind):
+        proj = (entry.get('project') or '').strip()
+        uni = (entry.get('universe') or '').strip()
+        dirs = []
+        if proj:
+            if kind == "img":
+                dirs.append(os.path.join(self.paths['projects'], proj, "attachments"))
+            dirs.append(os.path.join(self.paths['projects'], proj))
+        if uni:
+            if kind == "img":
+                dirs.append(os.path.join(self.paths['universes'], uni, "attachments"))
+            dirs.append(os.path.join(self.paths['universes'], uni))
+        if kind == "img":
+            dirs.append(os.path.abspath(OUTPUT_ATTACHMENTS))
+            # Last resort: the attachments folder of every project / universe
+            for root in (self.paths['projects'], self.paths['universes']):
+                for sub in self.cache.names(root):
+                    dirs.append(os.path.join(root, sub, "attachments"))
+        return dirs
+
+    def _resolve(self, entry, kind):
+        located = data_manager.locate(entry, kind)
+        if located:
+            return located
+
+        old_path = entry.get('file_path' if kind == "img" else 'md_path') or ''
+        m = TIMESTAMP_RE.search(os.path.basename(old_path))
+        timestamp = m.group(1) if m else None
+        name_part = _name_part(entry.get('title'))
+        # Captures may be PNG, WebP or AVIF (see image_encoder); a moved file keeps its extension
+        ext = (os.path.splitext(old_path)[1].lower() or ".png") if kind == "img" else ".md"
+
+        for directory in self._search_dirs(entry, kind):
+            candidates = []
+            if timestamp and kind == "img":
+                name = self.cache.by_timestamp(directory).get(timestamp)
+                if name:
+                    candidates.append(name)
+            if len(name_part) > 5 or (kind == "md" and name_part):
+                candidates.extend(n for n in self.cache.names(directory)
+                                  if name_part in n.lower() and n.lower().endswith(ext))
+            for name in candidates:
+                path = os.path.abspath(os.path.join(directory, name))
+                if data_manager.identify(entry, path, kind) is not False:
+                    return path
+        return None
+
+    def heal(self, entries=None):
+        """
+        Resolves every entry whose image or note no longer exists.
+        Returns {id: {field: new path}} of what was fixed (already persisted).
+        """
+        started = time.time()
+        entries = data_manager.query(limit=None) if entries is None else entries
+        changes = {}
+        dead = 0
+        for entry in entries:
+            for kind, field in (("img", "file_path"), ("md", "md_path")):
+                path = entry.get(field)
+                if not path or os.path.exists(path):
+                    continue
+                dead += 1
+                found = self._resolve(entry, kind)
+                if found:
+                    changes.setdefault(entry['id'], {})[field] = found
+
+        if changes:
+            data_manager.update_task_entries(changes)
+        log_agent.log_event("HEAL", f"Path healing: {len(changes)} entries fixed, {dead} dead paths",
+                            dirs_listed=self.cache.listed, seconds=round(time.time() - started, 2))
+        return changes
+
+def _last_pass():
+    try:
+        with open(HEAL_STATE_FILE, "r", encoding="utf-8") as f:
+            return float(json.load(f).get("verified_at", 0))
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+def heal_paths(paths=None, force=False):
+    """Runs a healing pass unless every path was verified within HEAL_INTERVAL (``force`` runs it anyway)."""
+    started = time.time()
+    if not force and started - _last_pass() < HEAL_INTERVAL:
+        return {}
+    changes = PathHealer(paths).heal()
+    try:
+        with open(HEAL_STATE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"verified_at": started}, f)
+    except OSError as e:
+        log_agent.error(f"Failed to save {HEAL_STATE_FILE}", e)
+    return changes
@@ -0,0 +1,233 @@
+import itertools
+import json
+import os
+import threading
+import numpy as np
+from PIL import Image
+from logger_agent import log_agent
+from src.utils.file_lock import FileLock
+
+# Hamming distance (out of 64 bits) under which two captures count as near-identical
+DEFAULT_MAX_DISTANCE = 6
+# The 64-bit hash is split into this many 16-bit chunks for the multi-index tables
+CHUNKS = 4
+CHUNK_BITS = 64 // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+def dhash(image, size=8):
+    """
+    64-bit difference hash: the image is reduced to a (size+1) x size grayscale
+    thumbnail and each bit says whether a pixel is brighter than its right neighbour.
+    """
+    small = image.convert("L").resize((size + 1, size), Image.BILINEAR, reducing_gap=2.0)
+    px = np.asarray(small, dtype=np.int16)
+    bits = np.packbits(px[:, 1:] > px[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+def dhash_file(path):
+    with Image.open(path) as img:
+        return dhash(img)
+
+def _chunks(h):
+    return [(h >> (i * CHUNK_BITS)) & CHUNK_MASK for i in range(CHUNKS)]
+
+def _variants(chunk, radius):
+    """Every chunk value within ``radius`` flipped bits of ``chunk``."""
+    yield chunk
+    for r in range(1, radius + 1):
+        for bits in itertools.combinations(range(CHUNK_BITS), r):
+            v = chunk
+            for b in bits:
+                v ^= 1 << b
+            yield v
+
+class PHashIndex:
+    """
+    Multi-index hash table of capture dHashes, persisted as JSONL.
+
+    If two hashes are within distance ``d`` then, by pigeonhole, at least one of
+    their four 16-bit chunks is within ``d // 4`` bits; lookups only probe those
+    chunk buckets and verify the few candidates with a popcount, so they stay
+    well under a millisecond at 100k captures.
+
+    Deleted entries are appended as ``"del"`` tombstones; the file is rewritten
+    without them on load once stale lines outnumber live ones.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self.doc_ids = []       # doc number -> entry id (None once removed)
+        self.hashes = []        # doc number -> 64-bit hash
+        self.doc_numbers = {}   # entry id -> doc number
+        self.tables = [{} for _ in range(CHUNKS)]  # chunk value -> [doc numbers]
+
+    def _add_doc(self, entry_id, h):
+        if entry_id in self.doc_numbers:
+            return
+        doc = len(self.doc_ids)
+        self.doc_ids.append(entry_id)
+        self.hashes.append(h)
+        self.doc_numbers[entry_id] = doc
+        for table, chunk in zip(self.tables, _chunks(h)):
+            table.setdefault(chunk, []).append(doc)
+
+    def _drop_doc(self, entry_id):
+        doc = self.doc_numbers.pop(entry_id, None)
+        if doc is None:
+            return
+        self.doc_ids[doc] = None
+        for table, chunk in zip(self.tables, _chunks(self.hashes[doc])):
+            bucket = table.get(chunk)
+            if bucket is not None:
+                bucket.remove(doc)
+                if not bucket:
+                    del table[chunk]
+
+    def __contains__(self, entry_id):
+        return entry_id in self.doc_numbers
+
+    def add(self, items):
+        """Indexes ``(entry_id, hash)`` pairs and appends them to the index file."""
+        lines = []
+        with self._lock:
+            for entry_id, h in items:
+                if not entry_id or entry_id in self.doc_numbers:
+                    continue
+                lines.append(json.dumps({"id": entry_id, "h": f"{h:016x}"}) + "\n")
+                if self._loaded:
+                    self._add_doc(entry_id, h)
+            self._append(lines)
+
+    def remove(self, ids):
+        """Drops deleted entries: appends a tombstone per id that is indexed (or not loaded yet)."""
+        lines = []
+        with self._lock:
+            for entry_id in ids:
+                if not entry_id or (self._loaded and entry_id not in self.doc_numbers):
+                    continue
+                lines.append(json.dumps({"id": entry_id, "del": 1}) + "\n")
+                self._drop_doc(entry_id)
+            self._append(lines)
+
+    def _append(self, lines):
+        if lines:
+            try:
+                # Same lock as compaction, which another instance may be running
+                with FileLock(self.index_path), open(self.index_path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+            except Exception as e:
+                log_agent.error(f"Failed to update {self.index_path}", e)
+
+    def load(self, entries_provider):
+        """Loads the hashes from disk and picks up entries that carry a ``phash`` but are missing."""
+        with self._lock:
+            if self._loaded:
+                return
+            self._reset()
+            if os.path.exists(self.index_path):
+                try:
+                    self._load_file()
+                except Exception as e:
+                    log_agent.error(f"Failed to load {self.index_path}", e)
+            self._loaded = True
+
+            missing = [(e["id"], int(e["phash"], 16)) for e in entries_provider()
+                       if e.get("phash") and e.get("id") not in self.doc_numbers]
+            if missing:
+                self.add(reversed(missing))
+
+    def _load_file(self):
+        total = 0
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                total += 1
+                try:
+                    doc = json.loads(line)
+                    if doc.get("del"):
+                        self._drop_doc(doc["id"])
+                    else:
+                        self._add_doc(doc["id"], int(doc["h"], 16))
+                except (ValueError, KeyError):
+                    continue
+        if total > 2 * len(self.doc_numbers) + 100:
+            self._compact()
+
+    def _compact(self):
+        """
+        Rewrites the file with the live hashes only (mostly tombstones and the entries they
+        cancel). Re-read under the lock appends take, so no other instance's line is lost.
+        """
+        with FileLock(self.index_path):
+            live = {}
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        doc = json.loads(line)
+                    except ValueError:
+                        continue
+                    if doc.get("del"):
+                        live.pop(doc.get("id"), None)
+                    elif doc.get("id") not in live:
+                        live[doc.get("id")] = line
+            tmp = self.index_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(live.values())
+            os.replace(tmp, self.index_path)
+
+    # --- QUERYING ---
+    def find(self, h, max_distance=DEFAULT_MAX_DISTANCE, exclude=None):
+        """Returns ``[(entry_id, distance)]`` within ``max_distance``, closest (then newest) first."""
+        with self._lock:
+            radius = max_distance // CHUNKS
+            seen = set()
+            found = []
+            for table, chunk in zip(self.tables, _chunks(h)):
+                for v in _variants(chunk, radius):
+                    for doc in table.get(v, ()):
+                        if doc in seen:
+                            continue
+                        seen.add(doc)
+                        dist = (self.hashes[doc] ^ h).bit_count()
+                        if dist <= max_distance and self.doc_ids[doc] != exclude:
+                            found.append((dist, -doc))
+            found.sort()
+            return [(self.doc_ids[-doc], dist) for dist, doc in found]
+
+    def duplicate_groups(self, max_distance=DEFAULT_MAX_DISTANCE):
+        """Clusters near-identical captures; returns lists of entry ids, newest group first."""
+        with self._lock:
+            parent = list(range(len(self.doc_ids)))
+
+            def root(d):
+                while parent[d] != d:
+                    parent[d] = parent[parent[d]]
+                    d = parent[d]
+                return d
+
+            masks = list(_variants(0, max_distance // CHUNKS))
+            hashes = self.hashes
+            for table, shift in zip(self.tables, range(0, 64, CHUNK_BITS)):
+                get = table.get
+                for doc, h in enumerate(hashes):
+                    if self.doc_ids[doc] is None:
+                        continue # Removed; its chunks are no longer in the tables
+                    chunk = (h >> shift) & CHUNK_MASK
+                    for m in masks:
+                        for other in get(chunk ^ m, ()):
+                            # Each pair is checked from its older side only
+                            if other > doc and (hashes[other] ^ h).bit_count() <= max_distance:
+                                a, b = root(doc), root(other)
+                                if a != b:
+                                    parent[max(a, b)] = min(a, b)
+
+            groups = {}
+            for doc in self.doc_numbers.values():
+                groups.setdefault(root(doc), []).append(doc)
+            clusters = [sorted(g, reverse=True) for g in groups.values() if len(g) > 1]
+            clusters.sort(key=lambda g: g[0], reverse=True)
+            return [[self.doc_ids[d] for d in g] for g in clusters]
@@ -0,0 +1,91 @@
+import heapq
+import itertools
+
+# Default page size for callers that do not pass a limit
+DEFAULT_PAGE_SIZE = 50
+
+def parse_sort(sort):
+    """'-timestamp' -> ('timestamp', True); 'title' -> ('title', False)."""
+    sort = sort or "-timestamp"
+    if sort.startswith("-"):
+        return sort[1:], True
+    return sort, False
+
+def matches(entry, filters):
+    """
+    Evaluates registry filters against one entry:
+    ``{"field": value}`` equality, ``{"field": [a, b]}`` membership, and
+    ``since``/``until`` bounds on the ISO timestamp (inclusive / exclusive).
+    """
+    for key, value in (filters or {}).items():
+        if key == "since":
+            if entry.get("timestamp", "") < value:
+                return False
+        elif key == "until":
+            if entry.get("timestamp", "") >= value:
+                return False
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            if entry.get(key) not in value:
+                return False
+        elif entry.get(key) != value:
+            return False
+    return True
+
+def select(records, filters=None, sort="-timestamp", offset=0, limit=None, native_order=True):
+    """
+    Streams matching records in the requested order.
+    ``records`` must already be newest first; ``native_order`` says so for
+    '-timestamp', in which case nothing is buffered. Other sorts keep at most
+    ``offset + limit`` records in a heap.
+    """
+    matching = (r for r in records if matches(r, filters))
+    field, descending = parse_sort(sort)
+
+    if not (native_order and field == "timestamp" and descending):
+        key = lambda r: (r.get(field) or "")
+        if limit is None:
+            matching = iter(sorted(matching, key=key, reverse=descending))
+        else:
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            matching = iter(pick(offset + limit, matching, key=key))
+
+    stop = None if limit is None else offset + limit
+    return itertools.islice(matching, offset, stop)
+
+class QueryPage:
+    """
+    Lazy page of registry entries returned by ``DataManager.query()``.
+    Iterating streams the entries; nothing is loaded until then.
+    ``fetch(offset, limit)`` yields matches, ``count()`` counts all of them.
+    """
+
+    def __init__(self, fetch, count, filters, sort, offset, limit):
+        self._fetch = fetch
+        self._count = count
+        self.filters = filters
+        self.sort = sort
+        self.offset = offset
+        self.limit = limit
+        self._total = None
+
+    def __iter__(self):
+        return iter(self._fetch(self.offset, self.limit))
+
+    def items(self):
+        return list(self)
+
+    @property
+    def total(self):
+        """Number of matches across all pages (one counting pass, cached)."""
+        if self._total is None:
+            self._total = self._count()
+        return self._total
+
+    @property
+    def has_more(self):
+        if self.limit is None:
+            return False
+        return any(True for _ in self._fetch(self.offset + self.limit, 1))
+
+    def next_page(self):
+        return QueryPage(self._fetch, self._count, self.filters, self.sort, self.offset + (self.limit or 0), self.limit)
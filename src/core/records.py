@@ -0,0 +1,133 @@
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+# Repeated values shared by many entries; interned so 100k records hold one copy each
+INTERNED_FIELDS = ("type", "status", "universe", "project", "client", "role", "tags")
+# Large text fields left out of the in-memory record and fetched on first access
+LAZY_FIELDS = ("notes", "ai_analysis")
+SLOT_FIELDS = ("id", "timestamp", "title", "file_path", "md_path", "phash") + INTERNED_FIELDS
+
+_MISSING = object()
+
+class CaptureRecord:
+    """
+    Compact, read-only registry entry for large in-memory collections.
+
+    Fixed fields live in ``__slots__`` (no per-record key dict), categorical
+    values are interned, and ``notes`` / ``ai_analysis`` are not kept: they are
+    fetched through ``loader(id, timestamp)`` the first time they are read.
+    Supports the dict-style access the UI uses (``get``, ``[]``, ``in``).
+    """
+
+    __slots__ = SLOT_FIELDS + ("_extra", "_lazy", "_loader")
+
+    def __init__(self, entry, loader=None):
+        for field in SLOT_FIELDS:
+            value = entry.get(field, _MISSING)
+            if field in INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, field, value)
+        extra = {k: v for k, v in entry.items() if k not in SLOT_FIELDS and k not in LAZY_FIELDS}
+        self._extra = extra or None
+        self._lazy = None
+        self._loader = loader
+
+    def _load_lazy(self):
+        if self._lazy is None:
+            full = self._loader(self.id, self.timestamp) if self._loader else None
+            self._lazy = {f: full[f] for f in LAZY_FIELDS if f in full} if full else {}
+        return self._lazy
+
+    def get(self, key, default=None):
+        if key in LAZY_FIELDS:
+            return self._load_lazy().get(key, default)
+        if key in SLOT_FIELDS:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        return self._extra.get(key, default) if self._extra else default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def keys(self):
+        keys = [f for f in SLOT_FIELDS if getattr(self, f) is not _MISSING]
+        keys += list(self._extra or ())
+        keys += list(self._load_lazy())
+        return keys
+
+    def to_dict(self):
+        """Full entry (loads the lazy fields)."""
+        return {k: self[k] for k in self.keys()}
+
+    def __repr__(self):
+        return f"CaptureRecord({self.id!r}, {self.get('title')!r})"
+
+def compact(entries, loader=None):
+    return [CaptureRecord(e, loader) for e in entries]
+
+# --- MEMORY BENCHMARK ---
+def _synthetic_lines(n, seed=7):
+    """JSON lines shaped like real captures: few universes/projects/clients, long AI text."""
+    rnd = random.Random(seed)
+    universes = [f"Universe {i}" for i in range(8)]
+    projects = [f"Project {i}" for i in range(40)]
+    clients = [f"Client {i}" for i in range(25)]
+    words = "screen capture design review model code layout figure table chart meeting notes".split()
+    for i in range(n):
+        title = " ".join(rnd.choices(words, k=4)).title()
+        yield json.dumps({
+            "id": f"{rnd.getrandbits(128):032x}",
+            "timestamp": f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}T10:{i % 60:02d}:00.{i:06d}",
+            "status": "todo" if i % 3 == 0 else "info",
+            "title": title,
+            "type": rnd.choice(("Task", "Note", "Screen", "Idea")),
+            "universe": rnd.choice(universes),
+            "project": rnd.choice(projects),
+            "client": rnd.choice(clients),
+            "role": rnd.choice(("Developer", "Manager", "Diseñador")),
+            "tags": ", ".join(rnd.sample(words, 3)),
+            "notes": " ".join(rnd.choices(words, k=30)),
+            "ai_analysis": " ".join(rnd.choices(words, k=200)),
+            "file_path": f"C:/Vault/0_TZOL/20_Projects/P/attachments/{title}_{1700000000 + i}.png",
+            "md_path": f"C:/Vault/0_TZOL/20_Projects/P/{title}.md",
+            "phash": f"{rnd.getrandbits(64):016x}",
+        }, ensure_ascii=False)
+
+def _measure(build):
+    tracemalloc.start()
+    started = time.perf_counter()
+    kept = build()
+    current, _ = tracemalloc.get_traced_memory()
+    seconds = time.perf_counter() - started
+    tracemalloc.stop()
+    return kept, current, seconds
+
+def bench_memory(n=100_000, lines=None):
+    """
+    Retained memory of ``n`` entries held as parsed dicts vs CaptureRecords.
+    ``lines`` (a callable returning JSON lines) defaults to synthetic captures.
+    Returns {entries, dict_bytes, record_bytes, ratio, dict_seconds, record_seconds}.
+    """
+    lines = lines or (lambda: _synthetic_lines(n))
+    dicts, dict_bytes, dict_seconds = _measure(lambda: [json.loads(line) for line in lines()])
+    count = len(dicts)
+    del dicts
+    records, record_bytes, record_seconds = _measure(lambda: [CaptureRecord(json.loads(line)) for line in lines()])
+    del records
+    return {
+        "entries": count,
+        "dict_bytes": dict_bytes,
+        "record_bytes": record_bytes,
+        "ratio": round(record_bytes / dict_bytes, 3) if dict_bytes else 0,
+        "dict_seconds": round(dict_seconds, 2),
+        "record_seconds": round(record_seconds, 2),
+    }
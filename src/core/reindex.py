@@ -0,0 +1,251 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logger_agent import log_agent
+from src.core.config import ConfigManager
+from src.core.data_manager import DATA_DIR, data_manager
+from src.core.locator import MD_ID_KEY, path_key
+
+MANIFEST_FILE = os.path.join(DATA_DIR, "reindex_manifest.json")
+# Directory listing is I/O bound, so use more threads than cores
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Registry fields a note is the source of truth for
+NOTE_FIELDS = ("title", "type", "universe", "project", "tags", "file_path", "md_path")
+EMBED_RE = re.compile(r"!\[[^\]]*\]\(([^)]+)\)|!\[\[([^\]|]+)")
+SECTION_RE = re.compile(r"^## (My Notes|AI Analysis)\s*$", re.M)
+
+# --- SCANNING ---
+def _list_dir(directory):
+    """One scandir pass: (subdirectories, [(path, mtime_ns, size)] of notes)."""
+    subdirs, notes = [], []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue # .obsidian, .trash, .gemshot
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.lower().endswith(".md"):
+                    st = entry.stat(follow_symlinks=False)
+                    notes.append((os.path.abspath(entry.path), st.st_mtime_ns, st.st_size))
+    except OSError:
+        pass
+    return subdirs, notes
+
+def scan_notes(roots, pool):
+    """Walks ``roots`` with one scandir task per directory; returns {path: (mtime_ns, size)}."""
+    found = {}
+    seen = set()
+    pending = []
+    for root in roots:
+        if os.path.isdir(root) and path_key(root) not in seen:
+            seen.add(path_key(root))
+            pending.append(pool.submit(_list_dir, root))
+    while pending:
+        subdirs, notes = pending.pop().result()
+        for path, mtime, size in notes:
+            found[path] = (mtime, size)
+        for sub in subdirs:
+            if path_key(sub) not in seen: # roots may be nested (universes inside the vault root)
+                seen.add(path_key(sub))
+                pending.append(pool.submit(_list_dir, sub))
+    return found
+
+# --- PARSING ---
+def parse_frontmatter(text):
+    """Splits a note into ({key: value}, body). Values are plain strings."""
+    if not text.startswith("---"):
+        return {}, text
+    end = text.find("\n---", 3)
+    if end == -1:
+        return {}, text
+    meta = {}
+    for line in text[3:end].splitlines():
+        key, sep, value = line.partition(":")
+        if sep and key.strip():
+            meta[key.strip()] = value.strip()
+    return meta, text[end + 4:].lstrip("\n")
+
+def parse_note(path):
+    """
+    Reads a note written by finish_save back into registry fields.
+    Returns None for notes that are not GemShot captures: the frontmatter block
+    plus the entry id or the My Notes / AI Analysis sections are required, so
+    ordinary (template-based) notes with created/type keys are not imported.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            meta, body = parse_frontmatter(f.read())
+    except Exception as e:
+        log_agent.error(f"Could not read {path}", e)
+        return None
+    if "created" not in meta or "type" not in meta:
+        return None
+    if not meta.get(MD_ID_KEY) and not SECTION_RE.search(body):
+        return None
+
+    title = os.path.splitext(os.path.basename(path))[0]
+    for line in body.splitlines():
+        if line.startswith("# "):
+            title = line[2:].strip()
+            break
+
+    sections = SECTION_RE.split(body)
+    parts = dict(zip(sections[1::2], sections[2::2]))
+
+    file_path = ""
+    m = EMBED_RE.search(body)
+    if m:
+        target = (m.group(1) or m.group(2)).strip()
+        candidate = os.path.normpath(os.path.join(os.path.dirname(path), target))
+        if not os.path.exists(candidate):
+            candidate = os.path.join(os.path.dirname(path), "attachments", os.path.basename(target))
+        if os.path.exists(candidate):
+            file_path = os.path.abspath(candidate)
+
+    return {
+        "id": meta.get(MD_ID_KEY) or None,
+        "timestamp": meta["created"].replace(" ", "T"),
+        "title": title,
+        "type": meta.get("type", ""),
+        "universe": meta.get("universe", ""),
+        "project": meta.get("project", ""),
+        "tags": meta.get("tags", "").strip("[]"),
+        "notes": parts.get("My Notes", "").strip("\n"),
+        "ai_analysis": parts.get("AI Analysis", "").strip("\n"),
+        "file_path": file_path,
+        "md_path": path,
+    }
+
+# --- MANIFEST ---
+def load_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    try:
+        with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        log_agent.error(f"Failed to load {MANIFEST_FILE}, doing a full pass", e)
+        return {}
+
+def save_manifest(manifest):
+    tmp_path = MANIFEST_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+# --- RECONCILIATION ---
+def reindex(paths=None, full=False, dry_run=False):
+    """
+    Rebuilds / repairs registry entries from the notes in the vault.
+
+    Notes whose (mtime, size) match the manifest are skipped, so a re-sync only
+    lists directories. Changed notes are parsed in parallel and matched to
+    entries by embedded id, then by md_path: known entries get their note fields
+    repaired, unknown notes are added, and entries whose note vanished lose
+    their md_path. Returns a summary dict.
+    """
+    started = time.time()
+    paths = paths or ConfigManager.get_dynamic_paths()
+    roots = [os.path.abspath(paths[k]) for k in ("root", "universes", "projects") if paths.get(k)]
+    manifest = {} if full else load_manifest()
+
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+        on_disk = scan_notes(roots, pool)
+        changed = [p for p, (mtime, size) in on_disk.items()
+                   if manifest.get(p, {}).get("mtime_ns") != mtime or manifest.get(p, {}).get("size") != size]
+        removed = [p for p in manifest if p not in on_disk]
+        parsed = [n for n in pool.map(parse_note, changed) if n]
+
+    summary = {"notes": len(on_disk), "parsed": len(changed), "added": 0, "updated": 0, "detached": 0, "failed": 0}
+    failed = set()
+    if parsed or removed:
+        failed = _reconcile(parsed, {path_key(p): p for p in removed}, summary, dry_run)
+        summary["failed"] = len(failed)
+
+    if not dry_run:
+        note_ids = {n["md_path"]: n["id"] for n in parsed}
+        new_manifest = {}
+        for path, (mtime, size) in on_disk.items():
+            if path in failed:
+                continue # Not in the manifest, so the next run parses it again
+            known = manifest.get(path, {})
+            new_manifest[path] = {"mtime_ns": mtime, "size": size, "id": note_ids.get(path, known.get("id"))}
+        for path in failed & set(removed):
+            new_manifest[path] = manifest[path] # Still seen as removed next run
+        save_manifest(new_manifest)
+
+    summary["seconds"] = round(time.time() - started, 2)
+    log_agent.log_event("REINDEX", "Vault reindexed", **summary)
+    return summary
+
+def _reconcile(parsed, removed, summary, dry_run):
+    """Applies the parsed / removed notes; returns the note paths whose registry write failed."""
+    removed_keys = set(removed)
+    by_id, by_md = {}, {}
+    for entry in data_manager.query(limit=None):
+        by_id[entry.get("id")] = entry
+        if entry.get("md_path"):
+            by_md[path_key(entry["md_path"])] = entry
+
+    # Notes without an embedded id that moved are matched by file name and title
+    vanished = {}
+    for key in removed_keys:
+        entry = by_md.get(key)
+        if entry:
+            vanished[(os.path.basename(key), entry.get("title"))] = entry
+
+    updates, new_entries = {}, []
+    sources = {} # entry id -> note path the update came from
+    for note in parsed:
+        entry = by_id.get(note["id"]) if note["id"] else None
+        entry = entry or by_md.get(path_key(note["md_path"]))
+        if entry is None and not note["id"]:
+            entry = vanished.pop((os.path.basename(path_key(note["md_path"])), note["title"]), None)
+        if entry is None:
+            new_entries.append(note)
+            continue
+        note["id"] = entry["id"]
+        changes = {}
+        for field in NOTE_FIELDS:
+            value = note[field]
+            if field == "file_path" and not value:
+                continue # Image not found next to the note: keep what the registry knows
+            if (entry.get(field) or "") != value:
+                changes[field] = value
+        if changes:
+            updates[entry["id"]] = changes
+            sources[entry["id"]] = note["md_path"]
+
+    summary["updated"] = len(updates)
+    summary["added"] = len(new_entries)
+
+    # Notes that disappeared without being found elsewhere
+    moved_ids = {n["id"] for n in parsed}
+    for key in removed_keys:
+        entry = by_md.get(key)
+        if entry and entry["id"] not in moved_ids and not os.path.exists(entry["md_path"]):
+            updates.setdefault(entry["id"], {})["md_path"] = ""
+            sources.setdefault(entry["id"], removed[key])
+            summary["detached"] += 1
+
+    failed = set()
+    if dry_run:
+        return failed
+    if updates:
+        done = {r["id"] for r in data_manager.update_task_entries(updates)}
+        failed.update(sources[i] for i in updates if i not in done)
+    if new_entries:
+        try:
+            with data_manager.transaction():
+                for note in new_entries:
+                    entry = {k: v for k, v in note.items() if v is not None}
+                    data_manager.add_task_entry(entry)
+        except Exception as e:
+            log_agent.error(f"Failed to add {len(new_entries)} notes to the registry", e)
+            failed.update(n["md_path"] for n in new_entries)
+            summary["added"] = 0
+    return failed
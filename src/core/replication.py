@@ -0,0 +1,136 @@
+import glob
+import json
+import os
+import time
+from logger_agent import log_agent
+from src.core.config import ConfigManager
+from src.core.data_manager import data_manager
+from src.core.oplog import PATH_FIELDS, local_path
+
+def export_since(since=None, out_path=None):
+    """
+    Writes this node's ops with ``seq > since`` to ``out_path`` (a JSONL delta).
+    ``since`` defaults to the last export. Returns {node, from, to, ops, path}.
+    """
+    oplog = data_manager.oplog
+    if since is None:
+        since = oplog.load_state()["exported"]
+    ops = list(oplog.read(since))
+    last = ops[-1]["seq"] if ops else since
+    summary = {"node": oplog.node, "from": since + 1, "to": last, "ops": len(ops), "path": None}
+    if not ops:
+        return summary
+
+    out_path = out_path or f"{oplog.node}.{since + 1}-{last}.jsonl"
+    if os.path.isdir(out_path):
+        out_path = os.path.join(out_path, f"{oplog.node}.{since + 1}-{last}.jsonl")
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops))
+    os.replace(tmp_path, out_path) # Peers watching a shared folder never see a partial delta
+    oplog.save_state(exported=max(last, oplog.load_state()["exported"]))
+    summary["path"] = out_path
+    log_agent.log_event("SYNC", f"Exported {len(ops)} ops ({since + 1}-{last}) to {out_path}")
+    return summary
+
+def _collect(paths, own_node):
+    """Ops from delta files (or folders of them), per node in seq order, without duplicates."""
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, "*.jsonl"))) if os.path.isdir(path) else [path])
+    by_node = {}
+    for path in files:
+        for op in data_manager.oplog.read(0, path):
+            if op.get("node") and op["node"] != own_node:
+                by_node.setdefault(op["node"], {})[op["seq"]] = op
+    return {node: [ops[s] for s in sorted(ops)] for node, ops in by_node.items()}
+
+def _fold(ops):
+    """
+    Collapses the ops of a batch per key so each entry is written once:
+    create + updates -> one create, anything + delete -> delete.
+    Returns (entry states {id: (op, data)}, lookup creates [(kind, key, data)]).
+    """
+    entries, lookups = {}, []
+    for op in ops:
+        kind, key, data = op["kind"], op["key"], op.get("data")
+        if kind != "entry":
+            if op["op"] == "create":
+                lookups.append((kind, key, data))
+            continue
+        current = entries.get(key)
+        if op["op"] == "create":
+            entries[key] = ("create", dict(data))
+        elif op["op"] == "delete":
+            entries[key] = ("delete", None)
+        elif current is None:
+            entries[key] = ("update", dict(data))
+        elif current[0] != "delete":
+            current[1].update(data)
+    return entries, lookups
+
+def apply_ops(paths):
+    """
+    Applies delta files exported by other nodes. Ops at or below the high-water
+    mark already applied for their node are skipped, and a node whose delta
+    starts past the next expected seq is held back (a delta is missing).
+    Returns {applied, skipped, created, updated, deleted, lookups, gaps}.
+    """
+    started = time.time()
+    oplog = data_manager.oplog
+    applied_marks = oplog.load_state()["applied"]
+    summary = {"applied": 0, "skipped": 0, "created": 0, "updated": 0, "deleted": 0, "lookups": 0, "gaps": []}
+
+    batch, marks = [], {}
+    for node, ops in _collect(paths, oplog.node).items():
+        mark = applied_marks.get(node, 0)
+        fresh = [op for op in ops if op["seq"] > mark]
+        summary["skipped"] += len(ops) - len(fresh)
+        # Apply the contiguous run only; anything after a hole waits for the missing delta
+        run = []
+        for op in fresh:
+            if op["seq"] != mark + len(run) + 1:
+                summary["gaps"].append((node, mark + len(run) + 1, op["seq"]))
+                break
+            run.append(op)
+        if run:
+            batch.extend(run)
+            marks[node] = run[-1]["seq"]
+    if not batch:
+        return summary
+
+    vault_root = ConfigManager.get_dynamic_paths()['root']
+    batch.sort(key=lambda op: op.get("ts") or "")
+    entries, lookups = _fold(batch)
+    for state in entries.values():
+        for field in PATH_FIELDS:
+            if state[1] and state[1].get(field):
+                state[1][field] = local_path(state[1][field], vault_root)
+
+    existing = data_manager.get_task_entries(entries)
+    creates = [data for op, data in entries.values() if op == "create" and data["id"] not in existing]
+    updates = {key: data for key, (op, data) in entries.items()
+               if (op == "update" and key in existing) or (op == "create" and key in existing)}
+    deletes = [key for key, (op, _) in entries.items() if op == "delete" and key in existing]
+
+    with data_manager.replicating():
+        with data_manager.transaction():
+            for kind, key, data in lookups:
+                if kind == "client":
+                    data_manager.add_client(key, client=data)
+                else:
+                    getattr(data_manager, f"add_{kind}")(key)
+            for record in creates:
+                data_manager.add_task_entry(record)
+        if updates:
+            data_manager.update_task_entries(updates)
+        if deletes:
+            data_manager.delete_task_entries(deletes)
+
+    oplog.save_state(applied=marks)
+    summary.update(applied=len(batch), created=len(creates), updated=len(updates),
+                   deleted=len(deletes), lookups=len(lookups))
+    log_agent.log_event("SYNC", f"Applied {len(batch)} ops from {len(marks)} node(s)",
+                        created=len(creates), updated=len(updates), deleted=len(deletes),
+                        seconds=round(time.time() - started, 2))
+    return summary
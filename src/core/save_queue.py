@@ -0,0 +1,290 @@
+import collections
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from PIL import Image
+from logger_agent import log_agent
+
+QUEUE_DIR = os.path.join("data", "save_queue")
+# Queued captures kept in memory; past this, a job's pixels wait on disk only (submit never blocks)
+MAX_IN_MEMORY = 16
+# A failed save is retried after RETRY_BASE seconds, doubling up to RETRY_MAX
+RETRY_BASE = 2.0
+RETRY_MAX = 300.0
+
+class _Job:
+    """A queued save. ``image`` is None for jobs whose pixels are only on disk (spilled or replayed)."""
+
+    __slots__ = ("id", "data", "image", "meta", "persisted", "started", "done", "replayed",
+                 "attempts", "retry_at", "on_persisted", "lock")
+
+    def __init__(self, job_id, data, image=None, meta=None, replayed=False, on_persisted=None):
+        self.id = job_id
+        self.data = data
+        self.image = image
+        self.meta = meta
+        self.persisted = replayed
+        self.started = False
+        self.done = False
+        self.replayed = replayed
+        self.attempts = 0
+        self.retry_at = 0.0
+        self.on_persisted = on_persisted
+        self.lock = threading.Lock()
+
+class SaveQueue:
+    """
+    Single background writer for captures. ``submit(data, image)`` only queues
+    the job and returns. A spill thread persists it to ``data/save_queue/``
+    (raw pixels + a JSON file written last as the commit marker) while the
+    writer thread runs the save handler; a job is deleted once saved. Jobs
+    found on disk at start (crash, failed save) are replayed first, in
+    submission order; saves that fail are retried with backoff.
+    """
+
+    def __init__(self, queue_dir=QUEUE_DIR, max_in_memory=MAX_IN_MEMORY):
+        self.queue_dir = queue_dir
+        self.max_in_memory = max_in_memory
+        self._ready = collections.deque() # Jobs for the writer, in submission order
+        self._retry = []                  # Failed jobs waiting for their retry_at
+        self._cond = threading.Condition()
+        self._spills = queue.Queue()      # Jobs waiting to be persisted
+        self._live = set()                # Ids submitted this session (never replayed)
+        self._in_memory = 0
+        self._stopping = False
+        self._handler = None
+        self._on_change = None
+        self._is_saved = None
+        self._worker = None
+        self._spiller = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _changed(self, delta):
+        with self._lock:
+            self._pending += delta
+            pending = self._pending
+        if self._on_change:
+            try:
+                self._on_change(pending)
+            except Exception as e:
+                log_agent.error("Save queue listener failed", e)
+
+    # --- LIFECYCLE ---
+    def start(self, handler, on_change=None, is_saved=None):
+        """
+        ``handler(data, image)`` performs a save on the writer thread; ``on_change(pending)``
+        reports depth. ``is_saved(data)`` tells whether a replayed job already reached the
+        registry (crash after the save, before the job was deleted); such jobs are dropped.
+        """
+        self._handler = handler
+        self._on_change = on_change
+        self._is_saved = is_saved
+        self._stopping = False
+        if self._spiller is None or not self._spiller.is_alive():
+            self._spiller = threading.Thread(target=self._spill_loop, name="save-spill", daemon=True)
+            self._spiller.start()
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="save-writer", daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout=10.0):
+        """Persists what is queued and lets the writer finish it (failed jobs are replayed on next start)."""
+        deadline = time.monotonic() + timeout
+        self._spills.put(None)
+        if self._spiller is not None:
+            self._spiller.join(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join(max(0.0, deadline - time.monotonic()))
+
+    # --- PERSISTENCE ---
+    def _paths(self, job_id):
+        base = os.path.join(self.queue_dir, job_id)
+        return base + ".json", base + ".raw"
+
+    def submit(self, data, image=None, on_persisted=None):
+        """
+        Queues a save and returns its id at once (nothing is written on the caller's thread).
+        ``on_persisted()`` runs on the spill thread once the job would survive a crash.
+        """
+        job = _Job(f"{time.time_ns()}_{uuid.uuid4().hex[:6]}", data, image, on_persisted=on_persisted)
+        with self._cond:
+            self._live.add(job.id)
+            if image is not None:
+                self._in_memory += 1
+            self._ready.append(job)
+            self._cond.notify()
+        self._changed(1)
+        self._spills.put(job)
+        return job.id
+
+    def _write(self, job):
+        meta_path, raw_path = self._paths(job.id)
+        meta = {"data": job.data, "image": None}
+        os.makedirs(self.queue_dir, exist_ok=True)
+        if job.image is not None:
+            # Raw pixels: no encode here either; the writer encodes once
+            with open(raw_path, "wb") as f:
+                f.write(job.image.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            meta["image"] = {"mode": job.image.mode, "size": list(job.image.size)}
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, meta_path)
+        job.meta = meta["image"]
+
+    def _spill_loop(self):
+        while True:
+            job = self._spills.get()
+            if job is None:
+                return
+            with job.lock:
+                if job.done:
+                    continue # Saved before its turn here: nothing to recover
+                try:
+                    self._write(job)
+                except Exception as e:
+                    # Still saved from memory, just not crash-safe
+                    log_agent.error(f"Failed to persist save job {job.id}", e)
+                    continue
+                job.persisted = True
+                if not job.started:
+                    with self._cond:
+                        spill = self._in_memory > self.max_in_memory
+                    if spill:
+                        self._release(job) # Read back from disk when its turn comes
+            if job.on_persisted:
+                try:
+                    job.on_persisted()
+                except Exception as e:
+                    log_agent.error(f"Save job {job.id} persisted, but its callback failed", e)
+
+    def _release(self, job):
+        """Drops a job's in-memory pixels (caller holds job.lock)."""
+        if job.image is not None:
+            job.image = None
+            with self._cond:
+                self._in_memory -= 1
+
+    def _load_image(self, job):
+        _, raw_path = self._paths(job.id)
+        with open(raw_path, "rb") as f:
+            return Image.frombytes(job.meta["mode"], tuple(job.meta["size"]), f.read())
+
+    def _discard(self, job_id):
+        for path in self._paths(job_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _persisted(self):
+        """Jobs left on disk by a previous session, oldest first (orphan .raw files without a marker are dropped)."""
+        try:
+            names = os.listdir(self.queue_dir)
+        except OSError:
+            return []
+        ids = sorted(n[:-len(".json")] for n in names if n.endswith(".json") and n[:-len(".json")] not in self._live)
+        for name in names:
+            job_id = name[:-len(".raw")]
+            if name.endswith(".raw") and job_id not in ids and job_id not in self._live:
+                self._discard(job_id)
+        jobs = []
+        for job_id in ids:
+            try:
+                with open(self._paths(job_id)[0], "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except Exception as e:
+                log_agent.error(f"Unreadable save job {job_id}, dropped", e)
+                self._discard(job_id)
+                continue
+            jobs.append(_Job(job_id, meta["data"], meta=meta.get("image"), replayed=True))
+        return jobs
+
+    # --- WRITER THREAD ---
+    def _next(self):
+        """Next job for the writer (due retries first), or None once stopping and idle."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                due = [j for j in self._retry if j.retry_at <= now]
+                if due:
+                    job = min(due, key=lambda j: j.retry_at)
+                    self._retry.remove(job)
+                    return job
+                if self._ready:
+                    return self._ready.popleft()
+                if self._stopping:
+                    return None # Jobs still waiting for a retry stay on disk
+                self._cond.wait(min(j.retry_at for j in self._retry) - now if self._retry else None)
+
+    def _process(self, job):
+        started = time.time()
+        with job.lock:
+            job.started = True
+            image = job.image
+        try:
+            if image is None and job.meta:
+                image = self._load_image(job)
+            self._handler(job.data, image)
+        except Exception as e:
+            job.attempts += 1
+            delay = min(RETRY_BASE * 2 ** (job.attempts - 1), RETRY_MAX)
+            log_agent.error(f"Save job {job.id} failed (attempt {job.attempts}), retrying in {delay:.0f}s", e)
+            with job.lock:
+                if job.persisted:
+                    self._release(job) # Waits on disk, not in memory
+            with self._cond:
+                job.retry_at = time.monotonic() + delay
+                self._retry.append(job)
+            return
+        with job.lock:
+            job.done = True
+            self._release(job)
+            if job.persisted:
+                self._discard(job.id)
+        self._changed(-1)
+        log_agent.log_event("SAVE_QUEUE", f"Save job done in {time.time() - started:.2f}s", pending=self._pending)
+
+    def _already_saved(self, job):
+        try:
+            saved = bool(self._is_saved and self._is_saved(job.data))
+        except Exception as e:
+            log_agent.error(f"Could not check save job {job.id} against the registry", e)
+            return False
+        if saved:
+            log_agent.log_event("SAVE_QUEUE", f"Save job {job.id} was already saved, dropped", id=job.data.get("id"))
+        return saved
+
+    def _run(self):
+        replay = self._persisted()
+        if replay:
+            log_agent.log_event("SAVE_QUEUE", f"Replaying {len(replay)} saves left from a previous session")
+            self._changed(len(replay))
+            with self._cond:
+                self._ready.extendleft(reversed(replay))
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            if job.replayed and not job.attempts and self._already_saved(job):
+                self._discard(job.id)
+                self._changed(-1)
+                continue
+            self._process(job)
+
+save_queue = SaveQueue()
@@ -0,0 +1,441 @@
+import bisect
+import heapq
+import itertools
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from logger_agent import log_agent
+from src.utils.file_lock import FileLock
+
+# Relevance weight of each free-text field
+FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "notes": 1.0, "ai_analysis": 0.5}
+# Fields usable as ``field:value`` filters, mapped to the entry key they read
+FILTER_FIELDS = {"tag": "tags", "project": "project", "universe": "universe", "client": "client", "type": "type", "role": "role"}
+# Upper bound of vocabulary terms a single prefix expands to
+MAX_PREFIX_EXPANSION = 64
+# AND clauses matching more than this many times the limit are ranked top-k instead of scored in full
+TOP_K_SCAN = 20
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Index lines start with the entry id (written first), so a load can find each id's last line cheaply
+LINE_ID_RE = re.compile(r'\{"id": "([^"]+)"(, "del")?')
+QUERY_RE = re.compile(r'(\w+):"([^"]*)"|(\w+):(\S+)|"([^"]*)"|(\S+)')
+
+def fold(text):
+    """Lower-cases and strips accents so 'Diseño' and 'diseno' match."""
+    text = text or ""
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+def tokenize(text):
+    return TOKEN_RE.findall(fold(text))
+
+def _tag_values(raw):
+    return [fold(t).strip() for t in (raw or "").split(",") if t.strip()]
+
+class SearchIndex:
+    """
+    Persistent inverted index over title, tags, notes and AI analysis.
+
+    Each indexed entry is appended to a JSONL file as its pre-computed term
+    weights, so indexing a new capture is O(1) on disk. Edits append the new
+    version, deletes a ``"del"`` tombstone; the last line of an id wins and the
+    file is compacted on load once stale lines outnumber live ones. The
+    in-memory postings are rebuilt from that file lazily on the first search.
+
+    Query syntax: words are AND-ed, ``OR`` separates alternatives, ``word*`` is a
+    prefix, and ``tag:``/``project:``/``universe:``/``client:``/``type:`` filter on
+    fields (quote values with spaces: ``project:"Web Redesign"``).
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self.doc_ids = []        # doc number -> entry id (None once removed or re-indexed)
+        self.doc_numbers = {}    # entry id -> doc number
+        self.postings = {}       # token -> {doc number: weighted tf}
+        self.fields = {}         # filter field -> folded value -> set(doc numbers)
+        self.vocab = []          # sorted tokens, for prefix lookups
+        self._impact = {}        # token -> docs by (weight, recency) desc; built on demand
+
+    # --- BUILDING ---
+    def _doc_terms(self, entry):
+        terms = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for tok in tokenize(entry.get(field, "")):
+                terms[tok] = terms.get(tok, 0.0) + weight
+        filters = {}
+        for name, key in FILTER_FIELDS.items():
+            values = _tag_values(entry.get(key)) if name == "tag" else [fold(entry.get(key, "")).strip()]
+            values = [v for v in values if v]
+            if values:
+                filters[name] = values
+        return terms, filters
+
+    def _add_doc(self, entry_id, terms, filters):
+        if entry_id in self.doc_numbers:
+            return
+        doc = len(self.doc_ids)
+        self.doc_ids.append(entry_id)
+        self.doc_numbers[entry_id] = doc
+        for tok, weight in terms.items():
+            posting = self.postings.get(tok)
+            if posting is None:
+                posting = self.postings[tok] = {}
+                if self._loaded:
+                    bisect.insort(self.vocab, tok)
+            posting[doc] = weight
+            self._impact.pop(tok, None)
+        for name, values in filters.items():
+            bucket = self.fields.setdefault(name, {})
+            for v in values:
+                bucket.setdefault(v, set()).add(doc)
+
+    def _drop_doc(self, entry_id, terms, filters):
+        """Takes an entry out of the postings (``terms``/``filters`` as it was indexed)."""
+        doc = self.doc_numbers.pop(entry_id, None)
+        if doc is None:
+            return
+        self.doc_ids[doc] = None # Also hides it from any posting the terms did not cover
+        for tok in terms:
+            posting = self.postings.get(tok)
+            if posting is None or posting.pop(doc, None) is None:
+                continue
+            self._impact.pop(tok, None)
+            if not posting:
+                del self.postings[tok]
+                i = bisect.bisect_left(self.vocab, tok)
+                if i < len(self.vocab) and self.vocab[i] == tok:
+                    del self.vocab[i]
+        for name, values in filters.items():
+            bucket = self.fields.get(name, {})
+            for v in values:
+                docs = bucket.get(v)
+                if docs is not None:
+                    docs.discard(doc)
+                    if not docs:
+                        del bucket[v]
+
+    def _append(self, lines):
+        if lines:
+            try:
+                # Same lock as compaction, which another instance may be running
+                with FileLock(self.index_path), open(self.index_path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+            except Exception as e:
+                log_agent.error(f"Failed to update {self.index_path}", e)
+
+    def add(self, entries):
+        """Indexes new registry entries and appends them to the index file."""
+        lines = []
+        with self._lock:
+            for entry in entries:
+                entry_id = entry.get("id")
+                if not entry_id or entry_id in self.doc_numbers:
+                    continue
+                terms, filters = self._doc_terms(entry)
+                lines.append(json.dumps({"id": entry_id, "t": terms, "f": filters}, ensure_ascii=False) + "\n")
+                if self._loaded:
+                    self._add_doc(entry_id, terms, filters)
+            self._append(lines)
+
+    def remove(self, entries):
+        """Drops deleted registry entries (the old records, so their terms can be found)."""
+        lines = []
+        with self._lock:
+            for entry in entries:
+                entry_id = entry.get("id")
+                if not entry_id:
+                    continue
+                lines.append(json.dumps({"id": entry_id, "del": 1}) + "\n")
+                if self._loaded:
+                    self._drop_doc(entry_id, *self._doc_terms(entry))
+            self._append(lines)
+
+    def update(self, old_entries, new_entries):
+        """Re-indexes edited entries whose searchable text or filter fields changed."""
+        old = {e.get("id"): e for e in old_entries}
+        changed = [e for e in new_entries if e.get("id") in old and self._doc_terms(e) != self._doc_terms(old[e["id"]])]
+        if changed:
+            with self._lock:
+                self.remove([old[e["id"]] for e in changed])
+                self.add(changed)
+
+    def load(self, entries_provider):
+        """
+        Loads the postings from disk, then indexes any registry entry missing from
+        the file (index deleted, entries migrated from another backend, ...).
+        """
+        with self._lock:
+            if self._loaded:
+                return
+            self._reset()
+            if os.path.exists(self.index_path):
+                try:
+                    self._load_file()
+                except Exception as e:
+                    log_agent.error(f"Failed to load {self.index_path}", e)
+            self.vocab = sorted(self.postings)
+            self._loaded = True
+
+            missing = [e for e in entries_provider() if e.get("id") not in self.doc_numbers]
+            if missing:
+                # Registry is newest first; index oldest first so doc numbers follow time
+                self.add(reversed(missing))
+                log_agent.log_event("DATA", f"Search index caught up with {len(missing)} entries")
+
+    @staticmethod
+    def _latest_lines(lines):
+        """Line number of the last version of each id (None for a tombstone); ids are matched, not parsed."""
+        latest = {}
+        for n, line in enumerate(lines):
+            m = LINE_ID_RE.match(line)
+            if m:
+                latest[m.group(1)] = None if m.group(2) else n
+        return latest
+
+    def _load_file(self):
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            latest = self._latest_lines(f)
+        live = {n for n in latest.values() if n is not None}
+        # Index the live lines, in file order so doc numbers follow time
+        total = 0
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for n, line in enumerate(f):
+                total = n + 1
+                if n not in live:
+                    continue
+                try:
+                    doc = json.loads(line)
+                except ValueError:
+                    continue
+                self._add_doc(doc["id"], doc.get("t", {}), doc.get("f", {}))
+        if total > 2 * len(live) + 100:
+            self._compact()
+
+    def _compact(self):
+        """
+        Rewrites the file with the live lines only (more stale versions / tombstones than
+        live docs). Re-read under the lock appends take, so no other instance's line is lost.
+        """
+        with FileLock(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                lines = [line for line in f if line.endswith("\n")]
+            keep = sorted(n for n in self._latest_lines(lines).values() if n is not None)
+            tmp = self.index_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(lines[n] for n in keep)
+            os.replace(tmp, self.index_path)
+
+    # --- QUERYING ---
+    def _expand_tokens(self, term):
+        """Returns the vocabulary tokens a term matches (several for a prefix)."""
+        if not term.endswith("*"):
+            return [term] if term in self.postings else []
+        prefix = term[:-1]
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self.vocab, prefix)
+        matched = []
+        for tok in self.vocab[start:start + MAX_PREFIX_EXPANSION]:
+            if not tok.startswith(prefix):
+                break
+            matched.append(tok)
+        return matched
+
+    def _impact_list(self, tok):
+        ranked = self._impact.get(tok)
+        if ranked is None:
+            posting = self.postings[tok]
+            ranked = sorted(reversed(posting), key=posting.__getitem__, reverse=True)
+            self._impact[tok] = ranked
+        return ranked
+
+    def _top_k_fast(self, terms, filters, limit):
+        """
+        Top-k {doc: score} of a clause without scoring every match: one word (or
+        prefix) is answered from impact-ordered postings, filters alone by recency.
+        Returns None when the general scorer is needed.
+        """
+        if not terms:
+            candidates = None
+            for name, value in filters:
+                docs = self._field_docs(name, value)
+                candidates = docs if candidates is None else candidates & docs
+            return {doc: 0.0 for doc in heapq.nlargest(limit, candidates or ())}
+
+        if len(terms) != 1 or filters:
+            return None
+
+        toks = self._expand_tokens(terms[0])
+        if not toks:
+            return {}
+        # The union of each token's top-k contains the overall top-k
+        best = {}
+        for tok in toks:
+            posting = self.postings[tok]
+            for doc in self._impact_list(tok)[:limit]:
+                if posting[doc] > best.get(doc, -1.0):
+                    best[doc] = posting[doc]
+        idf = math.log(1.0 + len(self.doc_numbers) / max(len(self.postings[t]) for t in toks))
+        return {doc: w * idf for doc, w in best.items()}
+
+    def _field_docs(self, name, value):
+        bucket = self.fields.get(name, {})
+        if value.endswith("*"):
+            prefix = value[:-1]
+            docs = set()
+            for v, d in bucket.items():
+                if v.startswith(prefix):
+                    docs |= d
+            return docs
+        return bucket.get(value, set())
+
+    def _parse(self, query, prefix_last):
+        """Splits a query into OR-clauses of (terms, field filters)."""
+        clauses = [([], [])]
+        matches = list(QUERY_RE.finditer(query))
+        for i, m in enumerate(matches):
+            field = m.group(1) or m.group(3)
+            if field and field.lower() in FILTER_FIELDS:
+                clauses[-1][1].append((field.lower(), fold(m.group(2) if m.group(1) else m.group(4)).strip()))
+                continue
+            raw = m.group(5) if m.group(5) is not None else m.group(0)
+            if raw in ("OR", "|"):
+                clauses.append(([], []))
+                continue
+            is_prefix = raw.endswith("*") or (prefix_last and i == len(matches) - 1 and not query.endswith(" "))
+            tokens = tokenize(raw)
+            for j, tok in enumerate(tokens):
+                clauses[-1][0].append(tok + "*" if is_prefix and j == len(tokens) - 1 else tok)
+        return [c for c in clauses if c[0] or c[1]]
+
+    def _score_clause(self, terms, filters, limit=None):
+        n_docs = len(self.doc_numbers) or 1
+        candidates = None
+        for name, value in filters:
+            docs = self._field_docs(name, value)
+            candidates = set(docs) if candidates is None else candidates & docs
+            if not candidates:
+                return {}
+
+        per_term, term_tokens = [], {}
+        for term in terms:
+            toks = self._expand_tokens(term)
+            if len(toks) == 1:
+                merged = self.postings[toks[0]]
+            else:
+                # dict.update keeps this C-speed; a doc matching several expansions keeps one weight
+                merged = {}
+                for tok in toks:
+                    merged.update(self.postings[tok])
+            if not merged:
+                return {}
+            per_term.append((merged, math.log(1.0 + n_docs / len(merged))))
+            term_tokens[id(merged)] = toks
+
+        if not per_term:
+            return {doc: 0.0 for doc in candidates or ()}
+
+        # Intersect starting from the rarest term; key-view intersections run in C,
+        # so only the docs matching every term are scored in Python
+        per_term.sort(key=lambda p: len(p[0]))
+        rarest, idf = per_term[0]
+        if candidates is None and len(per_term) == 1:
+            return {doc: w * idf for doc, w in rarest.items()}
+        docs = rarest.keys() if candidates is None else candidates & rarest.keys()
+        for posting, _ in per_term[1:]:
+            docs = docs & posting.keys()
+            if not docs:
+                return {}
+        if limit is not None and len(docs) > TOP_K_SCAN * limit:
+            return self._top_k_and(per_term, [term_tokens[id(p)] for p, _ in per_term], docs, limit)
+        # Doc order (oldest first) is what search() relies on for recency tie-breaks
+        return {doc: sum(posting[doc] * idf for posting, idf in per_term) for doc in sorted(docs)}
+
+    def _impact_keys(self, tok):
+        """(-weight, -doc) in impact order: ascending, newer docs first on ties."""
+        posting = self.postings[tok]
+        for doc in self._impact_list(tok):
+            yield -posting[doc], -doc
+
+    def _top_k_and(self, per_term, tokens, docs, limit):
+        """
+        Top-k {doc: score} of an AND clause with many matches (threshold algorithm):
+        each term's docs are read in impact order, a chunk at a time, until the
+        k-th best beats the best score an unread doc could still reach.
+        """
+        streams = []
+        for toks in tokens:
+            lists = [self._impact_keys(tok) for tok in toks]
+            streams.append(lists[0] if len(lists) == 1 else heapq.merge(*lists))
+        step = max(limit, 256)
+        best, seen = [], set() # best: (score, doc), best first
+        while True:
+            new, last, exhausted = set(), [], False
+            for stream in streams:
+                chunk = list(itertools.islice(stream, step))
+                new.update(-doc for _, doc in chunk)
+                exhausted = exhausted or len(chunk) < step
+                last.append(chunk[-1] if chunk else (0.0, 0))
+            new -= seen
+            seen |= new
+            # Summed term by term, in the same order as the full scorer (identical floats)
+            scores = dict.fromkeys(new & docs, 0.0)
+            for posting, idf in per_term:
+                scores = {doc: s + posting[doc] * idf for doc, s in scores.items()}
+            best = heapq.nlargest(limit, itertools.chain(best, ((s, doc) for doc, s in scores.items())))
+            if exhausted:
+                break # Every doc with that term was read, so every match was scored
+            # An unread doc scores at most the last weights read, and ties them only if it is older
+            bound = (sum(-w * idf for (w, _), (_, idf) in zip(last, per_term)), min(-doc for _, doc in last))
+            if len(best) == limit and best[-1] >= bound:
+                break
+        return {doc: score for score, doc in sorted(best, key=lambda item: item[1])}
+
+    def search(self, query, limit=None, prefix_last=False):
+        """
+        Returns matching entry ids, best first (newer entries win ties).
+        ``prefix_last`` treats the last word as a prefix, for search-as-you-type.
+        """
+        with self._lock:
+            clauses = self._parse(query, prefix_last)
+            if not clauses:
+                return []
+            partial = [self._top_k_fast(terms, filters, limit) for terms, filters in clauses] if limit else [None]
+            if all(p is not None for p in partial):
+                # Max-merge of per-clause top-k lists still contains the overall top-k
+                results = {}
+                for p in partial:
+                    for doc, score in p.items():
+                        if score > results.get(doc, -1.0):
+                            results[doc] = score
+                ranked = heapq.nlargest(limit, sorted(results, reverse=True), key=results.__getitem__)
+                return [self.doc_ids[doc] for doc in ranked if self.doc_ids[doc] is not None]
+
+            # Per-clause top-k lists max-merge into the overall top-k, as above
+            results = self._score_clause(*clauses[0], limit=limit)
+            for terms, filters in clauses[1:]:
+                for doc, score in self._score_clause(terms, filters, limit=limit).items():
+                    if score > results.get(doc, -1.0):
+                        results[doc] = score
+            if not results:
+                return []
+
+            # Newest docs first, so the stable sort / nlargest keep them ahead on ties.
+            # A single clause is already in doc order (postings are filled chronologically).
+            docs = reversed(results) if len(clauses) == 1 else sorted(results, reverse=True)
+            if limit is None:
+                ranked = sorted(docs, key=results.__getitem__, reverse=True)
+            else:
+                ranked = heapq.nlargest(limit, docs, key=results.__getitem__)
+            return [self.doc_ids[doc] for doc in ranked if self.doc_ids[doc] is not None]
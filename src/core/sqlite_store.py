@@ -0,0 +1,241 @@
+import json
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from logger_agent import log_agent
+from src.core.query import parse_sort
+
+# Columns promoted out of the JSON payload so they can be filtered and sorted in SQL
+TASK_COLUMNS = ("timestamp", "type", "status", "universe", "project", "client", "role", "title")
+INDEXED_COLUMNS = ("timestamp", "type", "universe", "project", "client")
+FIELD_RE = re.compile(r"^\w+$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    timestamp TEXT, type TEXT, status TEXT,
+    universe TEXT, project TEXT, client TEXT, role TEXT, title TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS universes (name TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS projects (name TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS roles (name TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS clients (
+    id TEXT, name TEXT NOT NULL UNIQUE COLLATE NOCASE, created_at TEXT
+);
+"""
+
+class SQLiteStore:
+    """
+    Optional SQLite storage engine for the registry (``storage_backend: sqlite``).
+
+    Task entries keep their full JSON payload in ``data`` while the fields used for
+    filtering live in indexed columns, so callers can page through history with
+    WHERE / ORDER BY / LIMIT instead of loading everything into Python lists.
+
+    Writes share one connection under ``_lock``. Reads use a connection per
+    thread, so a query never runs on, or sees, another thread's open batch().
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._local = threading.local() # Per thread: batch flag and read connection
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            for col in INDEXED_COLUMNS:
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_tasks_{col} ON tasks({col})")
+
+    @contextmanager
+    def _writing(self):
+        """Write scope that commits immediately unless a batch() is open."""
+        with self._lock:
+            if getattr(self._local, 'in_batch', False):
+                yield self.conn
+                return
+            with self.conn:
+                yield self.conn
+
+    @contextmanager
+    def batch(self):
+        """Groups every write made inside the block into one SQLite transaction."""
+        with self._lock:
+            if getattr(self._local, 'in_batch', False):
+                yield # Nested: joins the open batch
+                return
+            self._local.in_batch = True
+            try:
+                yield
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+            finally:
+                self._local.in_batch = False
+
+    def _reader(self):
+        """
+        Connection for reads. Inside this thread's batch() it is the writer (which
+        holds the lock and sees the batch's own rows); otherwise this thread's own
+        connection, whose WAL snapshot only sees committed rows. Closed with its thread.
+        """
+        if getattr(self._local, 'in_batch', False):
+            return self.conn
+        conn = getattr(self._local, 'reader', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            self._local.reader = conn
+        return conn
+
+    # --- MIGRATION ---
+    def is_migrated(self):
+        row = self._reader().execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        return row is not None
+
+    def migrate_from_json(self, universes, projects, roles, clients, tasks):
+        """One-shot import of the legacy JSON registry."""
+        with self._writing():
+            for table, names in (("universes", universes), ("projects", projects), ("roles", roles)):
+                self.conn.executemany(f"INSERT OR IGNORE INTO {table}(name) VALUES (?)", [(n,) for n in names if n])
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO clients(id, name, created_at) VALUES (?, ?, ?)",
+                [(c.get('id'), c.get('name'), c.get('created_at')) for c in clients if c.get('name')]
+            )
+            # Oldest first so rowid order matches capture order
+            self.conn.executemany(self._insert_task_sql(), [self._task_row(t) for t in reversed(tasks)])
+            self.conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('json_migrated', '1')")
+        log_agent.log_event("DATA", f"SQLite registry migrated from JSON ({len(tasks)} entries)")
+
+    # --- NAME LISTS ---
+    def get_names(self, table):
+        rows = self._reader().execute(f"SELECT name FROM {table} ORDER BY name").fetchall()
+        return [r[0] for r in rows]
+
+    def add_name(self, table, name):
+        with self._writing():
+            cur = self.conn.execute(f"INSERT OR IGNORE INTO {table}(name) VALUES (?)", (name,))
+            return cur.rowcount > 0
+
+    def get_clients(self):
+        rows = self._reader().execute("SELECT name FROM clients ORDER BY rowid").fetchall()
+        return [r[0] for r in rows]
+
+    def add_client(self, client):
+        with self._writing():
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO clients(id, name, created_at) VALUES (?, ?, ?)",
+                (client['id'], client['name'], client['created_at'])
+            )
+            return cur.rowcount > 0
+
+    # --- TASKS ---
+    def _insert_task_sql(self):
+        cols = ", ".join(("id",) + TASK_COLUMNS + ("data",))
+        marks = ", ".join("?" for _ in range(len(TASK_COLUMNS) + 2))
+        return f"INSERT OR REPLACE INTO tasks({cols}) VALUES ({marks})"
+
+    def _task_row(self, record):
+        return (record.get('id'),) + tuple(record.get(c) for c in TASK_COLUMNS) + (json.dumps(record, ensure_ascii=False),)
+
+    def add_task(self, record):
+        with self._writing():
+            self.conn.execute(self._insert_task_sql(), self._task_row(record))
+
+    def merge_tasks(self, changes_by_id):
+        """
+        Applies {id: {field: value}} with one UPDATE per entry (json_set on the
+        payload plus the promoted columns), all in one transaction, so fields
+        changed concurrently by another writer are kept. Returns the merged records.
+        """
+        merged = []
+        with self._writing():
+            for entry_id, changes in changes_by_id.items():
+                fields = [f for f in changes if f != "id"]
+                if not fields:
+                    continue
+                for field in fields:
+                    if not FIELD_RE.match(field):
+                        raise ValueError(f"Invalid field name '{field}'")
+                columns = [f for f in fields if f in TASK_COLUMNS]
+                patch = ", ".join(f"'$.{f}', json(?)" for f in fields)
+                sets = ", ".join([f"data = json_set(data, {patch})"] + [f"{c} = ?" for c in columns])
+                params = [json.dumps(changes[f], ensure_ascii=False) for f in fields] + [changes[c] for c in columns]
+                if self.conn.execute(f"UPDATE tasks SET {sets} WHERE id = ?", params + [entry_id]).rowcount:
+                    row = self.conn.execute("SELECT data FROM tasks WHERE id = ?", (entry_id,)).fetchone()
+                    merged.append(json.loads(row[0]))
+        return merged
+
+    def delete_tasks(self, ids):
+        with self._writing():
+            self.conn.executemany("DELETE FROM tasks WHERE id = ?", [(i,) for i in ids])
+
+    def _column(self, field):
+        if field == "id" or field in TASK_COLUMNS:
+            return field
+        if not FIELD_RE.match(field):
+            raise ValueError(f"Invalid field name '{field}'")
+        # Fields that are not promoted are read from the JSON payload
+        return f"json_extract(data, '$.{field}')"
+
+    def _where(self, filters):
+        where, params = [], []
+        for key, value in (filters or {}).items():
+            if key == "since":
+                where.append("timestamp >= ?")
+                params.append(value)
+            elif key == "until":
+                where.append("timestamp < ?")
+                params.append(value)
+            elif isinstance(value, (list, tuple, set, frozenset)):
+                value = list(value)
+                if not value:
+                    where.append("0")
+                    continue
+                where.append(f"{self._column(key)} IN ({', '.join('?' for _ in value)})")
+                params.extend(value)
+            else:
+                where.append(f"{self._column(key)} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(where) if where else ""), params
+
+    def iter_tasks(self, filters=None, sort="-timestamp", offset=0, limit=None, batch_size=500):
+        """
+        Streams task records matching ``filters`` (same semantics as
+        src.core.query.matches) in ``sort`` order, fetching ``batch_size`` rows at a time.
+        """
+        field, descending = parse_sort(sort)
+        direction = "DESC" if descending else "ASC"
+        where, params = self._where(filters)
+        sql = f"SELECT data FROM tasks{where} ORDER BY {self._column(field)} {direction}, rowid {direction}"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset]
+
+        cur = self._reader().cursor()
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield json.loads(row[0])
+
+    def query_tasks(self, filters=None, sort="-timestamp", offset=0, limit=None):
+        return list(self.iter_tasks(filters, sort, offset, limit))
+
+    def count_tasks(self, filters=None):
+        where, params = self._where(filters)
+        return self._reader().execute(f"SELECT COUNT(*) FROM tasks{where}", params).fetchone()[0]
+
+    def close(self):
+        reader = getattr(self._local, 'reader', None)
+        if reader is not None:
+            reader.close()
+            self._local.reader = None
+        with self._lock:
+            self.conn.close()
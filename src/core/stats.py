@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+from datetime import date
+from logger_agent import log_agent
+
+# Registry fields with a per-value counter
+GROUP_FIELDS = ("universe", "project", "client", "type")
+
+def _empty():
+    stats = {"total": 0, "open_tasks": 0, "storage_bytes": 0, "by_day": {}, "by_week": {}}
+    for field in GROUP_FIELDS:
+        stats[f"by_{field}"] = {}
+    return stats
+
+# Bytes of an entry's image + note, measured once when it is added (see DataManager.add_task_entry)
+SIZE_FIELD = "size_bytes"
+
+def file_bytes(record):
+    size = 0
+    for key in ("file_path", "md_path"):
+        path = record.get(key)
+        if path:
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+    return size
+
+def _week_key(day):
+    try:
+        year, week, _ = date.fromisoformat(day).isocalendar()
+        return f"{year}-W{week:02d}"
+    except ValueError:
+        return ""
+
+class RegistryStats:
+    """
+    Materialised registry counters kept in ``data/stats.json``: captures per
+    day / ISO week / universe / project / client / type, open tasks and stored
+    bytes. They are adjusted on every write, so readers never rescan history;
+    a full rebuild only happens when the file is missing or its total drifted
+    from the registry count. Stored bytes come from each entry's ``size_bytes``,
+    so removing an entry whose files are already gone still subtracts them.
+    """
+
+    def __init__(self, stats_path):
+        self.stats_path = stats_path
+        self._lock = threading.RLock()
+        self._stats = None
+
+    def _load(self):
+        if self._stats is not None:
+            return
+        if os.path.exists(self.stats_path):
+            try:
+                with open(self.stats_path, "r", encoding="utf-8") as f:
+                    self._stats = {**_empty(), **json.load(f)}
+            except Exception as e:
+                log_agent.error(f"Failed to load {self.stats_path}, rebuilding", e)
+        if self._stats is None:
+            self._stats = _empty()
+            self._stats["total"] = -1 # Forces a rebuild in ensure()
+
+    def _save(self):
+        tmp_path = self.stats_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._stats, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.stats_path)
+        except Exception as e:
+            log_agent.error(f"Failed to save {self.stats_path}", e)
+
+    def _count(self, record, sign):
+        s = self._stats
+        s["total"] += sign
+        day = (record.get("timestamp") or "")[:10]
+        if day:
+            s["by_day"][day] = s["by_day"].get(day, 0) + sign
+            week = _week_key(day)
+            if week:
+                s["by_week"][week] = s["by_week"].get(week, 0) + sign
+        for field in GROUP_FIELDS:
+            value = record.get(field) or ""
+            bucket = s[f"by_{field}"]
+            bucket[value] = bucket.get(value, 0) + sign
+            if bucket[value] <= 0:
+                del bucket[value]
+        if record.get("type") == "Task" and record.get("status") == "todo":
+            s["open_tasks"] += sign
+        s["storage_bytes"] += sign * (record.get(SIZE_FIELD) or 0)
+
+    def apply(self, added=(), removed=()):
+        """
+        Adjusts the counters for records written to / removed from the registry.
+        Updates pass the old and new versions of the entries.
+        """
+        with self._lock:
+            self._load()
+            if self._stats["total"] < 0:
+                return # Pending rebuild will count them
+            for record in removed:
+                self._count(record, -1)
+            for record in added:
+                self._count(record, 1)
+            for bucket in ("by_day", "by_week"):
+                self._stats[bucket] = {k: v for k, v in self._stats[bucket].items() if v > 0}
+            self._save()
+
+    def ensure(self, registry_count, entries_provider):
+        """
+        Rebuilds from the registry when the file is missing or out of step with it.
+        Returns {id: {"size_bytes": n}} for entries saved before sizes were stored;
+        the caller writes them back (the update then adds their bytes).
+        """
+        with self._lock:
+            self._load()
+            if self._stats["total"] == registry_count():
+                return {}
+            self._stats = _empty()
+            backfill = {}
+            for record in entries_provider():
+                self._count(record, 1)
+                if record.get(SIZE_FIELD) is None:
+                    backfill[record["id"]] = {SIZE_FIELD: file_bytes(record)}
+            self._save()
+            log_agent.log_event("DATA", f"Stats rebuilt from {self._stats['total']} entries")
+            return backfill
+
+    def snapshot(self):
+        """Copy of the counters (O(1): nothing is recomputed)."""
+        with self._lock:
+            self._load()
+            return json.loads(json.dumps(self._stats))
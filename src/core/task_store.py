@@ -0,0 +1,387 @@
+import json
+import os
+import re
+import threading
+from logger_agent import log_agent
+from src.utils.file_lock import FileLock
+
+# Bytes read per step when streaming the snapshot
+STREAM_CHUNK = 64 * 1024
+_SEPARATORS = re.compile(r"[\s,]*")
+SHARD_KEY_RE = re.compile(r"^\d{4}-\d{2}")
+# Shard for records without a usable timestamp (sorts after every month)
+UNDATED_SHARD = "0000-00"
+
+def iter_json_array(filepath):
+    """Yields the items of a top-level JSON array one at a time, in constant memory."""
+    decoder = json.JSONDecoder()
+    with open(filepath, 'r', encoding='utf-8') as f:
+        buf = f.read(STREAM_CHUNK)
+        pos = _SEPARATORS.match(buf).end()
+        if buf[pos:pos + 1] != "[":
+            raise ValueError(f"{filepath} is not a JSON array")
+        pos += 1
+        eof = False
+        while True:
+            pos = _SEPARATORS.match(buf, pos).end()
+            if buf[pos:pos + 1] == "]":
+                return
+            try:
+                item, pos = decoder.raw_decode(buf, pos)
+            except ValueError:
+                # Item cut at the chunk boundary: pull in more data and retry
+                if eof:
+                    raise
+                chunk = f.read(STREAM_CHUNK)
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            yield item
+
+class JournalTaskStore:
+    """
+    Reader for the pre-shard layout (a JSON snapshot plus an append-only JSONL
+    journal), kept only so ShardedTaskStore can migrate it on first run.
+    """
+
+    def __init__(self, snapshot_path, journal_path):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+
+    def iter_records(self):
+        """Streams every record, newest first, without loading the snapshot into memory."""
+        journal = self._read_journal()
+        seen = set()
+        for record in reversed(journal):
+            rid = record.get('id')
+            if rid in seen:
+                continue
+            seen.add(rid)
+            yield record
+
+        if not os.path.exists(self.snapshot_path):
+            return
+        try:
+            for record in iter_json_array(self.snapshot_path):
+                # A crash between snapshot replace and journal truncation leaves duplicates
+                if record.get('id') not in seen:
+                    yield record
+        except Exception as e:
+            log_agent.error(f"Failed to stream {self.snapshot_path}", e)
+
+    def _read_journal(self):
+        records = []
+        if not os.path.exists(self.journal_path):
+            return records
+        try:
+            with open(self.journal_path, 'rb') as f:
+                data = f.read().decode('utf-8', errors='replace')
+        except Exception as e:
+            log_agent.error(f"Failed to load {self.journal_path}", e)
+            return records
+
+        for line in data.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Torn trailing write (crash mid-append); ignore the partial line
+                log_agent.error(f"Skipping corrupt journal line in {self.journal_path}")
+        return records
+
+class ShardedTaskStore:
+    """
+    Task registry split into one JSONL shard per month (``<shard_dir>/2026-10.jsonl``)
+    plus a small manifest of per-shard counts, sizes and time ranges.
+
+    New entries are appended to the shard of their month, so older shards are
+    never rewritten by a save and backups stay incremental. Newest-first reads
+    open shards from the most recent one and stop as soon as the caller has
+    enough, and the manifest lets offsets and date ranges skip whole shards.
+    """
+
+    def __init__(self, shard_dir, legacy_snapshot=None, legacy_journal=None):
+        self.shard_dir = shard_dir
+        self.manifest_path = os.path.join(shard_dir, "manifest.json")
+        self._lock = threading.RLock()
+        self._shard_ids = {} # key -> ids in that shard, for shards this instance scanned or appended to
+        os.makedirs(shard_dir, exist_ok=True)
+
+        self._manifest_sig = None
+        # Instances sharing data/ must not migrate or rebuild the manifest at the same time
+        with FileLock(self.manifest_path):
+            if not os.path.exists(self.manifest_path) and legacy_snapshot:
+                self._migrate_legacy(legacy_snapshot, legacy_journal)
+            self.manifest = self._load_manifest()
+        self._manifest_sig = self._signature(self.manifest_path)
+
+    # --- SHARDS & MANIFEST ---
+    def shard_key(self, record):
+        ts = record.get('timestamp') or ""
+        return ts[:7] if SHARD_KEY_RE.match(ts) else UNDATED_SHARD
+
+    def shard_path(self, key):
+        return os.path.join(self.shard_dir, f"{key}.jsonl")
+
+    def _load_manifest(self):
+        manifest = {"shards": {}}
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except Exception as e:
+                log_agent.error(f"Failed to load {self.manifest_path}, rebuilding", e)
+
+        # Shards whose size no longer matches (crash before the manifest write,
+        # edited by hand) or that are missing from the manifest are re-scanned
+        shards = manifest.setdefault("shards", {})
+        on_disk = {n[:-len(".jsonl")] for n in os.listdir(self.shard_dir) if n.endswith(".jsonl")}
+        changed = False
+        for key in on_disk:
+            info = shards.get(key)
+            if info is None or info.get("bytes") != os.path.getsize(self.shard_path(key)):
+                shards[key] = self._scan_shard(key)
+                changed = True
+        for key in set(shards) - on_disk:
+            del shards[key]
+            changed = True
+        if changed or not os.path.exists(self.manifest_path):
+            self._save_manifest(manifest)
+        return manifest
+
+    def _save_manifest(self, manifest, sync=False):
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=4, sort_keys=True)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest_sig = self._signature(self.manifest_path)
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _merge_manifest(self, touched):
+        """
+        Writes our shard infos for ``touched`` keys into the manifest on disk,
+        keeping what other instances recorded for every other shard.
+        """
+        with FileLock(self.manifest_path):
+            merged = {"shards": {}}
+            if os.path.exists(self.manifest_path):
+                try:
+                    with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                        merged = json.load(f)
+                except Exception:
+                    merged = {"shards": dict(self.manifest["shards"])}
+            shards = merged.setdefault("shards", {})
+            for key in touched:
+                info = self.manifest["shards"].get(key)
+                if info is None:
+                    shards.pop(key, None)
+                elif info.get("bytes") != os.path.getsize(self.shard_path(key)):
+                    shards[key] = self._scan_shard(key) # Another writer appended since
+                else:
+                    shards[key] = info
+            self.manifest = merged
+            self._save_manifest(merged)
+
+    def refresh(self):
+        """Reloads the manifest if another instance changed it (one stat call)."""
+        if self._signature(self.manifest_path) != self._manifest_sig:
+            with self._lock:
+                self.manifest = self._load_manifest()
+                self._manifest_sig = self._signature(self.manifest_path)
+
+    def _scan_shard(self, key):
+        records = self._read_shard(key)
+        self._shard_ids[key] = {r.get('id') for r in records}
+        stamps = [r.get('timestamp') or "" for r in records]
+        return {
+            "count": len(records),
+            "bytes": os.path.getsize(self.shard_path(key)),
+            "first": min(stamps) if stamps else "",
+            "last": max(stamps) if stamps else "",
+        }
+
+    def _read_shard(self, key):
+        """Returns a shard's records, newest first (last write wins per id)."""
+        path = self.shard_path(key)
+        by_id = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn trailing write (crash mid-append); ignore the partial line
+                        log_agent.error(f"Skipping corrupt line in {path}")
+                        continue
+                    by_id.pop(record.get('id'), None)
+                    by_id[record.get('id')] = record
+        except FileNotFoundError:
+            return []
+        return sorted(reversed(list(by_id.values())), key=lambda r: r.get('timestamp') or "", reverse=True)
+
+    # --- WRITE PATH ---
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records, sync=True):
+        """
+        Appends records to their month shards. ``sync=False`` skips the fsync when
+        the caller already made the batch durable (see DataManager.transaction).
+        """
+        groups = {}
+        for record in records:
+            groups.setdefault(self.shard_key(record), []).append(record)
+
+        with self._lock:
+            shards = self.manifest["shards"]
+            for key, group in groups.items():
+                path = self.shard_path(key)
+                # Per-shard lock: instances appending to other months never wait on each other
+                with FileLock(path):
+                    info = shards.get(key)
+                    if info is None or (os.path.exists(path) and info.get("bytes") != os.path.getsize(path)):
+                        # Unknown shard, or another instance appended to it
+                        info = shards[key] = self._scan_shard(key) if os.path.exists(path) else {"count": 0, "bytes": 0, "first": "", "last": ""}
+                    if not os.path.exists(path):
+                        self._shard_ids[key] = set()
+                    elif key not in self._shard_ids:
+                        self._shard_ids[key] = {r.get('id') for r in self._read_shard(key)}
+                    # A re-appended id (replayed transaction or replication) replaces its record, it does not add one
+                    ids = self._shard_ids[key]
+                    new_ids = {r.get('id') for r in group} - ids
+                    with open(path, 'a', encoding='utf-8') as f:
+                        f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in group))
+                        if sync:
+                            f.flush()
+                            os.fsync(f.fileno())
+
+                    stamps = [r.get('timestamp') or "" for r in group]
+                    ids |= new_ids
+                    info["count"] += len(new_ids)
+                    info["bytes"] = os.path.getsize(path)
+                    info["first"] = min([info["first"]] + stamps) if info["first"] else min(stamps)
+                    info["last"] = max([info["last"]] + stamps)
+            self._merge_manifest(groups)
+
+    def rewrite(self, deleted=(), patches=()):
+        """
+        Drops ``deleted`` records (matched by id) and merges ``patches``
+        ((record, {field: value}) pairs) into the stored copy re-read under the
+        shard lock, so concurrent writers touching other fields of the same
+        entry are not overwritten. Returns the patched records.
+        Only the shards holding them are rewritten, each atomically (temp + replace).
+        """
+        changes = {}
+        for record in deleted:
+            changes.setdefault(self.shard_key(record), (set(), {}))[0].add(record.get('id'))
+        for record, fields in patches:
+            changes.setdefault(self.shard_key(record), (set(), {}))[1][record.get('id')] = fields
+
+        patched = []
+        with self._lock:
+            for key, (drop, patch) in changes.items():
+                # Re-read under the shard lock so concurrent appends and edits are kept
+                with FileLock(self.shard_path(key)):
+                    records = []
+                    for record in reversed(self._read_shard(key)):
+                        rid = record.get('id')
+                        if rid in drop:
+                            continue
+                        if rid in patch:
+                            record = {**record, **patch[rid]}
+                            patched.append(record)
+                        records.append(record)
+                    path = self.shard_path(key)
+                    tmp_path = f"{path}.{os.getpid()}.tmp"
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, path)
+                    self.manifest["shards"][key] = self._scan_shard(key)
+            if changes:
+                self._merge_manifest(changes)
+        return patched
+
+    # --- READ PATH ---
+    def shard_keys(self, since=None, until=None):
+        """Shard keys newest first, pruned to those overlapping [since, until)."""
+        self.refresh()
+        keys = []
+        for key, info in self.manifest["shards"].items():
+            if since and info.get("last") and info["last"] < since:
+                continue
+            if until and info.get("first") and info["first"] >= until:
+                continue
+            keys.append(key)
+        return sorted(keys, reverse=True)
+
+    def iter_records(self, filters=None, skip=0):
+        """
+        Streams records newest first, opening one shard at a time.
+        ``since``/``until`` in ``filters`` prune shards by their time range;
+        ``skip`` jumps over whole shards using the manifest counts.
+        """
+        filters = filters or {}
+        for key in self.shard_keys(filters.get("since"), filters.get("until")):
+            count = self.manifest["shards"][key].get("count", 0)
+            if skip >= count:
+                skip -= count
+                continue
+            records = self._read_shard(key)
+            for record in records[skip:]:
+                yield record
+            skip = 0
+
+    def load_all(self):
+        return list(self.iter_records())
+
+    def version(self):
+        """Changes whenever any instance writes to the registry (the manifest is rewritten on every write)."""
+        self.refresh()
+        return self._manifest_sig
+
+    def count(self):
+        self.refresh()
+        return sum(info.get("count", 0) for info in self.manifest["shards"].values())
+
+    # --- MIGRATION ---
+    def _migrate_legacy(self, snapshot_path, journal_path):
+        """Splits the legacy tasks.json (+ journal) into month shards, once."""
+        legacy = JournalTaskStore(snapshot_path, journal_path or snapshot_path + ".journal")
+        groups = {}
+        for record in legacy.iter_records():
+            groups.setdefault(self.shard_key(record), []).append(record)
+
+        for key, group in groups.items():
+            # Shards are written oldest first, like appends
+            group.sort(key=lambda r: r.get('timestamp') or "")
+            tmp_path = self.shard_path(key) + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in group))
+            os.replace(tmp_path, self.shard_path(key))
+
+        # The manifest marks the migration as done; legacy files are kept as a backup
+        self.manifest = {"shards": {key: self._scan_shard(key) for key in groups}}
+        self._shard_ids.clear() # Loaded again per shard on its next append
+        self._save_manifest(self.manifest, sync=True)
+        for path in (snapshot_path, journal_path):
+            if path and os.path.exists(path):
+                os.replace(path, path + ".migrated")
+        log_agent.log_event("DATA", f"Task registry split into {len(groups)} monthly shards")
@@ -11,6 +11,7 @@ class SystemTrayIcon:
         self.on_dashboard = on_dashboard
         self.on_exit = on_exit
         self.icon = None
+        self.pending_saves = 0
 
     def create_image(self):
         # Create a simple icon (Blue Diamond)
@@ -31,6 +32,9 @@ class SystemTrayIcon:
 
     def run(self):
         menu = (
+            # Only visible while the background writer has saves queued
+            pystray.MenuItem(lambda item: f'💾 Saving… ({self.pending_saves} pending)', None,
+                             enabled=False, visible=lambda item: self.pending_saves > 0),
             pystray.MenuItem('📊 Dashboard', self.action_dashboard),
             pystray.MenuItem('📸 Capture Now', self.action_capture, default=True),
             pystray.MenuItem('📂 Open Folder', self.action_open_folder),
@@ -45,6 +49,13 @@ class SystemTrayIcon:
         # On Windows, it's flexible but sticking to thread is valuable for GUI app integration.
         threading.Thread(target=self.icon.run, daemon=True).start()
 
+    def set_pending_saves(self, count):
+        """Shows the save queue depth in the tooltip and menu (safe from any thread)."""
+        self.pending_saves = count
+        if self.icon:
+            self.icon.title = f"LifeOS Capture ({count} saves pending)" if count else "LifeOS Capture"
+            self.icon.update_menu()
+
     def action_capture(self, icon, item):
         self.on_capture()
 
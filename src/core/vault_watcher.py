@@ -0,0 +1,251 @@
+import os
+import queue
+import threading
+import time
+from logger_agent import log_agent
+from src.core.config import ConfigManager
+from src.core.data_manager import data_manager
+from src.core.locator import path_key, read_file_id
+
+try:
+    # Native backend (inotify / ReadDirectoryChangesW / FSEvents) when installed
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+# Files the registry points at
+WATCHED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".avif", ".md")
+# Stat-cache fallback without watchdog: off unless config.yaml sets watcher_poll_seconds
+# (each scan re-stats the whole vault, which is heavy on synced / network folders)
+MIN_POLL_INTERVAL = 30.0
+# Events are applied in batches once no new one arrived for this long
+BATCH_DELAY = 1.0
+# ...or once a batch is this old / this large, so a steady stream (a sync client) still gets applied
+MAX_BATCH_AGE = 10.0
+MAX_BATCH_SIZE = 5000
+# A delete is held this long in case it is half of a move (delete + create across volumes)
+DELETE_GRACE = 3.0
+
+FIELDS = {"img": "file_path", "md": "md_path"}
+
+def _watched(path):
+    return path.lower().endswith(WATCHED_EXTENSIONS)
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, events):
+        self.events = events
+
+    def on_moved(self, event):
+        self.events.put(("moved", event.src_path, event.dest_path, event.is_directory))
+
+    def on_deleted(self, event):
+        self.events.put(("deleted", event.src_path, None, event.is_directory))
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.events.put(("created", event.src_path, None, False))
+
+class VaultWatcher:
+    """
+    Keeps file_path / md_path of registry entries in step with the vault.
+
+    Watches the vault roots with watchdog. Without it, polling a stat cache
+    (inode, size, mtime) is opt-in via ``watcher_poll_seconds``. Moves, renames and
+    deletes of known files are looked up in the locator and written back with
+    DataManager.update_task_entries(), batched; files that arrive with an
+    embedded entry id (moved in from another volume) are relinked by that id.
+    """
+
+    def __init__(self, poll_interval=None):
+        self.poll_interval = poll_interval
+        self.events = queue.Queue()
+        self.roots = []
+        self.running = False
+        self._stop = None
+        self._observer = None
+
+    # --- LIFECYCLE ---
+    def start(self, paths=None):
+        if self.running:
+            return
+        paths = paths or ConfigManager.get_dynamic_paths()
+        self.roots = self._roots(paths)
+        if not self.roots:
+            log_agent.log_event("WATCHER", "No vault folders to watch")
+            return
+        observer = None
+        if Observer is not None:
+            try:
+                observer = Observer()
+                handler = _EventHandler(self.events)
+                for root in self.roots:
+                    observer.schedule(handler, root, recursive=True)
+                observer.start() # Events queue up until the processing thread runs
+            except Exception as e:
+                log_agent.error("Native file watcher unavailable", e)
+                observer = None
+        poll_interval = self.poll_interval or ConfigManager.load().get('watcher_poll_seconds')
+        if observer is None and not poll_interval:
+            log_agent.log_event("WATCHER", "No native watcher and polling is off (watcher_poll_seconds); "
+                                           "moved files are found by the path healer instead")
+            return
+
+        self._stop = stop = threading.Event()
+        self.running = True
+        threading.Thread(target=self._process, args=(stop,), daemon=True).start()
+        if observer is not None:
+            self._observer = observer
+            mode = "native"
+        else:
+            mode = "polling"
+            interval = max(float(poll_interval), MIN_POLL_INTERVAL)
+            threading.Thread(target=self._poll, args=(stop, interval), daemon=True).start()
+        log_agent.log_event("WATCHER", f"Watching vault ({mode}): {', '.join(self.roots)}")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._stop.set()
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+                self._observer.join(timeout=2)
+            except Exception:
+                pass
+            self._observer = None
+
+    def restart(self, paths=None):
+        """Re-targets the watcher, e.g. after the vault root changed."""
+        self.stop()
+        self.start(paths)
+
+    @staticmethod
+    def _roots(paths):
+        """Existing vault folders, without those nested inside another one."""
+        roots = []
+        for p in sorted({os.path.abspath(paths[k]) for k in ("root", "universes", "projects") if paths.get(k)}, key=len):
+            if os.path.isdir(p) and not any(path_key(p).startswith(path_key(r).rstrip(os.sep) + os.sep) for r in roots):
+                roots.append(p)
+        return roots
+
+    # --- POLLING FALLBACK ---
+    def _snapshot(self):
+        stats = {}
+        stack = list(self.roots)
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.name.startswith("."):
+                            continue # .obsidian, .trash, .gemshot
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif _watched(entry.name):
+                            st = entry.stat(follow_symlinks=False)
+                            stats[entry.path] = (entry.inode(), st.st_size, st.st_mtime_ns)
+            except OSError:
+                continue
+        return stats
+
+    def _poll(self, stop, interval):
+        previous = self._snapshot()
+        while not stop.wait(interval):
+            current = self._snapshot()
+            gone = previous.keys() - current.keys()
+            new = current.keys() - previous.keys()
+            # Same inode under a new name is a move
+            by_inode = {current[p][0]: p for p in new if current[p][0]}
+            for path in gone:
+                dest = by_inode.pop(previous[path][0], None) if previous[path][0] else None
+                if dest:
+                    new.discard(dest)
+                    self.events.put(("moved", path, dest, False))
+                else:
+                    self.events.put(("deleted", path, None, False))
+            for path in new:
+                self.events.put(("created", path, None, False))
+            previous = current
+
+    # --- APPLYING EVENTS ---
+    def _process(self, stop):
+        try:
+            data_manager.sync_locator()
+        except Exception as e:
+            log_agent.error("Locator sync failed", e)
+
+        pending_deletes = {}
+        while not stop.is_set():
+            batch = []
+            try:
+                batch.append(self.events.get(timeout=BATCH_DELAY))
+                deadline = time.monotonic() + MAX_BATCH_AGE
+                while len(batch) < MAX_BATCH_SIZE and time.monotonic() < deadline:
+                    batch.append(self.events.get(timeout=BATCH_DELAY))
+            except queue.Empty:
+                pass
+            if not batch and not pending_deletes:
+                continue
+            try:
+                self._apply(batch, pending_deletes)
+            except Exception as e:
+                log_agent.error("Vault watcher failed to apply changes", e)
+
+    def _apply(self, batch, pending_deletes):
+        locator = data_manager.locator
+        changes = {}
+        now = time.time()
+
+        def move(entry_id, kind, dest):
+            changes.setdefault(entry_id, {})[FIELDS[kind]] = os.path.abspath(dest)
+
+        for kind, src, dest, is_dir in batch:
+            if kind == "moved":
+                if is_dir:
+                    for path, entry_id, k in locator.owners_under(src):
+                        move(entry_id, k, os.path.join(dest, os.path.relpath(path, src)))
+                    continue
+                owner = locator.owner(src)
+                if owner:
+                    move(owner[0], owner[1], dest)
+                elif _watched(dest):
+                    self._relink(dest, move, pending_deletes)
+            elif kind == "deleted":
+                owners = locator.owners_under(src) if is_dir else [(src,) + (locator.owner(src) or (None, None))]
+                for path, entry_id, k in owners:
+                    if entry_id:
+                        pending_deletes[path_key(path)] = (now, entry_id, k)
+            elif kind == "created" and _watched(src):
+                self._relink(src, move, pending_deletes)
+
+        # Deletes that were not the first half of a move
+        for key, (at, entry_id, k) in list(pending_deletes.items()):
+            if now - at < DELETE_GRACE:
+                continue
+            del pending_deletes[key]
+            known = (locator.get(entry_id) or {}).get(k)
+            if known and path_key(known) == key and not os.path.exists(known):
+                changes.setdefault(entry_id, {}).setdefault(FIELDS[k], "") # Unless it moved in this batch
+
+        if changes:
+            data_manager.update_task_entries(changes)
+            log_agent.log_event("WATCHER", f"Registry synced with vault ({len(changes)} entries)")
+
+    def _relink(self, path, move, pending_deletes):
+        """A file with an embedded entry id appeared: point the entry at it if its old path is gone."""
+        entry_id = read_file_id(path)
+        if not entry_id or entry_id not in data_manager.locator:
+            return
+        kind = "md" if path.lower().endswith(".md") else "img"
+        known = data_manager.locator.get(entry_id).get(kind)
+        if known and path_key(known) == path_key(path):
+            return
+        if not known or not os.path.exists(known):
+            move(entry_id, kind, path)
+            if known:
+                pending_deletes.pop(path_key(known), None)
+
+vault_watcher = VaultWatcher()
@@ -3,9 +3,21 @@ import tkinter as tk
 from PIL import Image, ImageTk
 import os
 import datetime
+import threading
 from src.core.config import ConfigManager, COLORS
+from src.core.archiver import extract, open_image
 from src.core.data_manager import data_manager
+from src.core.path_healer import heal_paths
+from src.core.garbage_collector import human_size
 from src.utils.platform_utils import open_folder
+from logger_agent import log_agent
+
+# Max ranked results shown for a search query
+SEARCH_LIMIT = 200
+# Cards fetched per page of the gallery
+PAGE_SIZE = 48
+# Typing pause before a search runs (each keystroke restarts the timer)
+SEARCH_DEBOUNCE_MS = 200
 
 class CaptureCard(ctk.CTkFrame):
     def __init__(self, parent, entry, on_click):
@@ -16,29 +28,17 @@ class CaptureCard(ctk.CTkFrame):
         self.setup_ui()
         
     def setup_ui(self):
-        # --- PATH RECOVERY (Auto-Healing) ---
+        # --- PATH RESOLUTION ---
+        # Dead paths are fixed by the batched healing pass (see DashboardWindow.start_healing)
         img_path = self.entry.get('file_path', '')
-        
-        # Ensure path is absolute if it exists as relative
-        if img_path and not os.path.isabs(img_path):
-            img_path = os.path.abspath(img_path)
-
-        # If path is dead, try to reconstruct it logically
-        if not img_path or not os.path.exists(img_path):
-            print(f"[DASHBOARD] Image missing: {img_path}. Attempting recovery...")
-            recovered_path = self._try_recover_path(img_path)
-            if recovered_path:
-                img_path = recovered_path
-                print(f"[DASHBOARD] ✅ Found at: {recovered_path}")
-                # Update the entry for this session
-                self.entry['file_path'] = recovered_path
-            else:
-                print(f"[DASHBOARD] ❌ Failed to recover: {self.entry.get('title')}")
+        if img_path and not os.path.exists(img_path):
+            img_path = data_manager.locate(self.entry) or img_path
 
-        # Thumbnail
-        if img_path and os.path.exists(img_path):
+        # Thumbnail (archived captures are decoded straight from their zip)
+        archived = not img_path and self.entry.get('archive_path')
+        if archived or (img_path and os.path.exists(img_path)):
             try:
-                pil_img = Image.open(img_path)
+                pil_img = open_image(self.entry) if archived else Image.open(img_path)
                 pil_img.thumbnail((320, 200)) # Better quality
                 self.thumb_img = ctk.CTkImage(pil_img, size=(280, 150))
                 self.lbl_thumb = ctk.CTkLabel(self, image=self.thumb_img, text="", corner_radius=10)
@@ -73,82 +73,8 @@ class CaptureCard(ctk.CTkFrame):
         ctk.CTkButton(btn_row, text="View Detail", height=28, font=("Inter", 10, "bold"), fg_color=COLORS["primary"], corner_radius=8, command=lambda: self.on_click(self.entry)).pack(side="left", fill="x", expand=True, padx=(0, 4))
         ctk.CTkButton(btn_row, text="📂", width=35, height=28, fg_color="transparent", border_width=1, border_color=COLORS["border"], text_color=COLORS["text"], corner_radius=8, command=self.open_dir).pack(side="right")
 
-    def _try_recover_path(self, old_path):
-        """Attempts to find the image in PARA structure if moved."""
-        title = self.entry.get('title', '').strip()
-        uni = self.entry.get('universe', '').strip()
-        proj = self.entry.get('project', '').strip()
-        
-        # Priority: Extract timestamp from old path if possible (it's the most unique key)
-        timestamp = None
-        if old_path:
-            # Extract numbers from temp_XXXXXXXXXX.png
-            import re
-            match = re.search(r'(\d{10})', os.path.basename(old_path))
-            if match:
-                timestamp = match.group(1)
-
-        # Build search directories
-        paths = ConfigManager.get_dynamic_paths()
-        search_dirs = []
-        
-        # 1. Broad PARA Project Attachment search
-        if proj:
-            search_dirs.append(os.path.join(paths['projects'], proj, "attachments"))
-            search_dirs.append(os.path.join(paths['projects'], proj)) # Sibling search
-        
-        # 2. Broad PARA Universe Attachment search
-        if uni:
-            search_dirs.append(os.path.join(paths['universes'], uni, "attachments"))
-            search_dirs.append(os.path.join(paths['universes'], uni)) # Sibling search
-            
-        # 3. Local output
-        search_dirs.append(os.path.abspath(os.path.join("output", "attachments")))
-        
-        # 4. DEEP SCAN Roots (Last Resort)
-        search_dirs.append(paths['projects'])
-        search_dirs.append(paths['universes'])
-
-        filename_part = "".join(x for x in title if x.isalnum() or x in " -_").strip()
-        
-        for s_dir in search_dirs:
-            if not os.path.exists(s_dir): continue
-            
-            try:
-                # For root folders, look only 1 level deep in subfolders
-                is_root = s_dir in [paths['projects'], paths['universes']]
-                
-                if is_root:
-                    # Scan subfolders attachments
-                    for sub in os.listdir(s_dir):
-                        sub_path = os.path.join(s_dir, sub, "attachments")
-                        if os.path.exists(sub_path):
-                            res = self._scan_dir_for_match(sub_path, timestamp, filename_part)
-                            if res: return res
-                else:
-                    res = self._scan_dir_for_match(s_dir, timestamp, filename_part)
-                    if res: return res
-            except:
-                continue
-                
-        return None
-
-    def _scan_dir_for_match(self, directory, timestamp, filename_part):
-        try:
-            for f in os.listdir(directory):
-                # Priority 1: Timestamp (ID)
-                if timestamp and timestamp in f:
-                    return os.path.abspath(os.path.join(directory, f))
-                # Priority 2: Title match
-                if filename_part and len(filename_part) > 5:
-                    if filename_part.lower() in f.lower() and f.lower().endswith(".png"):
-                        return os.path.abspath(os.path.join(directory, f))
-        except:
-            pass
-        return None
-
     def open_dir(self):
-        path = self.entry.get('file_path', '')
+        path = self.entry.get('file_path') or self.entry.get('archive_path', '')
         if path:
             open_folder(os.path.dirname(path))
 
@@ -160,11 +86,35 @@ class DashboardWindow(ctk.CTkToplevel):
         self.after(0, lambda: self.state("zoomed"))
         self.configure(fg_color=COLORS["bg"])
         
-        self.entries = data_manager._load_json(os.path.join("data", "tasks.json"))
-        self.filtered_entries = self.entries
+        self.current_cat = 'ALL'
+        self._filter_job = None
+        self._filter_request = None
+        # Only the rendered page is fetched; "Load more" pulls the next one
+        self.page = data_manager.query(limit=PAGE_SIZE)
+        # Compact records: notes / AI analysis are only fetched if a card needs them
+        self.filtered_entries = data_manager.compact_records(self.page)
         
         self.setup_ui()
         self.refresh_grid()
+        self.start_healing()
+
+    def start_healing(self):
+        """Loads the stats header, then fixes dead file paths in one background pass and re-renders if anything moved."""
+        def worker():
+            try:
+                # May rebuild the counters from every shard (first run, stale stats): never on the Tk thread
+                stats = data_manager.get_stats()
+                self.after(0, lambda: self.show_stats(stats))
+            except Exception as e:
+                log_agent.error("Could not load registry stats", e)
+            try:
+                fixed = heal_paths()
+            except Exception as e:
+                log_agent.error("Path healing failed", e)
+                return
+            if fixed:
+                self.after(0, self.filter_data)
+        threading.Thread(target=worker, daemon=True).start()
 
     def setup_ui(self):
         # --- TOP NAVIGATION ---
@@ -180,9 +130,9 @@ class DashboardWindow(ctk.CTkToplevel):
         self.search_entry = ctk.CTkEntry(self.top_nav, placeholder_text="Search in Knowledge Base...", width=400, height=40, font=("Inter", 12), fg_color=COLORS["bg"], border_color=COLORS["border"], textvariable=self.search_var)
         self.search_entry.pack(side="left", padx=20)
         
-        # Stats
-        stats_text = f"Total Captures: {len(self.entries)}"
-        ctk.CTkLabel(self.top_nav, text=stats_text, font=("Inter", 12), text_color=COLORS["text_dim"]).pack(side="right", padx=30)
+        # Stats (filled in by the background worker, see start_healing)
+        self.stats_label = ctk.CTkLabel(self.top_nav, text="Loading stats...", font=("Inter", 12), text_color=COLORS["text_dim"])
+        self.stats_label.pack(side="right", padx=30)
 
         # --- SIDEBAR ---
         self.sidebar = ctk.CTkFrame(self, fg_color=COLORS["bg"], width=250, corner_radius=0)
@@ -194,6 +144,7 @@ class DashboardWindow(ctk.CTkToplevel):
         self.btn_tasks = self.add_sidebar_btn("✅ Tasks", "Task")
         self.btn_notes = self.add_sidebar_btn("📝 Notes", "Nota")
         self.btn_screens = self.add_sidebar_btn("🖥️ Screenshots", "Screen")
+        self.btn_dupes = self.add_sidebar_btn("🧬 Duplicates", "DUPES")
         
         ctk.set_appearance_mode(ConfigManager.get_colors().get('ctk_mode', 'dark'))
 
@@ -204,6 +155,13 @@ class DashboardWindow(ctk.CTkToplevel):
         # Grid config
         self.main_content.grid_columnconfigure((0,1,2,3), weight=1)
 
+    def show_stats(self, stats):
+        today = datetime.date.today()
+        week = "{}-W{:02d}".format(*today.isocalendar()[:2])
+        self.stats_label.configure(text=f"Total Captures: {stats['total']}  ·  Today: {stats['by_day'].get(today.isoformat(), 0)}"
+                                        f"  ·  This week: {stats['by_week'].get(week, 0)}  ·  Open Tasks: {stats['open_tasks']}"
+                                        f"  ·  {human_size(stats['storage_bytes'])}")
+
     def add_sidebar_btn(self, text, filter_val):
         btn = ctk.CTkButton(self.sidebar, text=text, anchor="w", fg_color="transparent", text_color=COLORS["text"], hover_color=COLORS["panel"], height=40, font=("Inter", 12), command=lambda: self.set_category_filter(filter_val))
         btn.pack(fill="x", padx=10, pady=2)
@@ -214,42 +172,110 @@ class DashboardWindow(ctk.CTkToplevel):
         self.filter_data()
 
     def filter_data(self, *args):
-        query = self.search_var.get().lower()
-        cat = getattr(self, 'current_cat', 'ALL')
-        
-        self.filtered_entries = []
-        for e in self.entries:
-            # Search filter
-            match_query = query in e.get('title', '').lower() or query in e.get('tags', '').lower() or query in e.get('notes', '').lower()
-            # Category filter
-            match_cat = (cat == 'ALL' or e.get('type') == cat)
-            
-            if match_query and match_cat:
-                self.filtered_entries.append(e)
-                
-        self.refresh_grid()
+        """Search box / category callback: debounced, the query itself runs off the UI thread."""
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(SEARCH_DEBOUNCE_MS, self._run_filter)
+
+    def _run_filter(self):
+        self._filter_job = None
+        if self.current_cat == 'DUPES':
+            self.show_duplicates()
+            return
+        query = self.search_var.get()
+        cat = self.current_cat
+        # Category filter (indexed WHERE when the SQLite backend is active)
+        filters = {} if cat == 'ALL' else {'type': cat}
+        self._filter_request = request = object()
+
+        def worker():
+            page, entries = None, []
+            try:
+                if not query.strip():
+                    page = data_manager.query(filters, limit=PAGE_SIZE)
+                    entries = data_manager.compact_records(page)
+                else:
+                    # Ranked full-text search (title, tags, notes, AI analysis; tag:/project: filters)
+                    ranked = data_manager.search(query, limit=SEARCH_LIMIT, prefix_last=True)
+                    entries = [r for r in data_manager.resolve(ranked) if not filters or r.get('type') == cat]
+            except Exception as e:
+                log_agent.error("Dashboard search failed", e)
+
+            def apply():
+                # Ignore stale results (the user typed again or switched category)
+                if self._filter_request is request:
+                    self.page = page
+                    self.filtered_entries = entries
+                    self.refresh_grid()
+            self.after(0, apply)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def show_duplicates(self):
+        """Near-identical captures, grouped together. Hashing runs off the UI thread."""
+        query = self.search_var.get().strip()
+        self._dupes_request = request = object()
+
+        def worker():
+            entries = []
+            try:
+                data_manager.backfill_phashes()
+                ids = [i for group in data_manager.duplicate_groups() for i in group]
+                if query:
+                    keep = set(data_manager.search(query, prefix_last=True))
+                    ids = [i for i in ids if i in keep]
+                entries = data_manager.resolve(ids[:SEARCH_LIMIT])
+            except Exception as e:
+                log_agent.error("Duplicate scan failed", e)
+
+            def apply():
+                # Ignore stale results (the user typed again or left the view)
+                if self._dupes_request is request and self.current_cat == 'DUPES':
+                    self.page = None
+                    self.filtered_entries = entries
+                    self.refresh_grid()
+            self.after(0, apply)
+
+        threading.Thread(target=worker, daemon=True).start()
 
     def refresh_grid(self):
         # Clear existing
         for widget in self.main_content.winfo_children():
             widget.destroy()
-            
+        self.render_cards(0)
+
+    def render_cards(self, start):
+        if getattr(self, 'btn_more', None) is not None:
+            self.btn_more.destroy()
+            self.btn_more = None
+
         columns = 4
-        for i, entry in enumerate(self.filtered_entries):
+        for i in range(start, len(self.filtered_entries)):
             r, c = divmod(i, columns)
-            card = CaptureCard(self.main_content, entry, self.view_detail)
+            card = CaptureCard(self.main_content, self.filtered_entries[i], self.view_detail)
             card.grid(row=r, column=c, padx=10, pady=10, sticky="nsew")
 
+        if self.page is not None and self.page.has_more:
+            row = (len(self.filtered_entries) + columns - 1) // columns
+            self.btn_more = ctk.CTkButton(self.main_content, text="Load more", height=36, font=("Inter", 12, "bold"), fg_color=COLORS["primary"], corner_radius=8, command=self.load_more)
+            self.btn_more.grid(row=row, column=0, columnspan=columns, pady=20)
+
+    def load_more(self):
+        self.page = self.page.next_page()
+        start = len(self.filtered_entries)
+        self.filtered_entries.extend(data_manager.compact_records(self.page))
+        self.render_cards(start)
+
     def view_detail(self, entry):
         md_path = entry.get('md_path')
         img_path = self.entry['file_path'] if hasattr(self, 'entry') else entry.get('file_path')
         title = entry.get('title', '').strip()
         
-        # --- MD RECOVERY ---
+        # --- MD RESOLUTION ---
         if not md_path or not os.path.exists(md_path):
-            recovered_md = self._try_recover_md(entry)
-            if recovered_md:
-                md_path = recovered_md
+            md_path = data_manager.locate(entry, "md")
+        if not img_path and entry.get('archive_path'):
+            img_path = extract(entry)
         
         # Priority: Open Markdown Note (Obsidian context)
         if md_path and os.path.exists(md_path):
@@ -261,29 +287,6 @@ class DashboardWindow(ctk.CTkToplevel):
         else:
             self.show_toast("⚠️ File not found in Vault.")
 
-    def _try_recover_md(self, entry):
-        """Finds the .md note if it was moved to PARA."""
-        title = entry.get('title', '').strip()
-        uni = entry.get('universe', '').strip()
-        proj = entry.get('project', '').strip()
-        if not title: return None
-        
-        paths = ConfigManager.get_dynamic_paths()
-        search_dirs = []
-        if proj: search_dirs.append(os.path.join(paths['projects'], proj))
-        if uni: search_dirs.append(os.path.join(paths['universes'], uni))
-        
-        filename_part = "".join(x for x in title if x.isalnum() or x in " -_").strip()
-        
-        for s_dir in search_dirs:
-            if not os.path.exists(s_dir): continue
-            try:
-                for f in os.listdir(s_dir):
-                    if filename_part.lower() in f.lower() and f.lower().endswith(".md"):
-                        return os.path.abspath(os.path.join(s_dir, f))
-            except: continue
-        return None
-
     def show_toast(self, message):
         print(f"[DASHBOARD] {message}")
 
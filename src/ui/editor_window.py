@@ -6,17 +6,51 @@ import datetime
 import os
 import math
 import json
+import threading
+import uuid
 
 # Imports from our new modular structure
 from src.core.config import ConfigManager, COLORS, PATHS
 from src.core.ai import AIService
 from src.core.data_manager import data_manager
+from src.core.phash_index import dhash
 from src.utils.helpers import draw_arrow_pil
-from src.utils.platform_utils import copy_image_to_clipboard
 from logger_agent import log_agent # Import logger
 
+def show_toast(master, message, duration=1500, color="#10B981"):
+    """Bottom-center notification parented to ``master``; call it on the Tk thread."""
+    try:
+        toast = ctk.CTkToplevel(master)
+        toast.overrideredirect(True)
+        toast.attributes("-topmost", True)
+        
+        # Calculate Position (Bottom Center)
+        sw = master.winfo_screenwidth()
+        sh = master.winfo_screenheight()
+        w, h = 320, 50
+        x = (sw - w) // 2
+        y = sh - 150 
+        
+        toast.geometry(f"{w}x{h}+{x}+{y}")
+        
+        # Style
+        # Green bg for success
+        frame = ctk.CTkFrame(toast, fg_color=color, corner_radius=20, border_color="white", border_width=1)
+        frame.pack(fill="both", expand=True)
+        
+        label = ctk.CTkLabel(frame, text=message, text_color="white", font=("Inter", 13, "bold"))
+        label.pack(expand=True, padx=20, pady=10)
+        
+        # Self Destruct
+        toast.after(duration, toast.destroy)
+        
+        # Force update to show immediately before main thread gets busy
+        toast.update()
+    except Exception as e:
+        print(f"Toast Error: {e}")
+
 class EditorWindow(ctk.CTkToplevel):
-    def __init__(self, parent, screenshot_path, region, on_save, on_cancel, source=""):
+    def __init__(self, parent, screenshot, region, on_save, on_cancel, source=""):
         # Dynamic Path Loading
         self.paths = ConfigManager.get_dynamic_paths()
         self.UNIVERSES_ROOT = self.paths["universes"]
@@ -28,7 +62,7 @@ class EditorWindow(ctk.CTkToplevel):
         self.after(0, lambda: self.state("zoomed"))
         self.configure(fg_color=COLORS["bg"])
         
-        self.screenshot_path = screenshot_path
+        self.screenshot = screenshot # PIL image straight from the grabber (or a file path)
         self.on_save_cb = on_save
         self.on_cancel_cb = on_cancel
         self.source = source
@@ -47,9 +81,11 @@ class EditorWindow(ctk.CTkToplevel):
         self.detected_software = "" 
         self.image_active = True 
         self.custom_target_path = self.config.get('last_target_override')
+        self.phash = None
 
         self.setup_ui()
         self.load_image()
+        threading.Thread(target=self.check_near_duplicates, daemon=True).start()
         
         # Delayed initial target update
         self.after(100, self.update_target_path)
@@ -345,7 +381,11 @@ class EditorWindow(ctk.CTkToplevel):
 
     # --- CANVAS & ZOOM LOGIC ---
     def load_image(self):
-        self.original_image = Image.open(self.screenshot_path)
+        if isinstance(self.screenshot, Image.Image):
+            self.original_image = self.screenshot
+        else:
+            self.original_image = Image.open(self.screenshot)
+            self.original_image.load()
         self.drawing_layer = Image.new("RGBA", self.original_image.size, (255, 255, 255, 0))
         self.draw_ctx = ImageDraw.Draw(self.drawing_layer)
         
@@ -355,6 +395,20 @@ class EditorWindow(ctk.CTkToplevel):
         # Initial draw will happen in on_canvas_resize or manually
         self.after(100, self.update_image_display)
 
+    def check_near_duplicates(self):
+        """Hashes the capture and warns if it is near-identical to one already saved."""
+        try:
+            self.phash = dhash(self.original_image)
+            matches = data_manager.find_near_duplicates(self.phash)
+            if not matches:
+                return
+            entry = data_manager.get_task_entries([matches[0][0]]).get(matches[0][0], {})
+            when = entry.get('timestamp', '')[:16].replace('T', ' ')
+            msg = f"⚠️ Near-duplicate of '{entry.get('title') or 'Untitled'}' ({when})"
+            self.after(0, lambda: self.show_toast(msg, duration=4000, color="#F59E0B"))
+        except Exception as e:
+            log_agent.error("Near-duplicate check failed", e)
+
     def on_canvas_resize(self, event):
         if self.zoom_mode == "fit":
             self.update_image_display()
@@ -631,6 +685,7 @@ class EditorWindow(ctk.CTkToplevel):
         
         # Gather Data EARLY (before any UI updates/saves)
         data = {
+            'id': str(uuid.uuid4()), # Registry id, also embedded in the PNG and the note
             'title': self.title_entry.get().strip(),
             'universe': uni_val,
             'project': proj_val,
@@ -646,6 +701,7 @@ class EditorWindow(ctk.CTkToplevel):
             'software': getattr(self, 'detected_software', ''),
             'source': self.source,
             'save_image': save_image,
+            'phash': f"{self.phash:016x}" if self.phash is not None else '',
             'last_universe': uni_val,
             'last_project': proj_val,
             'last_client': cli_val,
@@ -653,64 +709,63 @@ class EditorWindow(ctk.CTkToplevel):
             'last_tags': tags_val
         }
         
+        final = None
         if save_image:
+            # Clipboard copy and PNG encode happen on the background save writer
             final = Image.alpha_composite(self.original_image.convert("RGBA"), self.drawing_layer).convert("RGB")
-            final.save(self.screenshot_path)
-            
-            # Copy to Clipboard
-            if copy_image_to_clipboard(final):
-                self.show_toast("📋 Imagen copiada al portapapeles")
-            else:
-                log_agent.log_event("WARNING", "Clipboard Copy Failed")
-        else:
-            # If not saving image, skip physical save
-            pass
-
-        # --- AUTO-CREATE LOGIC (FOLDERS + JSON DB) ---
-        # 1. UNIVERSE
-        if uni_val:
-            data_manager.add_universe(uni_val) # Add to JSON
-            if os.path.exists(self.UNIVERSES_ROOT):
-                uni_path = os.path.join(self.UNIVERSES_ROOT, uni_val)
-                if not os.path.exists(uni_path):
-                    try:
-                        os.makedirs(uni_path)
-                        log_agent.log_event("SYSTEM", f"NEW UNIVERSE FOLDER: {uni_path}")
-                    except Exception as e:
-                        log_agent.error(f"Failed to create Universe folder {uni_val}", e)
-
-        # 2. PROJECT
-        if proj_val:
-            data_manager.add_project(proj_val) # Add to JSON
-            if os.path.exists(self.PROJECTS_ROOT):
-                proj_path = os.path.join(self.PROJECTS_ROOT, proj_val)
-                if not os.path.exists(proj_path):
-                    try:
-                        os.makedirs(proj_path)
-                        log_agent.log_event("SYSTEM", f"NEW PROJECT FOLDER: {proj_path}")
-                    except Exception as e:
-                        log_agent.error(f"Failed to create Project folder {proj_val}", e)
-        
-        # 3. ROLE
-        if role_val:
-            data_manager.add_role(role_val) # Add to JSON
-
-        # 4. CLIENT
-        if cli_val:
-            data_manager.add_client(cli_val) # Add to JSON
-
-        # Save only User Preferences to Config
-
-        ConfigManager.save({
-            'last_universe': uni_val,
-            'last_project': proj_val,
-            'last_client': cli_val,
-            'last_role': role_val,
-            'last_target_override': data.get('target_override'),
-            'complexity_level': self.complexity_level
-        })
-        
-        self.on_save_cb(data, self.screenshot_path)
+
+        # One unit of work: registry, config and the task entry are flushed together
+        try:
+            with data_manager.transaction() as txn:
+                # --- AUTO-CREATE LOGIC (FOLDERS + JSON DB) ---
+                # 1. UNIVERSE
+                if uni_val:
+                    data_manager.add_universe(uni_val) # Add to JSON
+                    if os.path.exists(self.UNIVERSES_ROOT):
+                        uni_path = os.path.join(self.UNIVERSES_ROOT, uni_val)
+                        if not os.path.exists(uni_path):
+                            try:
+                                os.makedirs(uni_path)
+                                log_agent.log_event("SYSTEM", f"NEW UNIVERSE FOLDER: {uni_path}")
+                            except Exception as e:
+                                log_agent.error(f"Failed to create Universe folder {uni_val}", e)
+
+                # 2. PROJECT
+                if proj_val:
+                    data_manager.add_project(proj_val) # Add to JSON
+                    if os.path.exists(self.PROJECTS_ROOT):
+                        proj_path = os.path.join(self.PROJECTS_ROOT, proj_val)
+                        if not os.path.exists(proj_path):
+                            try:
+                                os.makedirs(proj_path)
+                                log_agent.log_event("SYSTEM", f"NEW PROJECT FOLDER: {proj_path}")
+                            except Exception as e:
+                                log_agent.error(f"Failed to create Project folder {proj_val}", e)
+        
+                # 3. ROLE
+                if role_val:
+                    data_manager.add_role(role_val) # Add to JSON
+
+                # 4. CLIENT
+                if cli_val:
+                    data_manager.add_client(cli_val) # Add to JSON
+
+                # Save only User Preferences to Config
+                txn.save_config({
+                    'last_universe': uni_val,
+                    'last_project': proj_val,
+                    'last_client': cli_val,
+                    'last_role': role_val,
+                    'last_target_override': data.get('target_override'),
+                    'complexity_level': self.complexity_level
+                })
+        except Exception as e:
+            # A failed apply keeps its redo record (data/transaction.pending.*.json), replayed on next start
+            log_agent.error("Failed to update the registry on save", e)
+
+        # Outside the transaction: submit() may block on a full save queue while the
+        # writer thread needs the registry (the SQLite batch holds the store lock)
+        self.on_save_cb(data, final)
         self.destroy()
 
     def apply_complexity(self, level):
@@ -739,37 +794,9 @@ class EditorWindow(ctk.CTkToplevel):
         
         self.show_toast(f"Modo {level} activado")
 
-    def show_toast(self, message, duration=1500):
-        try:
-            # Parent to master so it survives self.destroy()
-            toast = ctk.CTkToplevel(self.master)
-            toast.overrideredirect(True)
-            toast.attributes("-topmost", True)
-            
-            # Calculate Position (Bottom Center)
-            sw = self.winfo_screenwidth()
-            sh = self.winfo_screenheight()
-            w, h = 320, 50
-            x = (sw - w) // 2
-            y = sh - 150 
-            
-            toast.geometry(f"{w}x{h}+{x}+{y}")
-            
-            # Style
-            # Green bg for success
-            frame = ctk.CTkFrame(toast, fg_color="#10B981", corner_radius=20, border_color="white", border_width=1)
-            frame.pack(fill="both", expand=True)
-            
-            label = ctk.CTkLabel(frame, text=message, text_color="white", font=("Inter", 13, "bold"))
-            label.pack(expand=True, padx=20, pady=10)
-            
-            # Self Destruct
-            toast.after(duration, toast.destroy)
-            
-            # Force update to show immediately before main thread gets busy
-            toast.update()
-        except Exception as e:
-            print(f"Toast Error: {e}")
+    def show_toast(self, message, duration=1500, color="#10B981"):
+        # Parent to master so it survives self.destroy()
+        show_toast(self.master, message, duration, color)
 
     def change_theme(self, new_theme):
         ConfigManager.save({'theme': new_theme})
@@ -1,29 +1,41 @@
 import customtkinter as ctk
 import tkinter as tk
-import mss
+from PIL import ImageTk
+from src.core.capture_engine import capture_engine
+
+# Brightness of the frozen frame outside the selection (snip_mode: frozen)
+FROZEN_DIM = 0.55
 
 class SnippingOverlay(ctk.CTkToplevel):
-    def __init__(self, parent, callback, on_cancel):
+    """
+    Region picker over the virtual screen. ``frozen`` is a PIL image of the
+    whole virtual screen grabbed when the hotkey fired: it is shown dimmed
+    instead of the translucent live overlay, and the caller crops from it.
+    """
+
+    def __init__(self, parent, callback, on_cancel, frozen=None):
         super().__init__(parent)
         self.callback = callback
         self.on_cancel = on_cancel
         
-        with mss.mss() as sct:
-            # Multi-monitor support handled by using the virtual screen (index 0 usually covers union, but mss behavior varies. 
-            # Using index 1 first monitor simply for safety or 0 for 'all' if supported correctly on platform).
-            # For Windows, monitor[0] is strictly 'all monitors combined' in MSS.
-            monitor = sct.monitors[0]
-            self.geometry(f"{monitor['width']}x{monitor['height']}+{monitor['left']}+{monitor['top']}")
-            self.virtual_left = monitor["left"]
-            self.virtual_top = monitor["top"]
+        # monitors[0] is the virtual screen spanning every monitor (cached by the capture engine)
+        monitor = capture_engine.virtual_screen()
+        self.geometry(f"{monitor['width']}x{monitor['height']}+{monitor['left']}+{monitor['top']}")
+        self.virtual_left = monitor["left"]
+        self.virtual_top = monitor["top"]
 
         self.overrideredirect(True) 
         self.attributes("-topmost", True) 
-        self.attributes("-alpha", 0.3) 
+        self.attributes("-alpha", 1.0 if frozen is not None else 0.3)
         self.configure(fg_color="black")
         
         self.canvas = tk.Canvas(self, cursor="cross", bg="black", highlightthickness=0)
         self.canvas.pack(fill="both", expand=True)
+        if frozen is not None:
+            # Point LUT: one pass in C, even for multi-monitor frames
+            self.frozen_photo = ImageTk.PhotoImage(frozen.point(lambda v: int(v * FROZEN_DIM)))
+            self.canvas.create_image(0, 0, image=self.frozen_photo, anchor="nw")
+        self.frozen = frozen is not None
         
         self.canvas.bind("<ButtonPress-1>", self.on_press)
         self.canvas.bind("<B1-Motion>", self.on_drag)
@@ -40,7 +52,11 @@ class SnippingOverlay(ctk.CTkToplevel):
     def on_press(self, event):
         self.start_x = self.canvas.canvasx(event.x)
         self.start_y = self.canvas.canvasy(event.y)
-        self.rect = self.canvas.create_rectangle(self.start_x, self.start_y, self.start_x, self.start_y, outline='#00ff00', width=2, fill="white", stipple="gray25")
+        if self.frozen:
+            # The dimmed frame already shows the content; just outline the selection
+            self.rect = self.canvas.create_rectangle(self.start_x, self.start_y, self.start_x, self.start_y, outline='#00ff00', width=2)
+        else:
+            self.rect = self.canvas.create_rectangle(self.start_x, self.start_y, self.start_x, self.start_y, outline='#00ff00', width=2, fill="white", stipple="gray25")
 
     def on_drag(self, event):
         cur_x, cur_y = (self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
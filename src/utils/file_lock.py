@@ -0,0 +1,117 @@
+import errno
+import os
+import threading
+import time
+from logger_agent import log_agent
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class FileLock:
+    """
+    Advisory inter-process lock on ``<path>.lock`` (msvcrt on Windows, flock elsewhere).
+
+    The OS drops the lock when its holder dies, so there are no stale locks to
+    clean up. Re-entrant within a process; other processes wait (polling) up to
+    ``timeout`` seconds, then TimeoutError is raised. Filesystems without lock
+    support degrade to no locking instead of failing the write.
+    """
+
+    _held = {}                  # lock path -> (thread id, depth, fd); shared by every instance
+    _guard = threading.Lock()
+
+    def __init__(self, path, timeout=10.0, poll=0.05):
+        self.lock_path = os.path.abspath(path) + ".lock"
+        self.timeout = timeout
+        self.poll = poll
+        self._thread_lock = _thread_lock_for(self.lock_path)
+
+    def _try_os_lock(self, fd):
+        try:
+            if msvcrt:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            elif fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError as e:
+            # Held by another process; any other errno means the filesystem cannot lock
+            if isinstance(e, BlockingIOError) or e.errno in (errno.EACCES, errno.EAGAIN, getattr(errno, "EDEADLOCK", errno.EDEADLK)):
+                return False
+            raise
+
+    def acquire(self, blocking=True):
+        me = threading.get_ident()
+        with FileLock._guard:
+            held = FileLock._held.get(self.lock_path)
+            if held and held[0] == me:
+                FileLock._held[self.lock_path] = (me, held[1] + 1, held[2])
+                return True
+
+        deadline = time.monotonic() + self.timeout
+        if not self._thread_lock.acquire(timeout=self.timeout if blocking else 0):
+            if blocking:
+                raise TimeoutError(f"Timed out waiting for {self.lock_path}")
+            return False
+
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+        while True:
+            try:
+                got = self._try_os_lock(fd)
+            except OSError as e:
+                log_agent.error(f"File locking unsupported for {self.lock_path}, writing unlocked", e)
+                got = True
+            if got:
+                break
+            if not blocking or time.monotonic() >= deadline:
+                os.close(fd)
+                self._thread_lock.release()
+                if blocking:
+                    raise TimeoutError(f"Timed out waiting for {self.lock_path}")
+                return False
+            time.sleep(self.poll)
+
+        with FileLock._guard:
+            FileLock._held[self.lock_path] = (me, 1, fd)
+        return True
+
+    def release(self):
+        with FileLock._guard:
+            me, depth, fd = FileLock._held[self.lock_path]
+            if depth > 1:
+                FileLock._held[self.lock_path] = (me, depth - 1, fd)
+                return
+            del FileLock._held[self.lock_path]
+        try:
+            if msvcrt:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            elif fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+def _thread_lock_for(lock_path):
+    """One in-process lock per lock file (flock does not exclude threads of the same process)."""
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(lock_path, threading.Lock())
@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Run from anywhere: the app imports its modules from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Module-level singletons (data_manager, log_agent) open data/ and logs/ relative to the
+# working directory on import, so the tests never touch the repo's own registry
+os.chdir(tempfile.mkdtemp(prefix="gemshot_tests_"))
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """A DataManager over an empty data/ folder."""
+    monkeypatch.chdir(tmp_path)
+    from src.core.data_manager import DataManager
+    return DataManager()
@@ -0,0 +1,17 @@
+import os
+from PIL import Image
+from src.core import image_encoder
+from src.core.blob_store import blob_store
+
+def test_identical_captures_share_a_blob_and_id_carrying_files_are_left_alone(tmp_path):
+    vault = tmp_path / "vault"
+    (vault / "a").mkdir(parents=True)
+    image = Image.new("RGB", (64, 48), (10, 20, 30))
+    paths = [str(vault / "a" / f"c{i}.png") for i in range(3)]
+    for path, entry_id in zip(paths, (None, None, "entry-3")):
+        image_encoder.encode(image, entry_id, policy="png").save(path)
+
+    first, second, with_id = (blob_store.ingest(p, str(vault)) for p in paths)
+    assert first and first == second
+    assert os.path.samefile(paths[0], paths[1])
+    assert with_id is None and os.stat(paths[2]).st_nlink == 1
@@ -0,0 +1,30 @@
+import os
+from src.core import garbage_collector, vault_watcher
+from src.core.garbage_collector import GarbageCollector
+from src.core.vault_watcher import VaultWatcher
+
+def test_watcher_cleared_entry_is_dangling(manager, tmp_path, monkeypatch):
+    monkeypatch.setattr(garbage_collector, "data_manager", manager)
+    monkeypatch.setattr(vault_watcher, "data_manager", manager)
+    monkeypatch.setattr(vault_watcher, "DELETE_GRACE", 0)
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    image, note = vault / "shot.png", vault / "shot.md"
+    image.write_bytes(b"png")
+    note.write_text("---\nid: a\n---\n", encoding="utf-8")
+    manager.add_task_entry({"id": "a", "title": "shot", "type": "Bug", "file_path": str(image), "md_path": str(note)})
+    kept = vault / "kept.md"
+    kept.write_text("---\nid: b\n---\n", encoding="utf-8")
+    manager.add_task_entry({"id": "b", "title": "kept", "type": "Bug", "file_path": "", "md_path": str(kept)})
+
+    # The watcher confirms both deletes and clears the entry's paths
+    os.remove(image)
+    os.remove(note)
+    VaultWatcher()._apply([("deleted", str(image), None, False), ("deleted", str(note), None, False)], {})
+    assert manager.get_task_entries(["a"])["a"]["file_path"] == ""
+    assert manager.get_task_entries(["a"])["a"]["md_path"] == ""
+
+    gc = GarbageCollector(paths={"root": str(vault)})
+    assert [i for i, _ in gc.find(categories=("dangling",))["dangling"]] == ["a"]
+    gc.collect(reclaim=True, categories=("dangling",))
+    assert "a" not in manager.get_task_entries(["a"])
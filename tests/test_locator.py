@@ -0,0 +1,27 @@
+from src.core.locator import Locator
+
+def test_remove_appends_a_tombstone_and_keeps_other_instances_lines(tmp_path):
+    path = str(tmp_path / "locator.jsonl")
+    mine, other = Locator(path), Locator(path)
+    mine.add([{"id": "a", "file_path": "/vault/a.png", "md_path": "/vault/a.md"}])
+    other.add([{"id": "b", "file_path": "/vault/b.png", "md_path": ""}])
+
+    mine.remove(["a"])
+    assert mine.get("a") is None
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 3 # Appended, not rewritten
+
+    reloaded = Locator(path)
+    assert reloaded.get("a") is None
+    assert reloaded.get("b") == {"img": "/vault/b.png", "md": ""}
+
+def test_compaction_rereads_the_file(tmp_path):
+    path = str(tmp_path / "locator.jsonl")
+    mine, other = Locator(path), Locator(path)
+    mine.get("x") # Loaded before the other instance writes
+    other.add([{"id": "b", "file_path": "/vault/b.png", "md_path": ""}])
+    for i in range(120):
+        mine.record("a", img=f"/vault/a{i}.png")
+    reloaded = Locator(path)
+    assert reloaded.get("b") == {"img": "/vault/b.png", "md": ""}
+    assert reloaded.get("a")["img"] == "/vault/a119.png"
@@ -0,0 +1,26 @@
+from src.core.data_manager import DataManager
+from src.core.phash_index import PHashIndex
+
+def test_deleted_entry_is_not_a_near_duplicate(manager):
+    manager.add_task_entry({"id": "a", "title": "first", "type": "Bug", "phash": "00000000000000ff"})
+    manager.add_task_entry({"id": "b", "title": "second", "type": "Bug", "phash": "00000000000000fe"})
+    assert {i for i, _ in manager.find_near_duplicates(0xff)} == {"a", "b"}
+
+    manager.delete_task_entries(["a"])
+    assert [i for i, _ in manager.find_near_duplicates(0xff)] == ["b"]
+    assert manager.duplicate_groups() == []
+    # The tombstone survives a restart
+    assert [i for i, _ in DataManager().find_near_duplicates(0xff)] == ["b"]
+
+def test_load_compacts_tombstones(tmp_path):
+    path = str(tmp_path / "phash.jsonl")
+    index = PHashIndex(path)
+    index.load(lambda: [])
+    index.add((f"id{i}", i) for i in range(200))
+    index.remove(f"id{i}" for i in range(1, 200))
+
+    reloaded = PHashIndex(path)
+    reloaded.load(lambda: [])
+    assert [i for i, _ in reloaded.find(0, max_distance=0)] == ["id0"]
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 1
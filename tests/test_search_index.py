@@ -0,0 +1,41 @@
+from src.core.search_index import SearchIndex
+
+def _entry(i, title):
+    return {"id": f"id{i}", "title": title, "type": "Bug"}
+
+def test_update_and_remove_survive_a_reload(tmp_path):
+    path = str(tmp_path / "index.jsonl")
+    index = SearchIndex(path)
+    index.load(lambda: [])
+    index.add([_entry(1, "alpha bravo"), _entry(2, "alpha charlie")])
+    index.update([_entry(1, "alpha bravo")], [_entry(1, "zebra delta")])
+    index.remove([_entry(2, "alpha charlie")])
+    assert index.search("bravo") == [] and index.search("zebra") == ["id1"]
+
+    reloaded = SearchIndex(path)
+    reloaded.load(lambda: [])
+    assert reloaded.search("alpha") == [] and reloaded.search("zebra") == ["id1"]
+
+def test_compaction_keeps_lines_appended_by_another_instance(tmp_path, monkeypatch):
+    path = str(tmp_path / "index.jsonl")
+    writer = SearchIndex(path)
+    writer.load(lambda: [])
+    writer.add(_entry(i, f"churn {i}") for i in range(300))
+    writer.remove(_entry(i, f"churn {i}") for i in range(300))
+
+    # Another instance appends while this one is loading (and about to compact)
+    loading = SearchIndex(path)
+    add_doc = loading._add_doc
+    def add_doc_during_load(*args):
+        writer.add([_entry("new", "late arrival")])
+        monkeypatch.setattr(loading, "_add_doc", add_doc)
+        add_doc(*args)
+    monkeypatch.setattr(loading, "_add_doc", add_doc_during_load)
+    writer.add([_entry("live", "still here")])
+    loading.load(lambda: [])
+
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+    reloaded = SearchIndex(path)
+    reloaded.load(lambda: [])
+    assert reloaded.search("arrival") == ["idnew"] and reloaded.search("still") == ["idlive"]
@@ -0,0 +1,27 @@
+import threading
+from src.core.sqlite_store import SQLiteStore
+
+def test_reads_do_not_see_another_threads_open_batch(tmp_path):
+    store = SQLiteStore(str(tmp_path / "registry.db"))
+    in_batch, checked = threading.Event(), threading.Event()
+    seen = {}
+
+    def writer():
+        with store.batch():
+            store.add_task({"id": "a", "timestamp": "2024-01-01", "title": "A"})
+            seen["own"] = store.count_tasks()
+            in_batch.set()
+            checked.wait(5)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    assert in_batch.wait(5)
+    seen["other"] = store.count_tasks()
+    checked.set()
+    # Waits for the batch instead of joining it
+    store.add_name("projects", "p")
+    thread.join(5)
+
+    assert seen == {"own": 1, "other": 0}
+    assert store.count_tasks() == 1 and store.get_names("projects") == ["p"]
+    store.close()
@@ -0,0 +1,27 @@
+import glob
+import json
+import os
+from src.core.data_manager import DataManager, PENDING_TXN_PATTERN
+
+def test_recovered_entries_reach_the_indexes(manager):
+    # A commit that crashed after its durable write, before being applied
+    record = {"files": {}, "config": {}, "ops": [],
+              "tasks": [{"id": "a", "title": "recovered capture", "type": "Bug", "phash": "00000000000000ff",
+                         "file_path": os.path.abspath("shot.png"), "md_path": ""}]}
+    with open(PENDING_TXN_PATTERN.replace("*", "deadbeef"), "w", encoding="utf-8") as f:
+        json.dump(record, f)
+
+    recovered = DataManager()
+    assert "a" in recovered.get_task_entries(["a"])
+    assert recovered.search("recovered") == ["a"]
+    assert [i for i, _ in recovered.find_near_duplicates(0xff)] == ["a"]
+    assert recovered.locator.get("a")["img"] == os.path.abspath("shot.png")
+    assert not glob.glob(PENDING_TXN_PATTERN)
+
+def test_commits_leave_no_lock_files_behind(manager):
+    for i in range(3):
+        with DataManager().transaction():
+            pass
+        with manager.transaction():
+            manager.add_task_entry({"id": str(i), "title": "t", "type": "Bug"})
+    assert glob.glob(os.path.join("data", "transaction.pending*.lock")) == [os.path.join("data", "transaction.pending.lock")]